@@ -3,6 +3,9 @@ import os
 import certifi
 import ssl
 import asyncio
+import functools
+import hashlib
+import json
 import time
 # Fix SSL certificate verification on macOS
 os.environ["SSL_CERT_FILE"] = certifi.where()
@@ -12,7 +15,6 @@ from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
 from typing import Annotated
 
-import httpx
 import re
 from dotenv import load_dotenv
 from livekit import rtc
@@ -27,13 +29,28 @@ from livekit.agents import (
     function_tool,
     inference,
     room_io,
-    AgentStateChangedEvent, UserStateChangedEvent, FunctionToolsExecutedEvent
+    AgentStateChangedEvent, UserStateChangedEvent, FunctionToolsExecutedEvent, MetricsCollectedEvent
 )
 from livekit.plugins import noise_cancellation, silero, openai, groq, resemble, deepgram
 
+from livekit.agents.llm.utils import build_legacy_openai_schema
+from livekit.agents.metrics import LLMMetrics
 from livekit.plugins.turn_detector.multilingual import MultilingualModel
 from otp_service import generate_otp, hash_otp, send_otp_email
-from fsm import FSM,State
+from fsm import FSM, MANAGE_INTENTS, BookingRef, State
+from cal_client import breaker_stats, get_cal_client, pool_stats
+from slot_cache import SLOT_CACHE
+from slot_engine import SlotEngine
+from slot_store import PERIODS, DaySlots, format_minute
+from booking_index import BookingIndex
+from booking_submitter import BookingSubmitter, idempotency_key
+from singleflight import CAL_FLIGHTS
+from snapshot import load_snapshot, save_snapshot
+from service_index import ServiceIndex
+from tool_results import BookingHandles, ToolResults, estimate_tokens, page_of, summarize_slots
+from prompts import PromptCache, PromptStats, ToolExposure, scoped_instructions
+from resilience import CalUnavailableError, detached, tool_budget, within_budget
+from date_resolver import get_tz, resolve as resolve_datetime, resolve_time
 
 
 logger = logging.getLogger("agent")
@@ -42,7 +59,8 @@ load_dotenv(".env.local")
 
 # Cal.com API Configuration
 CAL_COM_API_KEY = os.getenv("CAL_COM_API_KEY")
-CAL_COM_API_URL = "https://api.cal.com/v2"
+CAL_COM_BASE_URL = os.getenv("CAL_COM_BASE_URL", "https://api.cal.com")
+CAL_COM_API_URL = f"{CAL_COM_BASE_URL}/v2"
 CAL_USERNAME = os.getenv("CAL_USERNAME")
 
 BACKEND_URL = os.getenv("BACKEND_URL", "http://localhost:3000")
@@ -71,16 +89,27 @@ def lookup_email_by_phone(phone: str) -> str:
     return email
 
 
-# Cache for event types (refreshed periodically)
+# Cache for event types (served from memory, revalidated in the background)
 EVENT_TYPES_CACHE = {
     "data": [],
     "last_updated": None,
-    "ttl_seconds": 300  # Cache for 5 minutes
+    "ttl_seconds": 300,  # Cache for 5 minutes
+    "version": 0,  # Bumped whenever the catalogue content changes
+    "etag": None,
+    "last_modified": None,
+    "content_hash": None,
+    "last_forced": None,
+    "force_min_interval_seconds": 60,  # At most one forced refresh per minute
+    "refresh_task": None,
 }
 
 
 async def fetch_event_types(force_refresh=False):
-    """Fetch all event types from Cal.com V1 API and cache them."""
+    """
+    Returns the event-type catalogue. Blocks only for the very first load; after that
+    it always answers from memory and revalidates in a background task when stale.
+    `force_refresh` just asks for a background revalidation (rate-limited).
+    """
     global EVENT_TYPES_CACHE
     
     now = datetime.now()
@@ -88,48 +117,184 @@ async def fetch_event_types(force_refresh=False):
         EVENT_TYPES_CACHE["last_updated"] is not None and
         (now - EVENT_TYPES_CACHE["last_updated"]).total_seconds() < EVENT_TYPES_CACHE["ttl_seconds"]
     )
-    
-    if not force_refresh and cache_valid:
+
+    if force_refresh and cache_valid:
+        last_forced = EVENT_TYPES_CACHE["last_forced"]
+        if last_forced is None or (now - last_forced).total_seconds() >= EVENT_TYPES_CACHE["force_min_interval_seconds"]:
+            EVENT_TYPES_CACHE["last_forced"] = now
+            cache_valid = False
+
+    if cache_valid:
         return EVENT_TYPES_CACHE["data"]
-    
+
+    if EVENT_TYPES_CACHE["last_updated"] is None:
+        # Nothing to serve yet. Concurrent sessions share one request
+        return await CAL_FLIGHTS.do(("event-types",), _refresh_event_types)
+
+    task = EVENT_TYPES_CACHE["refresh_task"]
+    if task is None or task.done():
+        EVENT_TYPES_CACHE["refresh_task"] = asyncio.create_task(
+            detached(CAL_FLIGHTS.do(("event-types",), _refresh_event_types))
+        )
+    return EVENT_TYPES_CACHE["data"]
+
+
+async def _refresh_event_types():
+    """
+    Revalidates EVENT_TYPES_CACHE against Cal.com. Sends If-None-Match / If-Modified-Since
+    when we have validators, and skips re-parsing when the body hash is unchanged.
+    """
+    now = datetime.now()
+    headers = {}
+    if EVENT_TYPES_CACHE["etag"]:
+        headers["If-None-Match"] = EVENT_TYPES_CACHE["etag"]
+    if EVENT_TYPES_CACHE["last_modified"]:
+        headers["If-Modified-Since"] = EVENT_TYPES_CACHE["last_modified"]
+
     try:
-        async with httpx.AsyncClient() as client:
-            # Use V1 endpoint - this is the standard way to get event types
-            res = await client.get(
-                "https://api.cal.com/v1/event-types",
-                params={
-                    "apiKey": CAL_COM_API_KEY,
-                },
-                timeout=10.0,
-            )
-            
-            if res.status_code == 200:
-                response_data = res.json()
-                # V1 returns {event_types: [...]}
-                event_types = response_data.get("event_types", [])
-                
-                # Format the data consistently
-                formatted_types = []
-                for et in event_types:
-                    formatted_types.append({
-                        "id": et.get("id"),
-                        "title": et.get("title"),
-                        "slug": et.get("slug"),
-                        "lengthInMinutes": et.get("length", 30),  # V1 uses "length"
-                    })
-                
-                EVENT_TYPES_CACHE["data"] = formatted_types
+        client = get_cal_client()
+        # Use V1 endpoint - this is the standard way to get event types
+        res = await client.get(
+            f"{CAL_COM_BASE_URL}/v1/event-types",
+            endpoint="event-types",
+            headers=headers,
+            params={
+                "apiKey": CAL_COM_API_KEY,
+            },
+        )
+
+        if res.status_code == 304:
+            EVENT_TYPES_CACHE["last_updated"] = now
+            return EVENT_TYPES_CACHE["data"]
+
+        if res.status_code == 200:
+            EVENT_TYPES_CACHE["etag"] = res.headers.get("etag")
+            EVENT_TYPES_CACHE["last_modified"] = res.headers.get("last-modified")
+
+            content_hash = hashlib.sha256(res.content).hexdigest()
+            if content_hash == EVENT_TYPES_CACHE["content_hash"]:
                 EVENT_TYPES_CACHE["last_updated"] = now
-                logger.info(f"Fetched {len(formatted_types)} event types from Cal.com")
-                return formatted_types
-            else:
-                logger.error(f"Failed to fetch event types: {res.status_code} - {res.text}")
                 return EVENT_TYPES_CACHE["data"]
+
+            response_data = res.json()
+            # V1 returns {event_types: [...]}
+            event_types = response_data.get("event_types", [])
+            
+            formatted_types = [catalogue_entry(et) for et in event_types]
+            
+            EVENT_TYPES_CACHE["data"] = formatted_types
+            EVENT_TYPES_CACHE["last_updated"] = now
+            EVENT_TYPES_CACHE["content_hash"] = content_hash
+            EVENT_TYPES_CACHE["version"] += 1
+            logger.info(f"Fetched {len(formatted_types)} event types from Cal.com")
+            run_in_background(persist_snapshot(event_types=catalogue_snapshot()))
+            return formatted_types
+        else:
+            logger.error(f"Failed to fetch event types: {res.status_code} - {res.text}")
+            return EVENT_TYPES_CACHE["data"]
     except Exception as e:
         logger.error(f"Error fetching event types: {e}")
         return EVENT_TYPES_CACHE["data"]
 
 
+def catalogue_entry(et: dict) -> dict:
+    """The parts of a V1 event type the agent uses, including what SLOT_ENGINE needs to match /v1/slots."""
+    return {
+        "id": et.get("id"),
+        "title": et.get("title"),
+        "slug": et.get("slug"),
+        "lengthInMinutes": et.get("length", 30),  # V1 uses "length"
+        "slotInterval": et.get("slotInterval"),
+        "minimumBookingNotice": et.get("minimumBookingNotice") or 0,
+        "beforeEventBuffer": et.get("beforeEventBuffer") or 0,
+        "afterEventBuffer": et.get("afterEventBuffer") or 0,
+    }
+
+
+# Tenant configs by project id (restored from the snapshot, revalidated per session)
+AGENT_CONFIG_CACHE = {}
+
+# Keeps fire-and-forget tasks alive until they finish
+BACKGROUND_TASKS = set()
+
+
+def run_in_background(coro) -> asyncio.Task:
+    # Background work outlives the tool that started it, so it doesn't inherit its budget
+    task = asyncio.create_task(detached(coro))
+    BACKGROUND_TASKS.add(task)
+    task.add_done_callback(BACKGROUND_TASKS.discard)
+    return task
+
+
+def catalogue_snapshot() -> dict:
+    return {key: EVENT_TYPES_CACHE[key] for key in ("data", "etag", "last_modified", "content_hash")}
+
+
+async def persist_snapshot(**sections):
+    try:
+        await asyncio.to_thread(save_snapshot, **sections)
+    except Exception as e:
+        logger.warning(f"Failed to write snapshot: {e}")
+
+
+def restore_snapshot():
+    """Loads the last known catalogue and tenant configs from disk so a cold worker can greet offline."""
+    snapshot = load_snapshot()
+    if not snapshot:
+        return
+    event_types = snapshot.get("event_types") or {}
+    # Snapshots from before the slot settings were kept can't feed SLOT_ENGINE; refetch instead
+    if event_types.get("data") and not EVENT_TYPES_CACHE["data"] and all("slotInterval" in et for et in event_types["data"]):
+        for key in ("data", "etag", "last_modified", "content_hash"):
+            EVENT_TYPES_CACHE[key] = event_types.get(key)
+        # Serve it right away, but revalidate on first use
+        EVENT_TYPES_CACHE["last_updated"] = datetime.fromtimestamp(0)
+        EVENT_TYPES_CACHE["version"] += 1
+    AGENT_CONFIG_CACHE.update(snapshot.get("agent_configs") or {})
+    logger.info(
+        f"Restored snapshot: {len(EVENT_TYPES_CACHE['data'])} event types, "
+        f"{len(AGENT_CONFIG_CACHE)} agent configs"
+    )
+
+
+async def fetch_agent_config(project_id: str) -> dict:
+    """Fetches a project's agent config from the backend and remembers it on disk."""
+    client = get_cal_client()
+    response = await client.get(
+        f"{BACKEND_URL}/api/internal/projects/{project_id}",
+        endpoint="backend",
+        headers={
+            "Authorization": f"Bearer {VOICE_AGENT_SECRET}"
+        },
+    )
+
+    if response.status_code != 200:
+        raise Exception(f"Failed to fetch agent config: {response.status_code}")
+
+    agent_config = response.json()
+    if AGENT_CONFIG_CACHE.get(project_id) != agent_config:
+        AGENT_CONFIG_CACHE[project_id] = agent_config
+        run_in_background(persist_snapshot(agent_configs={project_id: agent_config}))
+    return agent_config
+
+
+async def revalidate_agent_config(project_id: str):
+    try:
+        await fetch_agent_config(project_id)
+    except Exception as e:
+        logger.warning(f"Agent config revalidation failed for {project_id}: {e}")
+
+
+def spoken_services(services: list[dict], limit: int = 5) -> str:
+    """'We offer haircut, spa and makeup.' from the catalogue, naming at most `limit` services."""
+    titles = [service["title"].lower() for service in services if service.get("title")]
+    if len(titles) > limit:
+        return f"We offer {', '.join(titles[:limit])} and more."
+    if len(titles) > 1:
+        return f"We offer {', '.join(titles[:-1])} and {titles[-1]}."
+    return f"We offer {titles[0]}." if titles else "We offer a range of salon services."
+
+
 def get_all_services():
     """Get all available services from cached event types."""
     event_types = EVENT_TYPES_CACHE["data"]
@@ -147,24 +312,35 @@ def get_all_services():
     return services
 
 
-def find_service_by_name(service_name: str):
-    """Find a service by matching the name (case-insensitive, partial match)."""
-    services = get_all_services()
-    service_lower = service_name.lower().strip()
-    
-    # Try exact match first
-    for service in services:
-        if service["title"].lower() == service_lower or service["slug"].lower() == service_lower:
-            return service
-    
-    # Try partial match
-    for service in services:
-        if service_lower in service["title"].lower() or service_lower in service["slug"].lower():
-            return service
-        if service["title"].lower() in service_lower or service["slug"].lower() in service_lower:
-            return service
-    
-    return None
+SERVICE_INDEX = ServiceIndex([], version=-1)
+
+
+def get_service_index() -> ServiceIndex:
+    """Returns the service name index, rebuilding it once per catalogue version."""
+    global SERVICE_INDEX
+    if SERVICE_INDEX.version != EVENT_TYPES_CACHE["version"]:
+        SERVICE_INDEX = ServiceIndex(get_all_services(), version=EVENT_TYPES_CACHE["version"])
+    return SERVICE_INDEX
+
+
+def find_service_by_name(service_name: str, memo: dict | None = None):
+    """
+    Find a service by name: exact, prefix and token matches first, then fuzzy
+    (trigram / sound-alike) matching for misheard names.
+    Pass a per-session `memo` dict to make repeat lookups free.
+    """
+    key = (service_name, EVENT_TYPES_CACHE["version"])
+    if memo is not None and key in memo:
+        return memo[key]
+    service = get_service_index().best(service_name)
+    if memo is not None:
+        memo[key] = service
+    return service
+
+
+def rank_services(service_name: str, limit: int = 3) -> list:
+    """Ranked (service, score) candidates for a service name."""
+    return get_service_index().match(service_name, limit)
 
 
 def normalize_phone(phone: str) -> str:
@@ -187,103 +363,33 @@ def extract_booking_phone(booking: dict) -> str | None:
     return meta.get("guest_phone")
 
 
+def booking_phone_key(booking: dict) -> str | None:
+    """Normalized phone of a raw Cal.com booking, used as the booking index key."""
+    phone = extract_booking_phone(booking)
+    return normalize_phone(phone) if phone else None
+
+
+# Upcoming bookings indexed by normalized phone, shared by every session on this worker
+BOOKING_INDEX = BookingIndex(CAL_COM_API_URL, CAL_COM_API_KEY, booking_phone_key)
+
+# Exactly-once booking creation with retries, shared by every session on this worker
+BOOKING_SUBMITTER = BookingSubmitter(CAL_COM_API_URL, CAL_COM_API_KEY, booking_phone_key)
+
+# Free slots computed in memory from working hours + the bookings the index sees
+SLOT_ENGINE = SlotEngine(CAL_COM_API_URL, CAL_COM_API_KEY)
+BOOKING_INDEX.add_mirror(SLOT_ENGINE)
+
+
 def parse_datetime(date_str: str, time_str: str, timezone: str = "Asia/Kolkata") -> str:
     """
-    Parses date and time strings using standard library.
-    Returns ISO 8601 string: 'YYYY-MM-DDTHH:MM:SS.000Z' in Asia/Kolkata.
+    Resolves spoken date and time strings (see date_resolver) in `timezone`.
+    Returns ISO 8601 UTC string: 'YYYY-MM-DDTHH:MM:SS.000Z'. Raises ValueError if either
+    part can't be understood.
     """
-    date_clean = date_str.strip().lower()
-    time_clean = time_str.strip().lower()                                                               
-    
-    current_tz = ZoneInfo(timezone)
-    now_in_tz = datetime.now(current_tz)
-    
-    target_date = now_in_tz
-    if "tomorrow" in date_clean:
-        target_date = target_date + timedelta(days=1)
-    elif "day after" in date_clean or "day after tomorrow" in date_clean or "day-after-tomorrow" in date_clean:
-        target_date = target_date + timedelta(days=2)
-    elif "today" in date_clean:
-        pass 
-    else:
-        m = re.fullmatch(r"(\d{1,2})(st|nd|rd|th)?", date_clean)
-        if m:
-            day_num = int(m.group(1))
-            year = now_in_tz.year
-            month = now_in_tz.month
-            
-            try:
-                candidate = datetime(year, month, day_num, tzinfo=current_tz)
-                
-                if candidate.date() < now_in_tz.date():
-                    month += 1
-                    if month > 12:
-                        month = 1
-                        year += 1
-                    candidate = datetime(year, month, day_num, tzinfo=current_tz)
-                
-                target_date = candidate
-                
-            except ValueError:
-                month += 1
-                if month > 12:
-                    month = 1
-                    year += 1
-                try:
-                    candidate = datetime(year, month, day_num, tzinfo=current_tz)
-                    target_date = candidate
-                except ValueError:
-                    pass
-        else:
-            has_explicit_year = bool(re.search(r"\b\d{4}\b", date_str))
-            
-            # Added support for %d %b (e.g. 23 dec) and %d %B types
-            for fmt in ["%Y-%m-%d", "%d-%m-%Y", "%B %d", "%b %d", "%d %b", "%d %B"]:
-                try:
-                    parsed = datetime.strptime(date_clean.replace("th", "").replace("st", "").replace("nd", "").replace("rd", ""), fmt)
-                    
-                    if has_explicit_year:
-                        parsed = parsed.replace(tzinfo=current_tz)
-                        # Sanity check: if user says 2023 but it's 2025, fix it
-                        if parsed.year < now_in_tz.year:
-                             parsed = parsed.replace(year=now_in_tz.year)
-                    else:
-                        parsed = parsed.replace(year=now_in_tz.year, tzinfo=current_tz)
-
-                    # If date is in the past, assume next year (unless explicit valid year)
-                    if parsed.date() < now_in_tz.date():
-                        parsed = parsed.replace(year=now_in_tz.year + 1)
-                    
-                    target_date = parsed
-                    break
-                except ValueError:
-                    continue
-
-    target_time = None
-    try:
-        target_time = datetime.strptime(time_clean, "%H:%M").time()
-    except ValueError:
-        try:
-            time_clean = time_clean.replace(".", "").upper()
-            if ":" not in time_clean: 
-                parts = time_clean.split()
-                if len(parts) == 2:
-                    time_clean = f"{parts[0]}:00 {parts[1]}"
-            target_time = datetime.strptime(time_clean, "%I:%M %p").time()
-        except ValueError:
-            pass
-            
-    if not target_time:
-        if ":" in time_clean:
-            h, m = time_clean.split(":")[:2]
-            target_time = now_in_tz.replace(hour=int(h), minute=int(m)).time()
-
-    if target_time:
-        final_dt_aware = datetime.combine(target_date.date(), target_time, tzinfo=current_tz)
-        final_dt_utc = final_dt_aware.astimezone(ZoneInfo("UTC"))
-        return final_dt_utc.strftime("%Y-%m-%dT%H:%M:%S.000Z")
-    
-    raise ValueError(f"Could not parse time: {time_str}")
+    now_in_tz = datetime.now(get_tz(timezone))
+    local = resolve_datetime(date_str, time_str, now_in_tz)
+    return local.astimezone(get_tz("UTC")).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
 
 def format_spoken_date(dt: datetime) -> str:
     """Formats a date object into natural spoken text (e.g. 'January 2nd')."""
@@ -292,6 +398,269 @@ def format_spoken_date(dt: datetime) -> str:
     return dt.strftime(f"%B {day}{suffix}")
 
 
+async def _request_slots(event_type_id, first_day: str, last_day: str):
+    """
+    One /v1/slots call covering whole days first_day..last_day, shared by identical concurrent callers.
+    Returns the raw 'slots' payload (usually {'YYYY-MM-DD': [...]}) or None if Cal.com failed.
+    """
+    async def fetch():
+        # Get availability using V1 slots endpoint (still works with V2 auth)
+        params = {
+            "apiKey": CAL_COM_API_KEY,
+            "eventTypeId": event_type_id,
+            "startTime": f"{first_day}T00:00:00.000Z",
+            "endTime": f"{last_day}T23:59:59.999Z",
+        }
+
+        client = get_cal_client()
+        res = await client.get(
+            f"{CAL_COM_BASE_URL}/v1/slots",
+            endpoint="slots",
+            params=params,
+        )
+
+        if res.status_code != 200:
+            logger.error(f"Availability check failed: {res.status_code} {res.text}")
+            return None
+
+        json_data = res.json()
+        return json_data.get("slots", json_data)
+
+    return await CAL_FLIGHTS.do(("slots", event_type_id, first_day, last_day), fetch)
+
+
+def get_event_type(event_type_id) -> dict:
+    """Raw cached event type by id (just the id if it isn't in the catalogue)."""
+    for et in EVENT_TYPES_CACHE["data"]:
+        if et.get("id") == event_type_id:
+            return et
+    return {"id": event_type_id}
+
+
+def local_day_slots(event_type_id, day: str) -> DaySlots | None:
+    """
+    Slots for one day from SLOT_ENGINE, or None until it has the schedule and bookings.
+    Keeps the engine honest in the background: tops up the booking index and
+    reconciles against /v1/slots when those are due.
+    """
+    if not SLOT_ENGINE.ready:
+        return None
+    if not BOOKING_INDEX.is_fresh():
+        run_in_background(warm_booking_index())
+    if SLOT_ENGINE.reconcile_due(event_type_id):
+        prefetch_week_slots(event_type_id)
+    return SLOT_ENGINE.day_slots(get_event_type(event_type_id), day)
+
+
+async def fetch_day_slots(event_type_id, day: str) -> DaySlots | None:
+    """
+    Returns the free slots for one day ('YYYY-MM-DD'): computed locally by SLOT_ENGINE when
+    it is ready, otherwise Cal.com's, served from SLOT_CACHE when fresh.
+    Returns None if Cal.com could not be reached.
+    """
+    local = local_day_slots(event_type_id, day)
+    if local is not None:
+        return local
+
+    cached = SLOT_CACHE.get(event_type_id, day)
+    if cached is None and await _await_prefetch(event_type_id):
+        cached = SLOT_CACHE.get(event_type_id, day)
+    if cached is not None:
+        return cached
+
+    generation = SLOT_CACHE.generation
+    slots_data = await _request_slots(event_type_id, day, day)
+    if slots_data is None:
+        return None
+
+    raw = []
+    if isinstance(slots_data, dict):
+        raw = slots_data.get(day, [])
+    elif isinstance(slots_data, list):
+        raw = slots_data
+
+    day_slots = DaySlots.from_cal(day, raw)
+    SLOT_CACHE.put(event_type_id, day, day_slots, generation)
+    return day_slots
+
+
+def _week_days() -> list:
+    today = datetime.now(ZoneInfo("Asia/Kolkata")).date()
+    return [(today + timedelta(days=i)).strftime("%Y-%m-%d") for i in range(8)]
+
+
+async def fetch_week_slots(event_type_id) -> dict | None:
+    """
+    Returns {'YYYY-MM-DD': DaySlots} for today plus the 7-day booking horizon,
+    computed locally when SLOT_ENGINE is ready and from Cal.com otherwise.
+    """
+    days = _week_days()
+    if SLOT_ENGINE.ready:
+        week = {day: local_day_slots(event_type_id, day) for day in days}
+        if None not in week.values():
+            return week
+    return await fetch_remote_week_slots(event_type_id)
+
+
+async def fetch_remote_week_slots(event_type_id) -> dict | None:
+    """
+    Cal.com's view of the 7-day window. Answers from SLOT_CACHE when every day is cached,
+    otherwise does one ranged /v1/slots call and writes each day through to the cache.
+    Every answer is also used to reconcile SLOT_ENGINE.
+    """
+    days = _week_days()
+
+    cached = _cached_week(event_type_id, days)
+    if cached is None and await _await_prefetch(event_type_id):
+        cached = _cached_week(event_type_id, days)
+    if cached is not None:
+        SLOT_ENGINE.reconcile(get_event_type(event_type_id), cached)
+        return cached
+
+    generation = SLOT_CACHE.generation
+    slots_data = await _request_slots(event_type_id, days[0], days[-1])
+    if slots_data is None:
+        return None
+    if not isinstance(slots_data, dict):
+        # Rare case where V1 returns list for single day, unlikely for range query
+        slots_data = {}
+
+    week = {day: DaySlots.from_cal(day, slots_data.get(day, [])) for day in days}
+    for day, day_slots in week.items():
+        SLOT_CACHE.put(event_type_id, day, day_slots, generation)
+    if generation == SLOT_CACHE.generation:
+        SLOT_ENGINE.reconcile(get_event_type(event_type_id), week)
+    return week
+
+
+def _cached_week(event_type_id, days: list) -> dict | None:
+    week = {}
+    for day in days:
+        day_slots = SLOT_CACHE.get(event_type_id, day)
+        if day_slots is None:
+            return None
+        week[day] = day_slots
+    return week
+
+
+# Background 7-day prefetches, one per event type at a time
+PREFETCH_TASKS: dict = {}
+
+
+def prefetch_week_slots(event_type_id) -> asyncio.Task:
+    """
+    Starts (or reuses) a background fetch of Cal.com's 7-day slot window for an event type,
+    which also reconciles SLOT_ENGINE.
+    """
+    task = PREFETCH_TASKS.get(event_type_id)
+    if task is None or task.done():
+        task = asyncio.create_task(detached(_prefetch_week(event_type_id)))
+        PREFETCH_TASKS[event_type_id] = task
+    return task
+
+
+async def _prefetch_week(event_type_id):
+    try:
+        week = await fetch_remote_week_slots(event_type_id)
+        if week is not None:
+            logger.debug(f"Prefetched slots for event type {event_type_id}: {len(week)} days")
+    except Exception as e:
+        logger.warning(f"Slot prefetch failed for event type {event_type_id}: {e}")
+
+
+async def _await_prefetch(event_type_id) -> bool:
+    """Waits for an in-flight prefetch of this event type instead of issuing a second call."""
+    task = PREFETCH_TASKS.get(event_type_id)
+    if task is None or task.done() or task is asyncio.current_task():
+        return False
+    await within_budget(asyncio.shield(task))
+    return True
+
+
+def invalidate_slots_for(start_iso: str | None):
+    """Drops cached slots for the local day of a booking start (everything if the day is unknown)."""
+    if not start_iso:
+        SLOT_CACHE.clear()
+        return
+    try:
+        dt = datetime.fromisoformat(start_iso.replace("Z", "+00:00"))
+        SLOT_CACHE.invalidate_day(dt.astimezone(ZoneInfo("Asia/Kolkata")).strftime("%Y-%m-%d"))
+    except ValueError:
+        SLOT_CACHE.clear()
+
+
+async def warm_booking_index():
+    try:
+        await BOOKING_INDEX.ensure_fresh()
+    except Exception as e:
+        logger.warning(f"Booking index warm-up failed: {e}")
+
+
+async def warm_slot_engine():
+    """Loads (or hourly reloads) the working hours SLOT_ENGINE computes slots from."""
+    if not SLOT_ENGINE.schedule_due():
+        return
+    try:
+        await CAL_FLIGHTS.do(("schedule", CAL_COM_API_URL), SLOT_ENGINE.load_schedule)
+    except Exception as e:
+        logger.warning(f"Slot engine schedule load failed, using Cal.com slots: {e}")
+
+
+def find_booking_start(bookings: list[BookingRef], booking_uid: str) -> str | None:
+    """Looks up the start time of a booking the caller was shown earlier."""
+    for b in bookings:
+        if b.uid == booking_uid:
+            return b.start_iso()
+    return None
+
+
+# Total seconds each tool may spend (filler included) before falling back to a spoken reply
+TOOL_BUDGETS = {
+    "input_phone": 5.0,
+    "list_available_services": 4.0,
+    "get_availability": 6.0,
+    "check_available_days": 6.0,
+    "list_bookings": 6.0,
+    "create_booking": 15.0,
+    "cancel_booking": 10.0,
+    "cancel_all_bookings": 15.0,
+    "reschedule_booking": 20.0,
+}
+
+# intent_manage's `action` values (and what callers tend to say instead) to FSM intents
+MANAGE_ACTIONS = {
+    "cancel": "cancel",
+    "reschedule": "reschedule",
+    "update": "reschedule",
+    "change": "reschedule",
+    "cancel_all": "cancel_all",
+}
+
+# Approximate tokens each tool's result may take in the chat context (default: DEFAULT_TOKEN_BUDGET)
+TOOL_TOKEN_BUDGETS = {
+    "get_availability": 50,
+    "check_available_days": 40,
+    "list_available_services": 70,
+    "list_bookings": 80,
+    "cancel_all_bookings": 80,
+}
+
+# Room left in a list result's budget for its header and the "and K more" note
+LIST_OVERHEAD_TOKENS = 25
+
+TOOL_RESULTS = ToolResults(TOOL_TOKEN_BUDGETS)
+
+# Core prompts per (project, catalogue version, date)
+PROMPT_CACHE = PromptCache()
+
+# Prompt tokens and time to first token of LLM requests, per FSM state
+PROMPT_STATS = PromptStats()
+
+# Only send the LLM the tools the FSM state needs (AGENT_SCOPED_TOOLS=0 sends all of them)
+SCOPED_TOOLS = os.getenv("AGENT_SCOPED_TOOLS", "1") != "0"
+TOOL_EXPOSURE = ToolExposure()
+
+
 class SilenceMonitor:
     """Monitors user silence and prompts if no response after timeout."""
     
@@ -501,246 +870,63 @@ class FillerAudioManager:
         await self.session.say(phrase, allow_interruptions=True)
 
 
-class Assistant(Agent):
-    def __init__(self, agent_config: dict) -> None:
-        # Build dynamic instructions based on available services
-        services = get_all_services()
-        service_list = "\n".join([f"- **{s['title']}**: {s['duration']} minutes" for s in services])
-        
-        now = datetime.now(ZoneInfo("Asia/Kolkata"))
-        today_str = now.strftime("%A, %d %B %Y")
-
-        agent_name = agent_config.get("agentName", "Default Agent")
-        business_name = agent_config.get("businessName", "Business")
-        greeting = agent_config.get("greeting", "Hello!")
-        industry = agent_config.get("industry", "Service")
-        
-        instructions = f"""
-        You are {agent_name}, the head receptionist at {business_name}. You represent a {industry}.
-
-Current Date: {today_str} (Year: {now.year})
-Location: Asia/Kolkata
-
-### LANGUAGE BEHAVIOR (AUTO-DETECT):
-1. **Dynamic Switching**: You must automatically detect the language the user is speaking based on their input.
-2. **Mirror Language**: ALWAYS reply in the exact same language the user just spoke.
-3. **No Explicit Check**: Do NOT ask the user which language they prefer. Just adapt immediately.
-
-### STRICT DOMAIN RESTRICTION:
-- **YOU ARE A SALON RECEPTIONIST ONLY.**
-- **ABSOLUTELY NO JOKES**: If asked to tell a joke, riddle, or story, YOU MUST REFUSE politely.
-  - User: "Tell me a joke."
-  - You: "I'm afraid I don't know any jokes, but I can help you book a great haircut!"
-- **NO OFF-TOPIC ANSWERS**: Do not answer questions about math, coding, history, or general trivia.
-- **SCOPE**: Limit all conversation to: Salon Services, Appointments, Rescheduling, Cancellations, and Time/Date availability.
-- **PIVOT BACK**: If the user goes off-topic, politely bring them back to the salon context immediately.
-
-### Available Services (INTERNAL USE ONLY - DO NOT READ LIST):
-{service_list if service_list else "Services will be loaded dynamically from Cal.com"}
-
-### Rules for Services:
-1. **Allowed Services**: Only accept bookings for the services listed above.
-2. **Handle Unavailable Services (Friendly Pivot)**:
-   - If a user asks for a service we don't have (especially manicure/pedicure):
-     - **Say warmly**: "We are thinking to add this in our salon soon! But for now..."
-     - **Suggest Alternative**: "...we have a relaxing spa treatment you might like."
-     - **Then Ask**: "Was there any other service you were looking for?" (DO NOT list services)
-3. **Booking Horizon**: You can only book appointments up to 7 days in advance. If a user requests a date beyond one week, politely decline and explain the limit.
-
-### Natural Speech Guidelines:
-**You are having a REAL CONVERSATION, not reading a script.**
-
-**CRITICAL - NO AI BUZZWORDS OR ROBOTIC SPEECH:**
-- **ABSOLUTELY BANNED WORDS**: "assist", "process", "initiate", "execute", "validate", "affirmative", "negative", "query", "function", "detected", "ensure", "acknowledge", "apologies", "commencing", "system", "provide", "utilize".
-- **ABSOLUTELY BANNED PHRASES**: "How can I assist you?", "Please provide...", "I have successfully...", "I will now...", "I understand that...", "As an AI...", "I apologize...", "Upon checking..."
-- **Talk Simple**: Use everyday human words. Talk like a friend.
-  - ❌ "I successfully processed your booking." -> ✅ "Great, I've booked that for you."
-  - ❌ "Please provide your input." -> ✅ "So, what do you think?"
-  - ❌ "Authentication required." -> ✅ "I just need to check if it's you."
-  - ❌ "I have detected silence." -> ✅ "Are you still there?"
-  - ❌ "I apologize for the delay." -> ✅ "Sorry for the wait."
-  - ❌ "Please state your preference." -> ✅ "What would you like?"
-
-**Conversation Style:**
-- Use natural pauses: "Okay...", "Alright...", "Let me see...", "Perfect..."
-- Add brief thinking moments: "Hmm...", "One moment...", "Let me check..."
-- Speak conversationally with filler words where natural
-- Keep responses SHORT (1-3 sentences) with natural breaks between thoughts
-- Sound warm and helpful, like a friendly Indian receptionist
-- **Persona**: You are speaking to Indian customers. Use an Indian English cadence and vocabulary where appropriate. Expect Indian English accents from users.
-**Language Modes**:
-   - **ENGLISH MODE**:
-     - Speak fluent, natural English.
-     - **Numbers**: Use standard digits or words (e.g., "5:00 PM", "30 minutes"). The TTS reads these correctly in English.
-     - **PHONE NUMBERS**: ALWAYS speak phone numbers in English digits (e.g. "9 8 7..."). NEVER transliterate phone numbers to Hindi (e.g. NEVER say "nau aath saat") in English mode.
-   
-    - **HINDI MODE (HINGLISH)**:
-      - **NO PURE/FORMAL HINDI**: Do NOT use complex words like "uplabdh", "prakriya", "pushti", "kripya", "avashyakta".
-      - **USE EVERYDAY LANGUAGE**: Talk like a normal Indian person in casual conversation.
-      - **KEEP ENGLISH TERMS**: Always use English words for: "Appointment", "Booking", "Service", "Time", "Date", "Phone number", "Available", "Confirm".
-        - ❌ "Kya yeh samay uplabdh hai?" -> ✅ "Kya yeh time available hai?"
-        - ❌ "Main aapki booking ki pushti karti hoon." -> ✅ "Main aapki booking confirm kar deti hoon."
-        - ❌ "Kripya apna phone number batayein." -> ✅ "Apna phone number bata dijiye please."
-      - Speak fluent, conversational Hindi/Hinglish.
-     - **CRITICAL FOR NUMBERS (EXCEPT PHONE)**: For quantities, time, and dates, use Hindi words.
-       - "5:00 PM" -> "paanch baje"
-       - "15 mins" -> "pandrah minute"
-       - "2 services" -> "do services"
-     - **PHONE NUMBERS**: ALWAYS speak phone numbers in English digits (e.g. "9 8 7..."). NEVER transliterate phone numbers to Hindi (e.g. NEVER say "nau aath saat") even in Hindi mode.
-     - **NEVER** output digits (e.g., "5") in Hindi mode for general numbers. ALWAYS spell them out ("paanch"). Phone numbers are the ONLY exception.
-
-    - **DATE PRONUNCIATION (ALL MODES)**:
-      - **ALWAYS** speak dates naturally: "January 2nd", "2nd of Jan", "March 15th".
-      - **NEVER** speak ISO dates like "2024-01-02" or "02 Jan".
-      - If you see "2026-01-02", say "January 2nd".
-
-    - **PHONE NUMBER PRONUNCIATION**:
-      - **CONTINUOUS DIGITS**: Speak the digits in a single steady stream.
-      - **NO PAUSES**: Do NOT group digits. Do NOT add spaces.
-      - **FORMAT**: Output "9876543210" (Good). "98765 43210" (Bad - creates pause). "987-654..." (Bad).
-      - **IGNORE PREFIX**: If the number is "+919876543210", just say "9876543210".
-
-### Upselling Related Services:
-**You should gently suggest related/complementary services to enhance the customer experience.**
-
-**IMPORTANT LIMITS**: 
-- Suggest related services MAXIMUM 2-3 times per conversation
-- Stop suggesting after 2-3 attempts, even if politely declined
-- Never be pushy - keep suggestions brief and natural
-- Never be pushy - keep suggestions brief and natural
-- If customer declines once, try only 1-2 more times maximum
-- **GENDER AWARENESS**:
-  - If the user is **FEMALE** (e.g. "I'm a girl", "she/her" context), **NEVER** suggest beard trims.
-  - If the user is **MALE**, you can suggest beard trims.
-
-**Suggestion Opportunities**:
-1. **After initial service is chosen** (First opportunity):
-   - "Great choice... you know, a lot of our customers also love pairing that with [related service]. Would you be interested?"
-   
-2. **After date/time is confirmed** (Second opportunity - only if first was declined):
-   - "Perfect... by the way, we also have [related service] available that day. Want to add that on?"
-
-3. **Before final confirmation** (Third opportunity - only if needed):
-   - "Just so you know... [related service] goes really well with what you've booked. Should I add that too?"
-
-**Related Service Examples**:
-- Haircut → Hair color, hair treatment, beard trim
-- Facial → Cleanup, face massage
-- Massage → Body scrub, aromatherapy
-- Manicure → Pedicure
-- Hair color → Hair treatment, haircut
-
-**Suggestion Style**: Keep it natural and brief:
-- "Oh, and by the way..."
-- "A lot of people also like to..."
-- "Just a thought..."
-- "You might also enjoy..."
-
-**STOP suggesting if**:
-- Customer says "no", "just this", "not interested", "only the [service]"
-- You've already suggested 2-3 times
-- Customer sounds rushed or annoyed
-
-### Conversation Flow - ADAPTIVE ORDER WITH AUTO-AVAILABILITY CHECK:
-
-**The user may provide all details upfront OR one at a time. Adapt accordingly.**
-
-#### When user provides multiple details at once:
-- Extract what they've given: service, date, time
-- **CRITICAL: If they provide a DATE (with or without time), IMMEDIATELY call get_availability for that date**
-- Only ask for what's MISSING after checking availability
-
-#### Information Priority Order:
-
-0. **Language**: (PROMPT FIRST) If language is not established, ask for it immediately.
-
-1. **Service**: If not clear, ask naturally: 
-   - "So... what service do you need today?" OR "What service are you looking for?" 
-   - **DO NOT** list the available services. Salons have too many services to list. Just ask what they want.
-   - Only list services if the user specifically asks "What services do you have?"
-   - **After they choose, make your FIRST related service suggestion (if appropriate)**
-   - **MANDATORY QUESTION**: Once the service is confirmed, you MUST ask EXACTLY: "Is there any specific day or date in your mind or should I check the availability?"
-
-2. **Date / Availability Check**:
-   - **Scenario A: User provides a specific Date/Day**:
-     - IMMEDIATELY call get_availability for that date.
-     - Then ask for a particular time slot.
-   - **Scenario B: User says "Check availability", "Suggest days", or does not provide a specific date**:
-     - IMMEDIATELY call check_available_days.
-     - **Response**: Repeat the availability message returned by the tool exactly (e.g. "We are available today and any time..." or "We are full today..."). Do NOT list specific dates unless asked.
-   - **NOTE**: Using "tomorrow" or "current date" ({today_str}) implies {now.year}
-
-3. **Time Selection**:
-   - **Ask**: "What time would you prefer?"
-   - **DEFAULT: If user provides ONLY a time (e.g. "I want 5 PM") without a date, YOU MUST ASSUME THE DATE IS TODAY.**
-   - **Scenario A: User requests a specific time (e.g., "4:00 PM")**:
-     - Call get_availability for the date (do NOT specify a period unless user did).
-     - **Check Result**: Is the requested time in the available list?
-       - **YES**: "Perfect, that time works!" -> Proceed to Phone/Email.
-       - **NO**: Check the list for the **NEAREST** available slots. Say: "That time isn't available, but I have [Nearest Slot 1] and [Nearest Slot 2]. Do either of those work?"
-   - **Scenario B: User says "Check availability", "Suggest a time", or gives no specific time**:
-     - Call get_availability for the date.
-     - **Response**: Suggest 3 available slots from the list. "I have openings at [Time 1], [Time 2], and [Time 3]."
-     - **Fallback**: "If those don't work, let me know what time you're looking for." (Allow explicit choice).
-   - **After confirming time, make your SECOND related service suggestion (if appropriate)**
-
-4. **Phone**: If missing, ask warmly:
-   - "Great... and can I get your phone number for the booking?"
-
-5. **Email & OTP**:
-   - Ask for the user's **email address** to send a verification code.
-   - **VERIFICATION STEP**: When the user provides the email, YOU MUST SPELL IT OUT , character-by-character, with clearly audible pauses to confirm accuracy  (e.g., "p.. r.. i.. y.. a.. at gmail dot com"). 
-   - Ask "Is that correct?" and wait for their confirmation.
-   - **If they confirm (yes)**: Call `send_otp` with the confirmed email.
-   - **If they correct you**: Ask for the email again.
-   - Ask the user for the code ("I've sent a code to your email..."). 
-   - **Call `verify_otp`** with the code they provide.
-   - **CRITICAL**: Do NOT proceed to confirmation until `verify_otp` returns success.
-
-6. **Confirmation**: After ALL info collected AND OTP verified, confirm:
-   - **Before confirming, make your THIRD and FINAL related service suggestion (if needed and appropriate)**
-   - "Okay, so just to make sure I have this right... I'm booking [Service] on [date] at [time]... and I have your number as [phone (digits only, no spaces)]."
-   - Brief pause, then: "Should I go ahead and confirm that for you?"
-
-7. **EXECUTION**: When the user provides verbal confirmation (e.g. "yes", "go ahead"), you MUST call the `create_booking` tool immediately with the details collected. Do not ask more questions. JUST CALL THE TOOL.
-8. **Handling Rejection**: If they say "no" to confirmation, ask what they would like to change.
-
-### CRITICAL RULES:
-- **AUTO-CHECK: If they provide a DATE or TIME, IMMEDIATELY call get_availability for that date****
-- **OTP REQUIRED**: You MUST verify the user's email with an OTP before creating a booking.
-- Extract ALL information provided upfront - don't re-ask for what they already told you
-- Suggested slots are just EXAMPLES - accept ANY valid time within available periods
-- Ask ONE question at a time for missing information only
-- Do NOT ask for the user's name (use defaults)
-- YOU MUST ask for the phone number if not provided
-- If multiple bookings match the phone number, ask identifying questions conversationally
-- **UPSELLING LIMIT: Maximum 2-3 related service suggestions per conversation - then STOP**
-- **IMPORTANT RESPONSE**: If the user says "I want this service" or confirms a service, you MUST reply: "Is there any time in your mind or should I check availability?"
-- **AUTO-CHECK: Whenever a date OR time is mentioned, IMMEDIATELY call get_availability before proceeding**
-
-### Natural Response Patterns:
-
-**Starting responses**: "Okay...", "Alright...", "Sure...", "Got it..."
-
-**Confirming**: "Perfect...", "Great...", "Sounds good..."
-
-**Transitions**: "And...", "So...", "Now..."
-
-**Upselling naturally**: "By the way...", "Oh, and...", "Just a thought...", "A lot of people also..."
-
-**Say naturally**: "So... what service are you looking for today?"
-
-**CRITICAL - NO FILLER BEFORE TOOL CALLS**: Do NOT say "Let me check", "One moment", "Let me see", "Let me pull that up", or ANY similar phrase before calling a tool. The system handles this automatically. Just call the tool silently and immediately.
-
----
-
+def state_scoped(fn):
+    """
+    Decorator: counts calls made outside the current state's toolset, and once the tool
+    has run re-scopes the agent's instructions and tools to the FSM's (possibly new) state.
+    """
+    @functools.wraps(fn)
+    async def wrapper(self, context, *args, **kwargs):
+        fsm = context.session.fsm
+        TOOL_EXPOSURE.called(fsm.state.name, fn.__name__, fn.__name__ in fsm.available_tools())
+        try:
+            return await fn(self, context, *args, **kwargs)
+        finally:
+            await self.sync_state(fsm)
+    return wrapper
 
 
-**Remember: You're a friendly salon receptionist having a natural conversation. Use pauses, think out loud briefly, keep it conversational, and gently suggest related services (max 2-3 times) to enhance their experience.**
-"""
-        super().__init__(instructions=instructions)
+class Assistant(Agent):
+    def __init__(self, agent_config: dict, fsm: FSM | None = None, project_id: str | None = None) -> None:
+        # Small core (static, tenant and daily blocks, memoized); the FSM's guidance for the
+        # current state is appended and swapped in after every tool call that changes it
+        today = datetime.now(ZoneInfo("Asia/Kolkata")).date()
+        self.core_prompt = PROMPT_CACHE.core(
+            project_id, agent_config, EVENT_TYPES_CACHE["version"], get_all_services(), today
+        )
+        fsm = fsm or FSM()
+        self.scoped_state = fsm.state.name
+        super().__init__(instructions=scoped_instructions(self.core_prompt, fsm))
+
+        self.all_tools = self.tools
+        self.schema_bytes = {
+            tool.info.name: len(json.dumps(build_legacy_openai_schema(tool), separators=(",", ":")))
+            for tool in self.all_tools
+        }
+        TOOL_EXPOSURE.full_schema_bytes = sum(self.schema_bytes.values())
+        self.exposed_tools: frozenset | None = None
+
+    async def on_enter(self):
+        await self.sync_state(self.session.fsm)
+
+    async def sync_state(self, fsm: FSM):
+        instructions = scoped_instructions(self.core_prompt, fsm)
+        if instructions != self.instructions:
+            if fsm.state.name != self.scoped_state:
+                logger.info(f"Instructions scoped to {fsm.state.name} (~{estimate_tokens(instructions)} tokens)")
+            self.scoped_state = fsm.state.name
+            await self.update_instructions(instructions)
+
+        if SCOPED_TOOLS:
+            names = fsm.available_tools()
+            if names != self.exposed_tools:
+                self.exposed_tools = names
+                await self.update_tools([tool for tool in self.all_tools if tool.info.name in names])
+                TOOL_EXPOSURE.exposed(fsm.state.name, len(names), sum(self.schema_bytes.get(n, 0) for n in names))
 
     @function_tool
+    @TOOL_RESULTS.compact
+    @state_scoped
     async def send_otp(
         self,
         context: RunContext,
@@ -769,7 +955,7 @@ Location: Asia/Kolkata
         send_otp_email(email, otp)
         logger.info(f"OTP sent to {email} (mapped from phone {fsm_ctx.phone})")
 
-        context.session.fsm.update_state(data={"email": email})
+        context.session.fsm.dispatch("otp_sent")
 
         return (
             "I've sent a verification code to your registered email. "
@@ -777,6 +963,8 @@ Location: Asia/Kolkata
         )
 
     @function_tool
+    @TOOL_RESULTS.compact
+    @state_scoped
     async def resend_otp(
         self,
         context: RunContext,
@@ -827,6 +1015,8 @@ Location: Asia/Kolkata
         )
 
     @function_tool
+    @TOOL_RESULTS.compact
+    @state_scoped
     async def verify_otp(
         self,
         context: RunContext,
@@ -863,6 +1053,8 @@ Location: Asia/Kolkata
 
 
     @function_tool
+    @TOOL_RESULTS.compact
+    @state_scoped
     async def intent_book(
         self,
         context: RunContext,
@@ -872,15 +1064,23 @@ Location: Asia/Kolkata
         return "Great! Let's get you booked."
 
     @function_tool
+    @TOOL_RESULTS.compact
+    @state_scoped
     async def intent_manage(
         self,
         context: RunContext,
+        action: Annotated[str, "What they want to do: 'cancel', 'reschedule' (also for changing a booking) or 'cancel_all'"] = "cancel",
     ):
         """User wants to cancel, update, or reschedule an existing appointment."""
-        context.session.fsm.update_state(intent="cancel")  # Will be refined by user
+        action = MANAGE_ACTIONS.get(action.strip().lower().replace(" ", "_"))
+        if action is None:
+            return "Would you like to cancel or reschedule your appointment?"
+        context.session.fsm.update_state(intent=action)
         return "I can help with that. What's your phone number?"
 
     @function_tool
+    @TOOL_RESULTS.compact
+    @state_scoped
     async def input_service(
         self,
         context: RunContext,
@@ -888,21 +1088,30 @@ Location: Asia/Kolkata
     ):
         """Capture the service the user wants to book."""
         # Validate service exists
-        service_info = find_service_by_name(service)
+        service_info = find_service_by_name(service, context.session.service_memo)
         if not service_info:
+            close = [s["title"] for s, score in rank_services(service) if score >= 0.3]
+            if close:
+                return f"I couldn't find '{service}'. Did you mean {' or '.join(close)}?"
             services = get_all_services()
             available = ", ".join([s['title'] for s in services])
             return f"I couldn't find '{service}'. Available services: {available}"
         
+        # Warm the slot cache while the caller picks a date (only a reconcile if SLOT_ENGINE answers)
+        if not SLOT_ENGINE.ready or SLOT_ENGINE.reconcile_due(service_info["id"]):
+            prefetch_week_slots(service_info["id"])
+
         # Update FSM with validated service
         context.session.fsm.update_state(data={"service": service_info["title"]})
         return f"Perfect! {service_info['title']} it is."
 
     @function_tool
+    @TOOL_RESULTS.compact
+    @state_scoped
     async def input_date(
         self,
         context: RunContext,
-        date: Annotated[str, "Date provided by user (e.g., 'tomorrow', '25th', 'Dec 25')"],
+        date: Annotated[str, "Date as the user said it (e.g., 'tomorrow', '25th', 'Dec 25', 'next Friday', 'kal')"],
     ):
         """Capture the date the user wants to book."""
         # Store the date in FSM
@@ -920,6 +1129,8 @@ Location: Asia/Kolkata
             return f"Got it, {date}."
 
     @function_tool
+    @TOOL_RESULTS.compact
+    @state_scoped
     async def input_time(
         self,
         context: RunContext,
@@ -945,6 +1156,9 @@ Location: Asia/Kolkata
         return f"Okay, {response_time}."
 
     @function_tool
+    @TOOL_RESULTS.compact
+    @state_scoped
+    @tool_budget(TOOL_BUDGETS["input_phone"])
     async def input_phone(
         self,
         context: RunContext,
@@ -962,38 +1176,25 @@ Location: Asia/Kolkata
         context.session.fsm.update_state(data={"phone": normalized})
         
         # For manage flow, fetch bookings
-        if context.session.fsm.state == State.MANAGE_ASK_PHONE or fsm_ctx.intent in ["cancel", "update", "reschedule", "cancel_all"]:
+        if context.session.fsm.state == State.MANAGE_ASK_PHONE or fsm_ctx.intent in MANAGE_INTENTS:
             try:
-                async with httpx.AsyncClient() as client:
-                    response = await client.get(
-                        f"{CAL_COM_API_URL}/bookings",
-                        headers={
-                            "Authorization": f"Bearer {CAL_COM_API_KEY}",
-                            "cal-api-version": "2024-08-13",
-                        },
-                        params={"status": "upcoming"},
-                        timeout=10.0,
-                    )
-
-                if response.status_code == 200:
-                    bookings = response.json().get("data", [])
-                    matched = []
-                    for booking in bookings:
-                        booking_phone = extract_booking_phone(booking)
-                        if booking_phone and normalize_phone(booking_phone) == normalized:
-                            matched.append(booking)
-                    
-                    context.session.fsm.update_state(data={"phone": normalized, "bookings": matched})
-                    
-                    if not matched:
-                        return "I couldn't find any bookings with this number."
-                    elif len(matched) == 1:
-                        b = matched[0]
-                        dt = datetime.fromisoformat(b["start"].replace("Z", "+00:00"))
-                        dt_local = dt.astimezone(ZoneInfo("Asia/Kolkata"))
-                        return f"Found your {b.get('title', 'appointment')} on {dt_local.strftime('%B %d at %I:%M %p')}."
-                    else:
-                        return f"I found {len(matched)} bookings for this number."
+                matched = await BOOKING_INDEX.find(normalized)
+
+                context.session.fsm.update_state(data={"phone": normalized, "bookings": matched})
+
+                if not matched:
+                    return "I couldn't find any bookings with this number."
+                elif len(matched) == 1:
+                    b = matched[0]
+                    dt = datetime.fromisoformat(b["start"].replace("Z", "+00:00"))
+                    dt_local = dt.astimezone(ZoneInfo("Asia/Kolkata"))
+                    handle = context.session.booking_handles.handle(b["uid"])
+                    return f"Found your {b.get('title', 'appointment')} ({handle}) on {dt_local.strftime('%B %d at %I:%M %p')}."
+                else:
+                    return f"I found {len(matched)} bookings for this number."
+            except CalUnavailableError as e:
+                logger.warning(f"Booking lookup unavailable: {e}")
+                return "Got your phone number, but I can't pull up your bookings right this moment. Could you give me a second and ask again?"
             except Exception as e:
                 logger.error(f"Error fetching bookings: {e}")
                 return "Got your phone number."
@@ -1017,8 +1218,8 @@ Location: Asia/Kolkata
             send_otp_email(email, otp)
             logger.info(f"Auto-sent OTP to {email} (from phone {normalized})")
 
-            # Force FSM to OTP_VERIFY state
-            context.session.fsm.state = State.OTP_VERIFY
+            # Reaches OTP_VERIFY even if a parallel call hasn't moved the FSM to BOOKING_ASK_PHONE yet
+            context.session.fsm.dispatch("otp_sent")
 
             return (
                 "Got your number! I've sent a verification code to your registered email. "
@@ -1028,16 +1229,21 @@ Location: Asia/Kolkata
         return "Got your phone number."
 
     @function_tool
+    @TOOL_RESULTS.compact
+    @state_scoped
     async def select_booking(
         self,
         context: RunContext,
-        booking_uid: Annotated[str, "UID of the booking selected by user"],
+        booking_uid: Annotated[str, "Handle of the booking selected by user, e.g. 'b2'"],
     ):
         """User has selected a specific booking from multiple options."""
+        booking_uid = context.session.booking_handles.resolve(booking_uid)
         context.session.fsm.update_state(data={"booking_uid": booking_uid})
         return "Got it, I've selected that booking."
 
     @function_tool
+    @TOOL_RESULTS.compact
+    @state_scoped
     async def confirm_action(
         self,
         context: RunContext,
@@ -1047,6 +1253,9 @@ Location: Asia/Kolkata
         return "Confirmed!"
 
     @function_tool
+    @TOOL_RESULTS.compact
+    @state_scoped
+    @tool_budget(TOOL_BUDGETS["list_available_services"])
     async def list_available_services(
         self,
         context: RunContext,
@@ -1059,23 +1268,27 @@ Location: Asia/Kolkata
             if not services:
                 return "I couldn't fetch the available services right now."
             
-            service_list = []
-            for service in services:
-                service_list.append(f"{service['title']} ({service['duration']} min)")
-            
-            
-            full_list = ', '.join(service_list)
+            # The instruction goes first so trimming to the budget only ever drops services
+            full_list = ", ".join(f"{service['title']} {service['duration']}m" for service in services)
             return (
-                f"Available services (internal list): {full_list}. "
-                "(SYSTEM NOTE: Do NOT read this full list to the user. "
-                "Instead, say exactly: 'We offer haircut, hairwash, spa, makeup, beard trim and more.' "
-                "**IMPORTANT**: If the user identifies as female (e.g. 'I'm a girl'), REMOVE 'beard trim' from this list when speaking.)"
+                f"Say only: '{spoken_services(services)}' "
+                "Leave out beard trims if the caller is female. "
+                f"Internal list, do not read out: {full_list}"
             )
+        except CalUnavailableError as e:
+            logger.warning(f"Service list unavailable: {e}")
+            services = get_all_services()
+            if not services:
+                return "I couldn't fetch the available services right now."
+            return spoken_services(services)
         except Exception as e:
             logger.error(f"Error listing services: {e}")
             return "I couldn't fetch the service list right now."
 
     @function_tool
+    @TOOL_RESULTS.compact
+    @state_scoped
+    @tool_budget(TOOL_BUDGETS["create_booking"])
     async def create_booking(
         self,
         context: RunContext,
@@ -1088,7 +1301,7 @@ Location: Asia/Kolkata
         await context.session.filler.play("booking")
         try:
             # Find the service
-            service_info = find_service_by_name(service)
+            service_info = find_service_by_name(service, context.session.service_memo)
             
             if not service_info:
                 services = get_all_services()
@@ -1099,7 +1312,11 @@ Location: Asia/Kolkata
             if time.lower().strip() in ["morning", "afternoon", "evening", "evening"]:
                  return f"At what time in the {time} would you like to book?"
 
-            current_start_str = parse_datetime(date, time)
+            try:
+                current_start_str = parse_datetime(date, time)
+            except ValueError as e:
+                logger.info(f"create_booking: {e}")
+                return "I didn't catch the date and time. Which day and time would you like?"
             
             # Validate booking time
             try:
@@ -1128,57 +1345,67 @@ Location: Asia/Kolkata
             }
             
             logger.info(f"Booking payload: {payload}")
-            
-            async with httpx.AsyncClient() as client:
-                res = await client.post(
-                    f"{CAL_COM_API_URL}/bookings",
-                    headers={
-                        "Authorization": f"Bearer {CAL_COM_API_KEY}",
-                        "Content-Type": "application/json",
-                        "cal-api-version": "2024-08-13",
-                    },
-                    json=payload,
-                    timeout=15.0,
-                )
-                
-                if res.status_code in (200, 201):
-                    # Send confirmation email
+
+            key = idempotency_key(
+                context.session.session_id, service_info["slug"], current_start_str, normalize_phone(guest_phone)
+            )
+            result = await BOOKING_SUBMITTER.submit(payload, key)
+
+            if result.ok:
+                invalidate_slots_for(current_start_str)
+                BOOKING_INDEX.upsert(result.booking, normalize_phone(guest_phone))
+
+                # Send confirmation email (once, even if the tool call was repeated)
+                if not result.replayed:
                     from otp_service import send_booking_confirmation_email
                     user_email = context.session.fsm.ctx.email or "guest@voice.ai"
                     send_booking_confirmation_email(user_email, service_info['title'], date, time)
-                    
-                    spoken_date = format_spoken_date(dt_local)
-                    return f"Great! I've booked your {service_info['title']} for {spoken_date} at {time}. I've also sent the confirmation to your email."
-                else:
-                    error_text = res.text
-                    logger.error(f"Booking failed: {res.status_code} - FULL RESPONSE: {error_text}")
-                    logger.error(f"Booking payload was: {payload}")
-                    return f"I couldn't book the {service_info['title']} for that time. Should we try a different slot?"
-
+                
+                spoken_date = format_spoken_date(dt_local)
+                return f"Great! I've booked your {service_info['title']} for {spoken_date} at {time}. I've also sent the confirmation to your email."
+            else:
+                error_text = result.error
+                logger.error(f"Booking failed: {result.status_code} - FULL RESPONSE: {error_text}")
+                logger.error(f"Booking payload was: {payload}")
+                return f"I couldn't book the {service_info['title']} for that time. Should we try a different slot?"
+
+        except CalUnavailableError as e:
+            logger.warning(f"Booking unavailable: {e}")
+            return "Our booking system is responding slowly, so I couldn't confirm that booking yet. Shall I try again in a moment?"
         except Exception as e:
             logger.error(f"Booking error: {e}")
             return "I had trouble booking that. Can we try again?"
 
     @function_tool
+    @TOOL_RESULTS.compact
+    @state_scoped
+    @tool_budget(TOOL_BUDGETS["get_availability"])
     async def get_availability(
         self,
         context: RunContext,
         date: Annotated[str, "Date (YYYY-MM-DD or tomorrow)"],
         service: Annotated[str, "Service title"],
         period: Annotated[str, "Optional: morning|afternoon|evening"] = "",
+        time: Annotated[str, "Optional: the time the caller asked for, e.g. '4:30 PM'"] = "",
     ):
-        """Check availability for a specific service on a given date."""
+        """
+        Check availability for a specific service on a given date. With a requested time,
+        says whether it is free and returns the nearest open times; otherwise the open ranges.
+        """
         await context.session.filler.play("checking")
         try:
             # Find the service
-            service_info = find_service_by_name(service)
+            service_info = find_service_by_name(service, context.session.service_memo)
             
             if not service_info:
                 services = get_all_services()
                 available = ", ".join([s['title'] for s in services])
                 return f"I couldn't find '{service}'. Available services: {available}"
             
-            iso = parse_datetime(date, "12:00 PM")
+            try:
+                iso = parse_datetime(date, "12:00 PM")
+            except ValueError:
+                return f"I didn't catch the date '{date}'. Which day would you like?"
             dt = datetime.fromisoformat(iso.replace("Z", "+00:00"))
             now_local = datetime.now(ZoneInfo("Asia/Kolkata"))
             note_prefix = ""
@@ -1193,85 +1420,50 @@ Location: Asia/Kolkata
 
             formatted_date = dt.strftime("%Y-%m-%d")
 
-            # Get availability using V1 slots endpoint (still works with V2 auth)
-            params = {
-                "apiKey": CAL_COM_API_KEY,
-                "eventTypeId": service_info["id"],
-                "startTime": f"{formatted_date}T00:00:00.000Z",
-                "endTime": f"{formatted_date}T23:59:59.999Z",
-            }
-            
-            async with httpx.AsyncClient() as client:
-                res = await client.get(
-                    "https://api.cal.com/v1/slots",
-                    params=params,
-                    timeout=10.0,
-                )
-
-            if res.status_code != 200:
-                logger.error(f"Availability check failed: {res.status_code} {res.text}")
+            day_slots = await fetch_day_slots(service_info["id"], formatted_date)
+            if day_slots is None:
                 return "What time would you like to schedule?"
 
-            json_data = res.json()
-            slots_data = json_data.get("slots", json_data)
-            
-            day_slots = []
-            if isinstance(slots_data, dict):
-                day_slots = slots_data.get(formatted_date, [])
-            elif isinstance(slots_data, list):
-                day_slots = slots_data
-
-            if not day_slots:
+            period_clean = (period or "").strip().lower()
+            if period_clean and period_clean not in PERIODS:
+                return "Please choose one of: morning, afternoon, or evening."
+
+            requested = None
+            clock = resolve_time(time) if time else None
+            if clock is not None:
+                requested = clock.hour * 60 + clock.minute
+
+            # A free time is free whatever part of the day the caller called it
+            if requested is not None and day_slots.contains(requested):
+                return f"{note_prefix}{format_minute(requested)} on {formatted_date} is available."
+            if not len(day_slots):
                 return note_prefix + f"No slots available on {formatted_date}. Try another day."
 
-            slots_local = []
-            for s in day_slots:
-                ts_str = s.get("time")
-                if not ts_str:
-                    continue
-                dt_slot = datetime.fromisoformat(ts_str.replace("Z", "+00:00"))
-                slots_local.append(dt_slot.astimezone(ZoneInfo("Asia/Kolkata")))
-
-            if not slots_local:
-                return note_prefix + f"No slots available on {formatted_date}. Try another day."
+            found = day_slots.query(requested, period_clean or None, k=3)
+            if not found.total:
+                # Only the period is full: offer the rest of the day
+                if requested is None:
+                    others = summarize_slots(day_slots)
+                else:
+                    others = ", ".join(format_minute(m) for m in day_slots.query(requested, k=3).nearest)
+                return f"{note_prefix}Nothing free in the {period_clean} on {formatted_date}. Open times that day: {others}."
 
-            def in_period(d: datetime, p: str) -> bool:
-                h = d.hour
-                if p == "morning":
-                    return 6 <= h < 12
-                if p == "afternoon":
-                    return 12 <= h < 17
-                if p == "evening":
-                    return 17 <= h < 22
-                return False
-
-            period_clean = (period or "").strip().lower()
-            
-            matched = []
-            if not period_clean:
-                 # IF NO PERIOD IS SPECIFIED, RETURN ALL SLOTS
-                 matched = slots_local
-            else:
-                if period_clean not in ("morning", "afternoon", "evening"):
-                    return "Please choose one of: morning, afternoon, or evening."
-                matched = [s for s in slots_local if in_period(s, period_clean)]
-            
-            if not matched:
-                 return note_prefix + f"No slots available on {formatted_date}."
-            matches_times = [s.strftime("%I:%M %p") for s in matched]
-            
-            return (
-                f"{note_prefix}Here are all the available slots: {', '.join(matches_times)}. "
-                "(SYSTEM NOTE: Only verbally list the first 3 options to the user. "
-                "If the user requested a specific time that is NOT in this list, suggest the NEAREST times from this list. "
-                "Accept ANY time from the full list above if the user requests it.)"
-            )
+            if requested is None:
+                return f"{note_prefix}Open on {formatted_date}: {summarize_slots(day_slots, period_clean or None)}."
+            options = ", ".join(format_minute(m) for m in found.nearest)
+            return f"{note_prefix}{format_minute(requested)} on {formatted_date} is taken. Nearest open times: {options}."
 
+        except CalUnavailableError as e:
+            logger.warning(f"Availability unavailable: {e}")
+            return "I can't see the calendar right this moment. What time would you prefer? I'll confirm it when I book."
         except Exception as e:
             logger.error(f"Error checking availability: {e}")
             return "What time would you like to schedule?"
 
     @function_tool
+    @TOOL_RESULTS.compact
+    @state_scoped
+    @tool_budget(TOOL_BUDGETS["check_available_days"])
     async def check_available_days(
         self,
         context: RunContext,
@@ -1284,62 +1476,28 @@ Location: Asia/Kolkata
         await context.session.filler.play("checking")
         try:
             # Find the service
-            service_info = find_service_by_name(service)
+            service_info = find_service_by_name(service, context.session.service_memo)
             if not service_info:
                 services = get_all_services()
                 available = ", ".join([s['title'] for s in services])
                 return f"I couldn't find '{service}'. Available services: {available}"
 
             now_local = datetime.now(ZoneInfo("Asia/Kolkata"))
-            start_date_utc = now_local.astimezone(ZoneInfo("UTC"))
-            end_date_utc = start_date_utc + timedelta(days=7) # Look ahead 7 days (limit)
-
-            params = {
-                "apiKey": CAL_COM_API_KEY,
-                "eventTypeId": service_info["id"],
-                "startTime": start_date_utc.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
-                "endTime": end_date_utc.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
-            }
-            
-            async with httpx.AsyncClient() as client:
-                res = await client.get(
-                    "https://api.cal.com/v1/slots",
-                    params=params,
-                    timeout=10.0,
-                )
 
-            if res.status_code != 200:
-                logger.error(f"Days check failed: {res.status_code} {res.text}")
+            slots_data = await fetch_week_slots(service_info["id"])
+            if slots_data is None:
                 return "I couldn't check my calendar right now. Please try proposing a specific date."
 
-            json_data = res.json()
-            slots_data = json_data.get("slots", json_data)
-            
             available_days = []
             
-            # slots_data is typically { "2023-12-22": [...], "2023-12-23": [...] }
-            if isinstance(slots_data, dict):
-                sorted_dates = sorted(slots_data.keys())
-                for date_str in sorted_dates:
-                    day_slots = slots_data[date_str]
-                    if day_slots and len(day_slots) > 0:
-                        # Check if at least one slot is in the future (if today)
-                        # Simplified: just assume if API returns it, it's valid, 
-                        # but we should filter past slots if it's strictly today.
-                        # For day-level availability, presence of slots is usually enough.
-                        try:
-                             d = datetime.strptime(date_str, "%Y-%m-%d").date()
-                             if d >= now_local.date():
-                                 available_days.append(d)
-                        except ValueError:
-                             continue
-                             
-            elif isinstance(slots_data, list):
-                # Rare case where V1 returns list for single day, unlikely for range query
-                pass
-
-            if not available_days:
-                return "I don't have any openings in the next 7 days."
+            # slots_data is { "2023-12-22": [...], "2023-12-23": [...] }
+            for date_str in sorted(slots_data.keys()):
+                day_slots = slots_data[date_str]
+                if day_slots and len(day_slots) > 0:
+                    # For day-level availability, presence of slots is usually enough.
+                    d = datetime.strptime(date_str, "%Y-%m-%d").date()
+                    if d >= now_local.date():
+                        available_days.append(d)
 
             if not available_days:
                 return "I don't have any openings in the next 7 days."
@@ -1359,15 +1517,21 @@ Location: Asia/Kolkata
             
             return "I don't have any openings in the next 7 days."
 
+        except CalUnavailableError as e:
+            logger.warning(f"Available days unavailable: {e}")
+            return "I can't see the calendar right this moment. Which day would you like? I'll check it when I book."
         except Exception as e:
             logger.error(f"Error checking available days: {e}")
             return "I couldn't check availability exactly. Please tell me a specific date you'd like."
         
     @function_tool
+    @TOOL_RESULTS.compact
+    @state_scoped
+    @tool_budget(TOOL_BUDGETS["reschedule_booking"])
     async def reschedule_booking(
         self,
         context: RunContext,
-        booking_uid: Annotated[str, "Existing booking UID"],
+        booking_uid: Annotated[str, "Existing booking handle, e.g. 'b1'"],
         new_date: Annotated[str, "New date"],
         new_time: Annotated[str, "New time (must be from availability)"],
         guest_phone: Annotated[str, "Phone number"],
@@ -1375,40 +1539,38 @@ Location: Asia/Kolkata
     ):
         """Reschedule an existing booking to a new date and time."""
         await context.session.filler.play("booking")
+        booking_uid = context.session.booking_handles.resolve(booking_uid)
         try:
-            # Cancel existing booking
-            async with httpx.AsyncClient() as client:
-                cancel_res = await client.post(
-                    f"{CAL_COM_API_URL}/bookings/{booking_uid}/cancel",
-                    headers={
-                        "Authorization": f"Bearer {CAL_COM_API_KEY}",
-                        "cal-api-version": "2024-08-13",
-                    },
-                    json={"cancellationReason": "User requested reschedule"},
-                    timeout=10.0,
-                )
-
-            if cancel_res.status_code not in (200, 201):
-                return "I couldn't cancel your existing booking."
-
-            # Find the service
-            service_info = find_service_by_name(service)
+            # Validate everything locally before touching Cal.com
+            service_info = find_service_by_name(service, context.session.service_memo)
             if not service_info:
                 services = get_all_services()
                 available = ", ".join([s['title'] for s in services])
                 return f"I couldn't find '{service}'. Available services: {available}"
 
-            # Create new booking
-            start_time = parse_datetime(new_date, new_time)
+            if new_time.lower().strip() in ["morning", "afternoon", "evening"]:
+                return f"At what time in the {new_time} would you like to move it?"
 
+            try:
+                start_time = parse_datetime(new_date, new_time)
+                dt_local = datetime.fromisoformat(start_time.replace("Z", "+00:00")).astimezone(ZoneInfo("Asia/Kolkata"))
+            except ValueError:
+                return "I didn't catch the new date and time. Can you say them again?"
+            now_local = datetime.now(ZoneInfo("Asia/Kolkata"))
+            if dt_local < now_local:
+                return "That time has already passed. Which day within the next week works for you?"
+            if dt_local > (now_local + timedelta(days=7)):
+                return "I can only book up to one week in advance. Please pick an earlier day."
+
+            phone = normalize_phone(guest_phone)
             payload = {
                 "start": start_time,
                 "eventTypeSlug": service_info["slug"],
                 "username": CAL_USERNAME,
                 "attendee": {
                     "name": "Guest",
-                    "email": "guest@voice.ai",
-                    "phoneNumber": normalize_phone(guest_phone),
+                    "email": context.session.fsm.ctx.email or "guest@voice.ai",
+                    "phoneNumber": phone,
                     "timeZone": "Asia/Kolkata",
                 },
                 "metadata": {
@@ -1416,125 +1578,167 @@ Location: Asia/Kolkata
                     "source": "rescheduled-via-voice-agent",
                 },
             }
+            key = idempotency_key(
+                context.session.session_id, f"reschedule:{booking_uid}:{service_info['slug']}", start_time, phone
+            )
 
-            async with httpx.AsyncClient() as client:
-                book_res = await client.post(
-                    f"{CAL_COM_API_URL}/bookings",
-                    headers={
-                        "Authorization": f"Bearer {CAL_COM_API_KEY}",
-                        "Content-Type": "application/json",
-                        "cal-api-version": "2024-08-13",
-                    },
-                    json=payload,
-                    timeout=15.0,
-                )
-
-            if book_res.status_code in (200, 201):
-                return f"Your {service_info['title']} appointment has been successfully rescheduled to {new_date} at {new_time}."
-
-            return "I cancelled your old booking, but couldn't create the new one. Please book again."
-
+            # One call in the common case; the old booking is only released once the new one exists.
+            # Native reschedule keeps the event type, so it's only used for the same service.
+            current = BOOKING_INDEX.get(booking_uid) or {}
+            current_slug = get_event_type(current.get("eventTypeId")).get("slug")
+            result = await BOOKING_SUBMITTER.reschedule(booking_uid, payload, key, current_slug=current_slug)
+            if not result.ok:
+                logger.error(f"Reschedule failed: {result.status_code} {result.error}")
+                return "I couldn't move your booking to that time, so your original appointment is unchanged. Should we try a different slot?"
+
+            invalidate_slots_for(find_booking_start(context.session.fsm.ctx.bookings_list, booking_uid))
+            invalidate_slots_for(start_time)
+            BOOKING_INDEX.remove(booking_uid)
+            BOOKING_INDEX.upsert(result.booking, phone)
+            return f"Your {service_info['title']} appointment has been successfully rescheduled to {format_spoken_date(dt_local)} at {new_time}."
+
+        except CalUnavailableError as e:
+            logger.warning(f"Reschedule unavailable: {e}")
+            return "Our booking system is responding slowly and I couldn't confirm the change. Let me check your bookings before we try again."
         except Exception as e:
             logger.error(f"Reschedule error: {e}")
             return "Something went wrong while rescheduling."
 
     @function_tool
+    @TOOL_RESULTS.compact
+    @state_scoped
+    @tool_budget(TOOL_BUDGETS["list_bookings"])
     async def list_bookings(
         self,
         context: RunContext,
         phone_number: Annotated[str, "Phone number used for booking"],
+        page: Annotated[int, "1 for the first bookings; the result says which page has the rest"] = 1,
     ):
         """List all upcoming bookings for a phone number."""
         await context.session.filler.play("checking")
         try:
             target_phone = normalize_phone(phone_number)
 
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{CAL_COM_API_URL}/bookings",
-                    headers={
-                        "Authorization": f"Bearer {CAL_COM_API_KEY}",
-                        "cal-api-version": "2024-08-13",
-                    },
-                    params={"status": "upcoming"},
-                    timeout=10.0,
-                )
-
-            if response.status_code != 200:
+            try:
+                matched = await BOOKING_INDEX.find(target_phone)
+            except CalUnavailableError as e:
+                logger.warning(f"Booking lookup unavailable: {e}")
+                return "I can't pull up your bookings right this moment. Could you ask me again in a few seconds?"
+            except Exception as e:
+                logger.error(f"Booking index refresh failed: {e}")
                 return "I couldn't access your bookings."
 
-            bookings = response.json().get("data", [])
-
-            # Filter by phone
-            matched = []
-            for booking in bookings:
-                booking_phone = extract_booking_phone(booking)
-                if booking_phone and normalize_phone(booking_phone) == target_phone:
-                    matched.append(booking)
-
             if not matched:
                 return "I couldn't find any bookings with this phone number."
 
-            # Format results
+            # Format results; bookings are referred to by short handles, not UIDs
+            handles = context.session.booking_handles
             results = []
             for b in matched:
-                uid = b["uid"]
-                start = b["start"]
                 title = b.get("title", "Appointment")
-                dt = datetime.fromisoformat(start.replace("Z", "+00:00"))
-                dt_local = dt.astimezone(ZoneInfo("Asia/Kolkata"))
-                spoken_date = format_spoken_date(dt_local)
+                dt_local = datetime.fromisoformat(b["start"].replace("Z", "+00:00")).astimezone(ZoneInfo("Asia/Kolkata"))
                 results.append(
-                    f"{title} on {spoken_date} at {dt_local.strftime('%I:%M %p')} (ID: {uid})"
+                    f"{handles.handle(b['uid'])}: {title}, {format_spoken_date(dt_local)} {dt_local.strftime('%I:%M %p')}"
                 )
 
-            return f"I found {len(results)} booking(s): " + "; ".join(results)
+            # Whole entries only, so every booking shown keeps its handle
+            page = max(page, 1)
+            shown, rest = page_of(results, TOOL_TOKEN_BUDGETS["list_bookings"] - LIST_OVERHEAD_TOKENS, page)
+            if not shown:
+                return f"No more bookings; all {len(results)} were listed."
+            text = f"{len(results)} booking(s): " + "; ".join(shown)
+            if rest:
+                text += f"; and {rest} more, call list_bookings with page={page + 1} for them"
+            return text
 
         except Exception as e:
             logger.error(f"List bookings error: {e}")
             return "Something went wrong while checking your bookings."
 
     @function_tool
+    @TOOL_RESULTS.compact
+    @state_scoped
+    @tool_budget(TOOL_BUDGETS["cancel_booking"])
     async def cancel_booking(
         self,
         context: RunContext,
-        booking_uid: Annotated[str, "The UID of the booking to cancel"],
+        booking_uid: Annotated[str, "Handle of the booking to cancel, e.g. 'b1'"],
         cancellation_reason: Annotated[str, "Reason for cancellation"] = "User requested cancellation",
     ):
         """Cancel an existing booking."""
         await context.session.filler.play("cancelling")
+        booking_uid = context.session.booking_handles.resolve(booking_uid)
         try:
             logger.info(f"Canceling booking: {booking_uid}")
-            
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{CAL_COM_API_URL}/bookings/{booking_uid}/cancel",
-                    headers={
-                        "Authorization": f"Bearer {CAL_COM_API_KEY}",
-                        "cal-api-version": "2024-08-13",
-                    },
-                    json={
-                        "cancellationReason": cancellation_reason,
-                    },
-                    timeout=10.0,
-                )
-                
-                if response.status_code in [200, 201]:
-                    return "Done. I've cancelled that appointment for you."
-                else:
-                    logger.error(f"Cancel booking failed: {response.text}")
-                    return "I couldn't cancel it. It might be already cancelled."
-                    
+            # Same path (breaker, budget, logging) as cancel_all_bookings and reschedule's fallback
+            if await BOOKING_SUBMITTER.cancel(booking_uid, cancellation_reason):
+                invalidate_slots_for(find_booking_start(context.session.fsm.ctx.bookings_list, booking_uid))
+                BOOKING_INDEX.remove(booking_uid)
+                return "Done. I've cancelled that appointment for you."
+            return "I couldn't cancel it just now. It might be already cancelled, or I can try again in a moment."
+
+        except CalUnavailableError as e:
+            logger.warning(f"Cancel unavailable: {e}")
+            return "Our booking system is responding slowly, so I couldn't confirm the cancellation. Shall I try again in a moment?"
         except Exception as e:
             logger.error(f"Error canceling booking: {str(e)}")
             return "I had trouble canceling that. Please try again."
 
+    @function_tool
+    @TOOL_RESULTS.compact
+    @state_scoped
+    @tool_budget(TOOL_BUDGETS["cancel_all_bookings"])
+    async def cancel_all_bookings(
+        self,
+        context: RunContext,
+        cancellation_reason: Annotated[str, "Reason for cancellation"] = "User requested cancellation",
+    ):
+        """Cancel ALL of the caller's upcoming bookings in one step. Use this instead of calling `cancel_booking` repeatedly."""
+        await context.session.filler.play("cancelling")
+        fsm_ctx = context.session.fsm.ctx
+        bookings = fsm_ctx.bookings_list
+        if not bookings:
+            return "I don't have any bookings to cancel yet. What's your phone number?"
+
+        try:
+            uids = [b.uid for b in bookings if b.uid]
+            logger.info(f"Cancelling {len(uids)} bookings")
+            succeeded, failed = await BOOKING_SUBMITTER.cancel_many(uids, cancellation_reason)
+
+            for uid in succeeded:
+                invalidate_slots_for(find_booking_start(bookings, uid))
+                BOOKING_INDEX.remove(uid)
+            fsm_ctx.bookings_list = [b for b in bookings if b.uid in failed]
+
+            if not failed:
+                context.session.fsm.update_state(intent="confirm")
+                return f"Done. I've cancelled all {len(succeeded)} appointments."
+
+            remaining = []
+            for b in fsm_ctx.bookings_list:
+                dt_local = datetime.fromtimestamp(b.start, ZoneInfo("Asia/Kolkata"))
+                handle = context.session.booking_handles.handle(b.uid)
+                remaining.append(f"{handle}: {b.title}, {format_spoken_date(dt_local)}")
+            if not succeeded:
+                return "I couldn't cancel your appointments right now. Please try again in a moment."
+            shown, rest = page_of(remaining, TOOL_TOKEN_BUDGETS["cancel_all_bookings"] - LIST_OVERHEAD_TOKENS)
+            remaining_text = "; ".join(shown) + (f"; and {rest} more (list_bookings shows them)" if rest else "")
+            return (
+                f"I cancelled {len(succeeded)} of {len(uids)} appointments. "
+                f"These are still booked: {remaining_text}. Should I try those again?"
+            )
+
+        except Exception as e:
+            logger.error(f"Error cancelling all bookings: {e}")
+            return "I had trouble cancelling those. Please try again."
+
 
 server = AgentServer()
 
 
 def prewarm(proc: JobProcess):
     proc.userdata["vad"] = silero.VAD.load()
+    restore_snapshot()
 
 
 server.setup_fnc = prewarm
@@ -1573,24 +1777,15 @@ async def my_agent(ctx: JobContext):
     print(f"[DEBUG] Project ID from participant metadata: {project_id}")
 
 
-    import httpx
-
     agent_config = {}
 
     if project_id:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{BACKEND_URL}/api/internal/projects/{project_id}",
-                headers={
-                    "Authorization": f"Bearer {VOICE_AGENT_SECRET}"
-                },
-                timeout=10.0,
-            )
-
-            if response.status_code == 200:
-                agent_config = response.json()
-            else:
-                raise Exception(f"Failed to fetch agent config: {response.status_code}")
+        if project_id in AGENT_CONFIG_CACHE:
+            # Greet with the last known config; refresh it for the next session
+            agent_config = AGENT_CONFIG_CACHE[project_id]
+            run_in_background(revalidate_agent_config(project_id))
+        else:
+            agent_config = await fetch_agent_config(project_id)
 
     print(f"[DEBUG] Agent Config: {agent_config}")
     voice_id = agent_config.get("voiceId","faf0731e-dfb9-4cfc-8119-259a79b27e12")
@@ -1599,6 +1794,21 @@ async def my_agent(ctx: JobContext):
     ctx.log_context_fields = {
         "room": ctx.room.name,
     }
+
+    async def log_worker_metrics():
+        logger.info(f"Cal.com pool stats: {pool_stats()}")
+        logger.info(f"Slot cache stats: {SLOT_CACHE.stats()}")
+        logger.info(f"Booking index stats: {BOOKING_INDEX.stats()}")
+        logger.info(f"Slot engine stats: {SLOT_ENGINE.stats()}")
+        logger.info(f"Single-flight stats: {CAL_FLIGHTS.stats()}")
+        logger.info(f"Booking submitter stats: {BOOKING_SUBMITTER.stats()}")
+        logger.info(f"Circuit breakers: {breaker_stats()}")
+        logger.info(f"Tool result sizes: {TOOL_RESULTS.stats()}")
+        logger.info(f"Prompt cache stats: {PROMPT_CACHE.stats()}")
+        logger.info(f"LLM requests per state: {PROMPT_STATS.stats()}")
+        logger.info(f"Tool exposure: {TOOL_EXPOSURE.stats()}")
+
+    ctx.add_shutdown_callback(log_worker_metrics)
     
     # 🔍 PHASE 6: Print participant metadata (includes projectId from token)
     logger.info(f"=" * 50)
@@ -1632,6 +1842,15 @@ async def my_agent(ctx: JobContext):
     await fetch_event_types()
     logger.info(f"Available services: {[s['title'] for s in get_all_services()]}")
 
+    # Load the 7-day availability window for every service in the background
+    for service in get_all_services():
+        prefetch_week_slots(service["id"])
+
+    # Build (or top up) the phone -> bookings index before anyone asks for it;
+    # with the working hours it also lets SLOT_ENGINE answer availability locally
+    run_in_background(warm_booking_index())
+    run_in_background(warm_slot_engine())
+
     # Initialize FSM
     fsm_instance = FSM()
 
@@ -1670,6 +1889,15 @@ async def my_agent(ctx: JobContext):
     filler_manager = FillerAudioManager(session)
     session.filler = filler_manager
 
+    # Resolved service names for this call, keyed by (spoken name, catalogue version)
+    session.service_memo = {}
+
+    # Stable per-call id; part of every booking idempotency key
+    session.session_id = ctx.room.name
+
+    # Short names the LLM uses for this caller's bookings instead of UIDs
+    session.booking_handles = BookingHandles()
+
     # sneeze_manager = SneezeManager(session)
     # session.sneeze_manager = sneeze_manager
 
@@ -1677,8 +1905,16 @@ async def my_agent(ctx: JobContext):
     session.silence_monitor = silence_monitor
     setup_silence_detection(session, silence_monitor)
 
+    assistant = Assistant(agent_config, fsm_instance, project_id)
+
+    @session.on("metrics_collected")
+    def on_metrics(event: MetricsCollectedEvent):
+        if isinstance(event.metrics, LLMMetrics):
+            m = event.metrics
+            PROMPT_STATS.record(assistant.scoped_state, m.prompt_tokens, m.prompt_cached_tokens, m.ttft)
+
     await session.start(
-        agent=Assistant(agent_config),
+        agent=assistant,
         room=ctx.room,
         room_options=room_io.RoomOptions(
             audio_input=room_io.AudioInputOptions(
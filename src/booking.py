@@ -2,9 +2,10 @@ import os
 import logging
 from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
-import httpx
 from dotenv import load_dotenv
 
+from cal_client import CAL_API_VERSION, get_cal_client
+
 # Ensure we load from the correct path relative to this file
 env_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".env.local")
 load_dotenv(env_path)
@@ -13,7 +14,8 @@ logger = logging.getLogger("booking_service")
 
 # Cal.com API Configuration
 CAL_COM_API_KEY = os.getenv("CAL_COM_API_KEY")
-CAL_COM_API_URL = "https://api.cal.com/v2"
+CAL_COM_BASE_URL = os.getenv("CAL_COM_BASE_URL", "https://api.cal.com")
+CAL_COM_API_URL = f"{CAL_COM_BASE_URL}/v2"
 
 # Your specific Cal.com details
 CAL_USERNAME = "harit-ramanuj-rfakbx"
@@ -107,62 +109,64 @@ def parse_datetime(date_str: str, time_str: str, timezone: str = "Asia/Kolkata")
 
 class BookingService:
     async def _get_event_type_id(self, slug: str) -> int:
-        async with httpx.AsyncClient() as client:
-            # Try V2 first (Standard Bearer Auth)
-            try:
-                res = await client.get(
-                    "https://api.cal.com/v2/event-types",
-                    headers={"Authorization": f"Bearer {CAL_COM_API_KEY}"}
-                )
-                logger.info(f"V2 Event Types Status: {res.status_code}")
-                if res.status_code == 200:
-                    data = res.json()
-                    items = data.get("data", [])
-                    
-                    found_slugs = []
-                    valid_types = []
-                    
-                    # Handle V2 Grouped Structure
-                    if isinstance(items, dict) and "eventTypeGroups" in items:
-                        groups = items["eventTypeGroups"]
-                        # groups is likely a list of groups, each containing eventTypes
-                        if isinstance(groups, list):
-                            for group in groups:
-                                event_types = group.get("eventTypes", [])
-                                valid_types.extend(event_types)
-                    
-                    # Direct check if eventTypes is somehow at top level of items dict
-                    if isinstance(items, dict) and "eventTypes" in items:
-                         valid_types.extend(items["eventTypes"])
-                         
-                    found_slugs = [t.get("slug") for t in valid_types]
-                    logger.info(f"V2 Available Slugs: {found_slugs}")
-                    
-                    for t in valid_types:
-                        if t.get("slug") == slug:
-                            return int(t.get("id"))
-            except Exception as e:
-                logger.warning(f"V2 Event Type Fetch Failed: {e}", exc_info=True)
-
-            # Fallback to V1
-            logger.info("Falling back to V1 for Event Types")
+        client = get_cal_client()
+        # Try V2 first (Standard Bearer Auth)
+        try:
             res = await client.get(
-                "https://api.cal.com/v1/event-types",
-                params={"apiKey": CAL_COM_API_KEY}
+                f"{CAL_COM_API_URL}/event-types",
+                endpoint="event-types",
+                headers={"Authorization": f"Bearer {CAL_COM_API_KEY}"}
             )
-            logger.info(f"V1 Event Types Status: {res.status_code}")
-            
-            found_slugs = []
+            logger.info(f"V2 Event Types Status: {res.status_code}")
             if res.status_code == 200:
-                types = res.json().get("eventTypes", [])
-                found_slugs = [t.get("slug") for t in types if isinstance(t, dict)]
-                logger.info(f"V1 Available Slugs: {found_slugs}")
+                data = res.json()
+                items = data.get("data", [])
                 
-                for t in types:
-                    if isinstance(t, dict) and t.get("slug") == slug:
-                        return t.get("id")
+                found_slugs = []
+                valid_types = []
+                
+                # Handle V2 Grouped Structure
+                if isinstance(items, dict) and "eventTypeGroups" in items:
+                    groups = items["eventTypeGroups"]
+                    # groups is likely a list of groups, each containing eventTypes
+                    if isinstance(groups, list):
+                        for group in groups:
+                            event_types = group.get("eventTypes", [])
+                            valid_types.extend(event_types)
+                
+                # Direct check if eventTypes is somehow at top level of items dict
+                if isinstance(items, dict) and "eventTypes" in items:
+                     valid_types.extend(items["eventTypes"])
+                     
+                found_slugs = [t.get("slug") for t in valid_types]
+                logger.info(f"V2 Available Slugs: {found_slugs}")
+                
+                for t in valid_types:
+                    if t.get("slug") == slug:
+                        return int(t.get("id"))
+        except Exception as e:
+            logger.warning(f"V2 Event Type Fetch Failed: {e}", exc_info=True)
+
+        # Fallback to V1
+        logger.info("Falling back to V1 for Event Types")
+        res = await client.get(
+            f"{CAL_COM_BASE_URL}/v1/event-types",
+            endpoint="event-types",
+            params={"apiKey": CAL_COM_API_KEY}
+        )
+        logger.info(f"V1 Event Types Status: {res.status_code}")
+        
+        found_slugs = []
+        if res.status_code == 200:
+            types = res.json().get("eventTypes", [])
+            found_slugs = [t.get("slug") for t in types if isinstance(t, dict)]
+            logger.info(f"V1 Available Slugs: {found_slugs}")
             
-            raise ValueError(f"Slug '{slug}' not found. Available: {', '.join(filter(None, found_slugs))}")
+            for t in types:
+                if isinstance(t, dict) and t.get("slug") == slug:
+                    return t.get("id")
+        
+        raise ValueError(f"Slug '{slug}' not found. Available: {', '.join(filter(None, found_slugs))}")
 
     async def create_booking(self, date: str, time: str, guest_phone: str, title: str = "30 Minute Meeting"):
         try:
@@ -197,16 +201,17 @@ class BookingService:
 
             logger.info(f"Booking Payload: {payload}")
 
-            async with httpx.AsyncClient() as client:
-                res = await client.post(
-                    f"https://api.cal.com/v1/bookings",
-                    headers={
-                        "Content-Type": "application/json",
-                        "cal-api-version": "2024-08-13",
-                    },
-                    params={"apiKey": CAL_COM_API_KEY},
-                    json=payload,
-                )
+            client = get_cal_client()
+            res = await client.post(
+                f"{CAL_COM_BASE_URL}/v1/bookings",
+                endpoint="booking-write",
+                headers={
+                    "Content-Type": "application/json",
+                    "cal-api-version": CAL_API_VERSION,
+                },
+                params={"apiKey": CAL_COM_API_KEY},
+                json=payload,
+            )
             
             logger.info(f"Booking Response Status: {res.status_code}")
             logger.info(f"Booking Response Body: {res.text}")
@@ -227,20 +232,21 @@ class BookingService:
             dt = datetime.fromisoformat(iso.replace("Z", "+00:00"))
             formatted_date = dt.strftime("%Y-%m-%d")
 
-            async with httpx.AsyncClient() as client:
-                res = await client.get(
-                    f"https://api.cal.com/v1/availability",
-                    headers={
-                        "cal-api-version": "2024-08-13",
-                    },
-                    params={
-                        "apiKey": CAL_COM_API_KEY,
-                        "dateFrom": f"{formatted_date}T00:00:00.000Z",
-                        "dateTo": f"{formatted_date}T23:59:59.999Z",
-                        "username": CAL_USERNAME,
-                        "eventTypeSlug": EVENT_TYPE_SLUG,
-                    },
-                )
+            client = get_cal_client()
+            res = await client.get(
+                f"{CAL_COM_BASE_URL}/v1/availability",
+                endpoint="slots",
+                headers={
+                    "cal-api-version": CAL_API_VERSION,
+                },
+                params={
+                    "apiKey": CAL_COM_API_KEY,
+                    "dateFrom": f"{formatted_date}T00:00:00.000Z",
+                    "dateTo": f"{formatted_date}T23:59:59.999Z",
+                    "username": CAL_USERNAME,
+                    "eventTypeSlug": EVENT_TYPE_SLUG,
+                },
+            )
 
             if res.status_code != 200:
                 logger.error(f"Availability API error: {res.status_code} - {res.text}")
@@ -289,16 +295,16 @@ class BookingService:
             target_phone = normalize_phone(phone_number)
             logger.info(f"Listing bookings for {target_phone}")
 
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{CAL_COM_API_URL}/bookings",
-                    headers={
-                        "Authorization": f"Bearer {CAL_COM_API_KEY}",
-                        "cal-api-version": "2024-08-13",
-                    },
-                    params={"status": "upcoming"},
-                    timeout=10.0,
-                )
+            client = get_cal_client()
+            response = await client.get(
+                f"{CAL_COM_API_URL}/bookings",
+                endpoint="bookings",
+                headers={
+                    "Authorization": f"Bearer {CAL_COM_API_KEY}",
+                    "cal-api-version": CAL_API_VERSION,
+                },
+                params={"status": "upcoming"},
+            )
             
             logger.info(f"List Bookings Response: {response.status_code}")
 
@@ -336,24 +342,24 @@ class BookingService:
     async def cancel_booking(self, booking_uid: str, reason: str = "User requested"):
         try:
             logger.info(f"Cancelling booking {booking_uid}")
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{CAL_COM_API_URL}/bookings/{booking_uid}/cancel",
-                    headers={
-                        "Authorization": f"Bearer {CAL_COM_API_KEY}",
-                        "cal-api-version": "2024-08-13",
-                    },
-                    json={"cancellationReason": reason},
-                    timeout=10.0,
-                )
-                
-                logger.info(f"Cancel Response: {response.status_code} - {response.text}")
-                
-                if response.status_code in [200, 201]:
-                    return True, "Your appointment has been cancelled successfully."
-                else:
-                    return False, f"Failed to cancel: {response.text}"
-                    
+            client = get_cal_client()
+            response = await client.post(
+                f"{CAL_COM_API_URL}/bookings/{booking_uid}/cancel",
+                endpoint="booking-write",
+                headers={
+                    "Authorization": f"Bearer {CAL_COM_API_KEY}",
+                    "cal-api-version": CAL_API_VERSION,
+                },
+                json={"cancellationReason": reason},
+            )
+
+            logger.info(f"Cancel Response: {response.status_code} - {response.text}")
+
+            if response.status_code in [200, 201]:
+                return True, "Your appointment has been cancelled successfully."
+            else:
+                return False, f"Failed to cancel: {response.text}"
+
         except Exception as e:
             logger.error(f"Cancel Error: {e}", exc_info=True)
             return False, f"Error: {e}"
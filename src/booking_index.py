@@ -0,0 +1,242 @@
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+
+from cal_client import CAL_API_VERSION, get_cal_client
+from singleflight import CAL_FLIGHTS
+
+logger = logging.getLogger("booking_index")
+
+# Statuses that mean a booking no longer holds a slot
+INACTIVE_STATUSES = {"cancelled", "rejected"}
+
+
+def compact_booking(booking: dict) -> dict:
+    """Keeps only the fields the tools and FSM actually use."""
+    return {
+        "uid": booking.get("uid"),
+        "start": booking.get("start"),
+        "title": booking.get("title", "Appointment"),
+        "eventTypeId": booking.get("eventTypeId"),
+    }
+
+
+def _parse_iso(value: str | None) -> datetime | None:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+
+class BookingIndex:
+    """
+    In-process index from normalized phone number to compact upcoming bookings.
+
+    Built once with a paginated /v2/bookings scan, then kept current with
+    incremental refreshes filtered by `afterUpdatedAt`. Lookups are a dict hit.
+    """
+
+    def __init__(
+        self,
+        api_url: str,
+        api_key: str | None,
+        phone_of,
+        refresh_interval: float = 30.0,
+        rebuild_interval: float = 1800.0,
+        page_size: int = 100,
+    ):
+        self.api_url = api_url
+        self.api_key = api_key
+        # Callable returning the normalized phone of a raw booking (or None)
+        self.phone_of = phone_of
+        self.refresh_interval = refresh_interval
+        self.rebuild_interval = rebuild_interval
+        self.page_size = page_size
+
+        self._by_phone: dict[str, dict[str, dict]] = {}
+        self._phone_of_uid: dict[str, str] = {}
+        self._cursor: str | None = None
+        self._built_at: float | None = None
+        self._refreshed_at: float | None = None
+
+        # Other in-process views (e.g. the slot engine) kept in step with every upsert/remove
+        self.mirrors: list = []
+
+        self.full_builds = 0
+        self.incremental_refreshes = 0
+        self.pages_fetched = 0
+
+    def __len__(self) -> int:
+        return len(self._phone_of_uid)
+
+    def add_mirror(self, mirror):
+        """Registers an object with upsert(booking), remove(uid) and retain(uids) methods."""
+        self.mirrors.append(mirror)
+
+    # ── Mutations ───────────────────────────────────────────
+
+    def upsert(self, booking: dict, phone: str | None = None):
+        """Adds or updates a raw Cal.com booking (removes it if no longer active)."""
+        uid = booking.get("uid")
+        if not uid:
+            return
+        if (booking.get("status") or "").lower() in INACTIVE_STATUSES:
+            self.remove(uid)
+            return
+        for mirror in self.mirrors:
+            mirror.upsert(booking)
+        phone = phone or self.phone_of(booking)
+        if not phone:
+            return
+        old_phone = self._phone_of_uid.get(uid)
+        if old_phone and old_phone != phone:
+            self._forget(uid)
+        self._by_phone.setdefault(phone, {})[uid] = compact_booking(booking)
+        self._phone_of_uid[uid] = phone
+
+    def remove(self, uid: str):
+        for mirror in self.mirrors:
+            mirror.remove(uid)
+        self._forget(uid)
+
+    def _forget(self, uid: str):
+        phone = self._phone_of_uid.pop(uid, None)
+        if phone is None:
+            return
+        bucket = self._by_phone.get(phone, {})
+        bucket.pop(uid, None)
+        if not bucket:
+            self._by_phone.pop(phone, None)
+
+    # ── Queries ─────────────────────────────────────────────
+
+    def get(self, uid: str) -> dict | None:
+        """The compact record of one booking, if it's indexed."""
+        phone = self._phone_of_uid.get(uid)
+        return self._by_phone.get(phone, {}).get(uid) if phone is not None else None
+
+    def lookup(self, phone: str) -> list[dict]:
+        """Upcoming bookings for a normalized phone, soonest first."""
+        bucket = self._by_phone.get(phone)
+        if not bucket:
+            return []
+        now = datetime.now(timezone.utc)
+        upcoming = []
+        for record in bucket.values():
+            start = _parse_iso(record["start"])
+            if start is None or start >= now:
+                upcoming.append(record)
+        upcoming.sort(key=lambda r: r["start"] or "")
+        return upcoming
+
+    async def find(self, phone: str) -> list[dict]:
+        """Refreshes the index if it is due, then looks the phone up."""
+        await self.ensure_fresh()
+        return self.lookup(phone)
+
+    # ── Refresh ─────────────────────────────────────────────
+
+    def is_fresh(self) -> bool:
+        return (
+            self._built_at is not None
+            and time.monotonic() - self._refreshed_at < self.refresh_interval
+        )
+
+    async def ensure_fresh(self):
+        if self.is_fresh():
+            return
+        # Every session that finds the index stale waits on the same refresh
+        await CAL_FLIGHTS.do(("bookings", self.api_url), self._catch_up)
+
+    async def _catch_up(self):
+        now = time.monotonic()
+        if self._built_at is None or now - self._built_at > self.rebuild_interval:
+            await self._build()
+        elif now - self._refreshed_at >= self.refresh_interval:
+            await self._refresh()
+
+    async def _build(self):
+        started = datetime.now(timezone.utc)
+        by_phone, phone_of_uid = self._by_phone, self._phone_of_uid
+        self._by_phone, self._phone_of_uid = {}, {}
+        seen: set[str] = set()
+        try:
+            latest = await self._scan({"status": "upcoming"}, seen)
+        except Exception:
+            # Keep serving the previous index if the rebuild fails
+            self._by_phone, self._phone_of_uid = by_phone, phone_of_uid
+            raise
+        for mirror in self.mirrors:
+            mirror.retain(seen)
+        self._advance_cursor(latest, started)
+        self._built_at = self._refreshed_at = time.monotonic()
+        self.full_builds += 1
+        logger.info(
+            f"Built booking index: {len(self)} bookings, {len(self._by_phone)} phones"
+        )
+
+    async def _refresh(self):
+        started = datetime.now(timezone.utc)
+        params = {"status": "upcoming,cancelled"}
+        if self._cursor:
+            params["afterUpdatedAt"] = self._cursor
+        latest = await self._scan(params)
+        self._advance_cursor(latest, started)
+        self._refreshed_at = time.monotonic()
+        self.incremental_refreshes += 1
+
+    def _advance_cursor(self, latest: str | None, started: datetime):
+        # Overlap by a minute to tolerate clock skew; upserts are idempotent
+        fallback = (started - timedelta(minutes=1)).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+        self._cursor = max(filter(None, [latest, fallback, self._cursor]))
+
+    async def _scan(self, params: dict, seen: set | None = None) -> str | None:
+        """
+        Pages through /v2/bookings, upserting every row (and adding its uid to `seen`).
+        Returns the newest updatedAt seen.
+        """
+        client = get_cal_client()
+        latest = None
+        skip = 0
+        while True:
+            response = await client.get(
+                f"{self.api_url}/bookings",
+                endpoint="bookings",
+                headers={
+                    "Authorization": f"Bearer {self.api_key}",
+                    "cal-api-version": CAL_API_VERSION,
+                },
+                params={**params, "take": self.page_size, "skip": skip},
+            )
+            if response.status_code != 200:
+                raise RuntimeError(
+                    f"Bookings fetch failed: {response.status_code} {response.text}"
+                )
+
+            body = response.json()
+            page = body.get("data", [])
+            self.pages_fetched += 1
+            for booking in page:
+                self.upsert(booking)
+                if seen is not None and booking.get("uid"):
+                    seen.add(booking["uid"])
+                updated = booking.get("updatedAt")
+                if updated and (latest is None or updated > latest):
+                    latest = updated
+
+            pagination = body.get("pagination") or {}
+            has_next = pagination.get("hasNextPage", len(page) >= self.page_size)
+            if not page or not has_next:
+                return latest
+            skip += len(page)
+
+    def stats(self) -> dict:
+        return {
+            "bookings": len(self),
+            "phones": len(self._by_phone),
+            "full_builds": self.full_builds,
+            "incremental_refreshes": self.incremental_refreshes,
+            "pages_fetched": self.pages_fetched,
+        }
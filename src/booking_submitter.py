@@ -0,0 +1,376 @@
+import asyncio
+import hashlib
+import logging
+import random
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+import httpx
+
+from cal_client import CAL_API_VERSION, get_cal_client
+from resilience import CalUnavailableError, CircuitOpenError, deadline, remaining_budget
+from singleflight import CAL_FLIGHTS
+
+logger = logging.getLogger("booking_submitter")
+
+# Statuses worth retrying. 5xx may mean the booking landed anyway, so those are checked first.
+RETRYABLE_STATUSES = {408, 429, 500, 502, 503, 504}
+AMBIGUOUS_STATUSES = {408, 500, 502, 504}
+
+# Errors raised before the request reached Cal.com; safe to resend without a lookup
+_NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+def idempotency_key(session_id: str, service: str, start: str, phone: str) -> str:
+    """Deterministic key for one caller booking one service at one time."""
+    raw = "|".join([session_id or "", service or "", start or "", phone or ""])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+class SubmitResult:
+    """Outcome of a booking submission: `booking` is set on success, `status_code`/`error` on rejection."""
+
+    def __init__(
+        self,
+        booking: dict | None = None,
+        status_code: int | None = None,
+        error: str | None = None,
+        attempts: int = 0,
+        recovered: bool = False,
+        replayed: bool = False,
+    ):
+        self.booking = booking
+        self.status_code = status_code
+        self.error = error
+        self.attempts = attempts
+        # True when the booking was found by lookup after an ambiguous failure
+        self.recovered = recovered
+        # True when this key was already booked earlier and nothing was sent
+        self.replayed = replayed
+
+    @property
+    def ok(self) -> bool:
+        return self.booking is not None
+
+
+class BookingSubmitter:
+    """
+    Creates, moves and cancels Cal.com bookings; creation happens exactly once per idempotency key.
+
+    Each POST carries the key (header and booking metadata). Transient failures are retried
+    with full-jitter backoff inside the caller's budget; after an ambiguous failure (timeout,
+    5xx) the booking is looked up by key before anything is resent. Successful keys are
+    remembered so a repeated tool call returns the same booking.
+    """
+
+    def __init__(
+        self,
+        api_url: str,
+        api_key: str | None,
+        phone_of,
+        max_attempts: int = 3,
+        attempt_timeout: float = 6.0,
+        total_timeout: float = 12.0,
+        base_delay: float = 0.2,
+        max_delay: float = 1.5,
+        remember: int = 1024,
+    ):
+        self.api_url = api_url
+        self.api_key = api_key
+        # Callable returning the normalized phone of a raw booking (or None)
+        self.phone_of = phone_of
+        self.max_attempts = max_attempts
+        self.attempt_timeout = attempt_timeout
+        self.total_timeout = total_timeout
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.remember = remember
+        self._done: OrderedDict[str, dict] = OrderedDict()
+
+        self.submissions = 0
+        self.retries = 0
+        self.recovered = 0
+        self.duplicates_suppressed = 0
+        self.native_reschedules = 0
+        self.fallback_reschedules = 0
+        self.compensations = 0
+
+    def _headers(self, key: str | None = None) -> dict:
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+            "cal-api-version": CAL_API_VERSION,
+        }
+        if key:
+            headers["Idempotency-Key"] = key
+        return headers
+
+    async def submit(self, payload: dict, key: str) -> SubmitResult:
+        """
+        Creates the booking described by `payload`. Raises CalUnavailableError when
+        Cal.com could not confirm either way within the budget.
+        """
+        booking = self._done.get(key)
+        if booking is not None:
+            self.duplicates_suppressed += 1
+            return SubmitResult(booking, replayed=True)
+        # Concurrent submits of the same key (e.g. a repeated tool call) share one attempt.
+        # The shared flight runs without the caller's budget, so pass it along explicitly.
+        budget = remaining_budget()
+        total = (
+            self.total_timeout if budget is None else min(budget, self.total_timeout)
+        )
+        return await CAL_FLIGHTS.do(
+            ("booking-create", key), lambda: self._submit(payload, key, total)
+        )
+
+    async def _submit(self, payload: dict, key: str, total: float) -> SubmitResult:
+        self.submissions += 1
+        payload = {
+            **payload,
+            "metadata": {**(payload.get("metadata") or {}), "idempotencyKey": key},
+        }
+
+        with deadline(total):
+            ambiguous = False
+            maybe_landed = False
+            last_error = None
+            for attempt in range(1, self.max_attempts + 1):
+                if remaining_budget() <= 0:
+                    break
+                if ambiguous:
+                    found = await self._lookup(payload, key)
+                    if found is not None:
+                        self.recovered += 1
+                        logger.info(
+                            f"Booking {key} had landed despite the failure; not resending"
+                        )
+                        return self._remember(
+                            key,
+                            SubmitResult(found, attempts=attempt - 1, recovered=True),
+                        )
+
+                if attempt > 1:
+                    self.retries += 1
+                    delay = random.uniform(
+                        0, min(self.max_delay, self.base_delay * 2 ** (attempt - 2))
+                    )
+                    if remaining_budget() <= delay:
+                        break
+                    await asyncio.sleep(delay)
+
+                try:
+                    with deadline(min(remaining_budget(), self.attempt_timeout)):
+                        res = await get_cal_client().post(
+                            f"{self.api_url}/bookings",
+                            endpoint="booking-write",
+                            headers=self._headers(key),
+                            json=payload,
+                        )
+                except CircuitOpenError:
+                    raise
+                except _NOT_SENT_ERRORS as e:
+                    last_error, ambiguous = e, False
+                    continue
+                except (CalUnavailableError, httpx.HTTPError) as e:
+                    # Sent, but we never saw the answer
+                    last_error, ambiguous, maybe_landed = e, True, True
+                    continue
+
+                if res.status_code in (200, 201):
+                    booking = res.json().get("data") or {}
+                    return self._remember(
+                        key, SubmitResult(booking, res.status_code, attempts=attempt)
+                    )
+                if res.status_code not in RETRYABLE_STATUSES:
+                    # Definitive answer, e.g. the slot is taken (possibly by our own earlier attempt)
+                    found = await self._lookup(payload, key) if maybe_landed else None
+                    if found is not None:
+                        self.recovered += 1
+                        return self._remember(
+                            key, SubmitResult(found, attempts=attempt, recovered=True)
+                        )
+                    return SubmitResult(
+                        None, res.status_code, res.text, attempts=attempt
+                    )
+                last_error = RuntimeError(f"{res.status_code} {res.text}")
+                ambiguous = res.status_code in AMBIGUOUS_STATUSES
+                maybe_landed = maybe_landed or ambiguous
+
+            if maybe_landed and remaining_budget() > 0:
+                found = await self._lookup(payload, key)
+                if found is not None:
+                    self.recovered += 1
+                    return self._remember(
+                        key,
+                        SubmitResult(found, attempts=self.max_attempts, recovered=True),
+                    )
+
+        logger.error(f"Booking {key} not confirmed: {last_error}")
+        raise CalUnavailableError(f"Booking could not be confirmed: {last_error}")
+
+    async def reschedule(
+        self,
+        booking_uid: str,
+        payload: dict,
+        key: str,
+        reason: str = "User requested reschedule",
+        current_slug: str | None = None,
+    ) -> SubmitResult:
+        """
+        Moves a booking to payload["start"] in one round trip with Cal.com's native reschedule,
+        which keeps the booking's event type, so it's only used when `current_slug` (the
+        booking's event type) is payload["eventTypeSlug"]. Otherwise, or if it isn't available,
+        creates the new booking first and then cancels the old one, cancelling the new booking
+        again if the old one can't be released. Either way the caller never ends up without a booking.
+        """
+        booking = self._done.get(key)
+        if booking is not None:
+            self.duplicates_suppressed += 1
+            return SubmitResult(booking, replayed=True)
+
+        res = None
+        if current_slug is not None and current_slug == payload.get("eventTypeSlug"):
+            try:
+                res = await get_cal_client().post(
+                    f"{self.api_url}/bookings/{booking_uid}/reschedule",
+                    endpoint="booking-write",
+                    headers=self._headers(key),
+                    json={"start": payload["start"], "reschedulingReason": reason},
+                )
+            except _NOT_SENT_ERRORS:
+                res = None
+        if res is not None and res.status_code in (200, 201):
+            self.native_reschedules += 1
+            return self._remember(
+                key,
+                SubmitResult(res.json().get("data") or {}, res.status_code, attempts=1),
+            )
+        if res is not None and res.status_code in AMBIGUOUS_STATUSES:
+            # It may have moved; creating another booking now could double-book
+            raise CalUnavailableError(
+                f"Reschedule of {booking_uid} not confirmed: {res.status_code}"
+            )
+        if res is not None and res.status_code not in (404, 405, 429, 501, 503):
+            return SubmitResult(None, res.status_code, res.text, attempts=1)
+
+        # Service changed, or native reschedule unsupported or unavailable: create-then-cancel
+        self.fallback_reschedules += 1
+        result = await self.submit(payload, key)
+        if not result.ok:
+            return result
+        if await self.cancel(booking_uid, reason):
+            return result
+
+        # Couldn't release the old slot; undo the new booking so nothing is double-booked
+        self.compensations += 1
+        self._done.pop(key, None)
+        new_uid = result.booking.get("uid")
+        if new_uid and not await self.cancel(new_uid, "Reschedule rolled back"):
+            logger.error(
+                f"Reschedule of {booking_uid} left both {booking_uid} and {new_uid} active"
+            )
+        return SubmitResult(
+            None,
+            None,
+            "Original booking could not be released",
+            attempts=result.attempts,
+        )
+
+    async def cancel(
+        self, booking_uid: str, reason: str = "User requested cancellation"
+    ) -> bool:
+        """Cancels one booking. Returns False if Cal.com refused or couldn't be reached."""
+        try:
+            res = await get_cal_client().post(
+                f"{self.api_url}/bookings/{booking_uid}/cancel",
+                endpoint="booking-write",
+                headers=self._headers(),
+                json={"cancellationReason": reason},
+            )
+        except (CalUnavailableError, httpx.HTTPError) as e:
+            logger.warning(f"Cancel of {booking_uid} failed: {e}")
+            return False
+        if res.status_code not in (200, 201):
+            logger.warning(
+                f"Cancel of {booking_uid} refused: {res.status_code} {res.text}"
+            )
+            return False
+        return True
+
+    async def cancel_many(
+        self,
+        booking_uids: list,
+        reason: str = "User requested cancellation",
+        concurrency: int = 4,
+    ) -> tuple[list, list]:
+        """Cancels bookings concurrently, at most `concurrency` at a time. Returns (succeeded, failed) UIDs."""
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def cancel_one(uid: str) -> bool:
+            async with semaphore:
+                return await self.cancel(uid, reason)
+
+        outcomes = await asyncio.gather(*(cancel_one(uid) for uid in booking_uids))
+        succeeded = [uid for uid, ok in zip(booking_uids, outcomes) if ok]
+        failed = [uid for uid, ok in zip(booking_uids, outcomes) if not ok]
+        return succeeded, failed
+
+    async def _lookup(self, payload: dict, key: str) -> dict | None:
+        """Finds a booking created by an earlier attempt: same key, or same start and phone."""
+        start = payload.get("start")
+        phone = (payload.get("attendee") or {}).get("phoneNumber")
+        try:
+            start_dt = datetime.fromisoformat(start.replace("Z", "+00:00"))
+        except (AttributeError, ValueError):
+            return None
+        params = {
+            "afterStart": (start_dt - timedelta(minutes=1)).strftime(
+                "%Y-%m-%dT%H:%M:%S.000Z"
+            ),
+            "beforeEnd": (start_dt + timedelta(days=1)).strftime(
+                "%Y-%m-%dT%H:%M:%S.000Z"
+            ),
+        }
+        try:
+            res = await get_cal_client().get(
+                f"{self.api_url}/bookings",
+                endpoint="bookings",
+                headers=self._headers(),
+                params=params,
+            )
+        except (CalUnavailableError, httpx.HTTPError) as e:
+            logger.warning(f"Booking lookup for {key} failed: {e}")
+            return None
+        if res.status_code != 200:
+            return None
+
+        for booking in res.json().get("data", []):
+            if (booking.get("status") or "").lower() in ("cancelled", "rejected"):
+                continue
+            if (booking.get("metadata") or {}).get("idempotencyKey") == key:
+                return booking
+            same_start = booking.get("start", "").replace(
+                ".000Z", "Z"
+            ) == start.replace(".000Z", "Z")
+            if same_start and phone and self.phone_of(booking) == phone:
+                return booking
+        return None
+
+    def _remember(self, key: str, result: SubmitResult) -> SubmitResult:
+        self._done[key] = result.booking
+        self._done.move_to_end(key)
+        while len(self._done) > self.remember:
+            self._done.popitem(last=False)
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "submissions": self.submissions,
+            "retries": self.retries,
+            "recovered_by_lookup": self.recovered,
+            "duplicates_suppressed": self.duplicates_suppressed,
+            "native_reschedules": self.native_reschedules,
+            "fallback_reschedules": self.fallback_reschedules,
+            "compensations": self.compensations,
+        }
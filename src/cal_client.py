@@ -0,0 +1,440 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+
+import httpx
+
+from resilience import (
+    CLOSED,
+    CircuitBreaker,
+    CircuitOpenError,
+    DeadlineExceededError,
+    remaining_budget,
+)
+
+logger = logging.getLogger("cal_client")
+
+try:
+    import h2  # noqa: F401  (enables HTTP/2 in httpx)
+
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+CAL_API_VERSION = "2024-08-13"
+
+# Connection pool bounds for one worker process
+POOL_LIMITS = httpx.Limits(
+    max_connections=20,
+    max_keepalive_connections=10,
+    keepalive_expiry=60.0,
+)
+
+# Per-endpoint timeouts (seconds). Reads stay snappy, booking writes get more room.
+ENDPOINT_TIMEOUTS = {
+    "event-types": httpx.Timeout(10.0, connect=3.0, pool=2.0),
+    "slots": httpx.Timeout(10.0, connect=3.0, pool=2.0),
+    "bookings": httpx.Timeout(10.0, connect=3.0, pool=2.0),
+    "schedules": httpx.Timeout(10.0, connect=3.0, pool=2.0),
+    "booking-write": httpx.Timeout(15.0, connect=3.0, pool=2.0),
+    "backend": httpx.Timeout(10.0, connect=3.0, pool=2.0),
+}
+DEFAULT_TIMEOUT = httpx.Timeout(10.0, connect=3.0, pool=2.0)
+
+# One breaker per Cal.com endpoint group, shared by every session on the process.
+# Booking writes trip the same breaker as booking reads.
+BREAKER_GROUPS = {
+    "event-types": "event-types",
+    "slots": "slots",
+    "bookings": "bookings",
+    "booking-write": "bookings",
+}
+BREAKERS: dict[str, CircuitBreaker] = {}
+
+
+def breaker_for(endpoint: str) -> CircuitBreaker | None:
+    group = BREAKER_GROUPS.get(endpoint)
+    if group is None:
+        return None
+    breaker = BREAKERS.get(group)
+    if breaker is None:
+        breaker = BREAKERS[group] = CircuitBreaker(group)
+    return breaker
+
+
+def breaker_stats() -> dict:
+    return {name: b.stats() for name, b in BREAKERS.items()}
+
+
+# Idempotent reads that may be hedged: if the first attempt is slower than the endpoint's
+# recent p90, a second identical request is sent and the first answer wins.
+HEDGED_ENDPOINTS = {"slots", "bookings", "event-types"}
+HEDGING_ENABLED = os.getenv("CAL_HEDGING", "1") != "0"
+
+
+class HedgePolicy:
+    """
+    Decides when to hedge a read. The delay is the endpoint's recent latency quantile
+    (a fixed default until enough samples exist); a token bucket caps hedges to
+    `max_rate` of requests, plus a small burst.
+    """
+
+    def __init__(
+        self,
+        endpoints=HEDGED_ENDPOINTS,
+        quantile: float = 0.9,
+        window: int = 200,
+        min_samples: int = 20,
+        default_delay: float = 1.5,
+        min_delay: float = 0.05,
+        max_rate: float = 0.1,
+        burst: float = 3.0,
+    ):
+        self.endpoints = set(endpoints)
+        self.quantile = quantile
+        self.window = window
+        self.min_samples = min_samples
+        self.default_delay = default_delay
+        self.min_delay = min_delay
+        self.max_rate = max_rate
+        self.burst = burst
+        self._latencies: dict[str, deque] = {}
+        self._tokens: dict[str, float] = {}
+
+    def delay_for(self, endpoint: str) -> float | None:
+        """Seconds to wait before hedging a request to `endpoint`, or None if it isn't hedged."""
+        if endpoint not in self.endpoints:
+            return None
+        # Every hedgeable request earns a fraction of a hedge
+        self._tokens[endpoint] = min(
+            self.burst, self._tokens.get(endpoint, 1.0) + self.max_rate
+        )
+        samples = self._latencies.get(endpoint)
+        if not samples or len(samples) < self.min_samples:
+            return self.default_delay
+        ordered = sorted(samples)
+        return max(
+            ordered[min(int(len(ordered) * self.quantile), len(ordered) - 1)],
+            self.min_delay,
+        )
+
+    def try_acquire(self, endpoint: str) -> bool:
+        tokens = self._tokens.get(endpoint, 1.0)
+        if tokens < 1.0:
+            return False
+        self._tokens[endpoint] = tokens - 1.0
+        return True
+
+    def observe(self, endpoint: str, latency: float):
+        if endpoint in self.endpoints:
+            self._latencies.setdefault(endpoint, deque(maxlen=self.window)).append(
+                latency
+            )
+
+
+def _capped_timeout(timeout: httpx.Timeout, budget: float) -> httpx.Timeout:
+    def cap(value):
+        return budget if value is None else min(value, budget)
+
+    return httpx.Timeout(
+        connect=cap(timeout.connect),
+        read=cap(timeout.read),
+        write=cap(timeout.write),
+        pool=cap(timeout.pool),
+    )
+
+
+def _is_failure(response: httpx.Response) -> bool:
+    # 4xx other than rate limiting is the caller's problem, not an outage
+    return response.status_code >= 500 or response.status_code == 429
+
+
+class EndpointStats:
+    """Rolling counters for one logical endpoint."""
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.new_connections = 0
+        self.total_latency_s = 0.0
+        self.total_wait_s = 0.0
+        self.max_wait_s = 0.0
+        self.hedges_issued = 0
+        self.hedges_won = 0
+
+    def as_dict(self) -> dict:
+        n = self.requests or 1
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "new_connections": self.new_connections,
+            "reused_connections": max(
+                self.requests - self.errors - self.new_connections, 0
+            ),
+            "avg_latency_ms": round(self.total_latency_s / n * 1000, 2),
+            "avg_wait_ms": round(self.total_wait_s / n * 1000, 2),
+            "max_wait_ms": round(self.max_wait_s * 1000, 2),
+            "hedges_issued": self.hedges_issued,
+            "hedges_won": self.hedges_won,
+        }
+
+
+class CalClient:
+    """
+    Pooled, keep-alive HTTP client shared by every tool in a worker process.
+    Wraps a single httpx.AsyncClient and records pool statistics per endpoint.
+    """
+
+    def __init__(
+        self,
+        limits: httpx.Limits = POOL_LIMITS,
+        http2: bool = HTTP2_AVAILABLE,
+        transport=None,
+        hedging: HedgePolicy | None = None,
+    ):
+        self.http2 = http2
+        self.hedging = (
+            hedging
+            if hedging is not None
+            else (HedgePolicy() if HEDGING_ENABLED else None)
+        )
+        self._transport = transport or httpx.AsyncHTTPTransport(
+            http2=http2, limits=limits
+        )
+        self._client = httpx.AsyncClient(
+            transport=self._transport,
+            limits=limits,
+            timeout=DEFAULT_TIMEOUT,
+        )
+        self._stats: dict[str, EndpointStats] = {}
+        self._in_flight = 0
+
+    @property
+    def is_closed(self) -> bool:
+        return self._client.is_closed
+
+    async def request(
+        self, method: str, url: str, endpoint: str = "default", **kwargs
+    ) -> httpx.Response:
+        """
+        Send a request, applying the endpoint timeout and recording pool wait time.
+        Raises CircuitOpenError if the endpoint's breaker is open and DeadlineExceededError
+        if the current tool budget runs out first. GETs to hedged endpoints may be hedged.
+        """
+        delay = (
+            self.hedging.delay_for(endpoint)
+            if self.hedging and method == "GET"
+            else None
+        )
+        if delay is None:
+            return await self._send(method, url, endpoint, kwargs)
+        return await self._hedged(method, url, endpoint, kwargs, delay)
+
+    async def _hedged(
+        self, method: str, url: str, endpoint: str, kwargs: dict, delay: float
+    ) -> httpx.Response:
+        stats = self._stats.setdefault(endpoint, EndpointStats())
+        started = time.perf_counter()
+        primary = asyncio.ensure_future(self._send(method, url, endpoint, dict(kwargs)))
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            breaker = breaker_for(endpoint)
+            if (
+                done
+                or (breaker is not None and breaker.state != CLOSED)
+                or not self.hedging.try_acquire(endpoint)
+            ):
+                return await primary
+
+            stats.hedges_issued += 1
+            logger.debug(f"Hedging {endpoint} request after {delay * 1000:.0f}ms")
+            hedge = asyncio.ensure_future(
+                self._send(method, url, endpoint, dict(kwargs))
+            )
+            pending = {primary, hedge}
+            try:
+                while pending:
+                    done, pending = await asyncio.wait(
+                        pending, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    # Prefer a successful answer; a failed attempt only counts if nothing else is left
+                    for task in sorted(done, key=lambda t: t.exception() is not None):
+                        if task.exception() is None or not pending:
+                            if task is hedge:
+                                stats.hedges_won += 1
+                                # The primary was at least this slow; keep the quantile honest
+                                self.hedging.observe(
+                                    endpoint, time.perf_counter() - started
+                                )
+                            return task.result()
+            finally:
+                for task in pending:
+                    task.cancel()
+        except BaseException:
+            primary.cancel()
+            raise
+
+    async def _send(
+        self, method: str, url: str, endpoint: str, kwargs: dict
+    ) -> httpx.Response:
+        breaker = breaker_for(endpoint)
+        budget = remaining_budget()
+        if budget is not None and budget <= 0:
+            raise DeadlineExceededError(f"No budget left for {endpoint}")
+        if breaker is not None and not breaker.allow():
+            raise CircuitOpenError(f"Circuit for {endpoint} is open")
+
+        stats = self._stats.setdefault(endpoint, EndpointStats())
+        started = time.perf_counter()
+        marks = {}
+
+        async def trace(name: str, info: dict):
+            if name == "connection.connect_tcp.started":
+                marks["new_connection"] = True
+            elif name.endswith("send_request_headers.started") and "wait" not in marks:
+                # Time spent acquiring (or opening) a pooled connection
+                marks["wait"] = time.perf_counter() - started
+
+        kwargs.setdefault("timeout", ENDPOINT_TIMEOUTS.get(endpoint, DEFAULT_TIMEOUT))
+        if budget is not None:
+            kwargs["timeout"] = _capped_timeout(kwargs["timeout"], budget)
+        extensions = dict(kwargs.pop("extensions", None) or {})
+        extensions["trace"] = trace
+
+        self._in_flight += 1
+        try:
+            send = self._client.request(method, url, extensions=extensions, **kwargs)
+            if budget is None:
+                response = await send
+            else:
+                # httpx timeouts are per phase; the budget caps the whole exchange
+                response = await asyncio.wait_for(send, budget)
+        except asyncio.CancelledError:
+            if breaker is not None:
+                breaker.release()
+            raise
+        except (asyncio.TimeoutError, httpx.TimeoutException) as e:
+            stats.errors += 1
+            if breaker is not None:
+                breaker.record(False, time.perf_counter() - started, slow=True)
+            if budget is not None:
+                raise DeadlineExceededError(
+                    f"{endpoint} request ran past the tool budget"
+                ) from e
+            raise
+        except Exception:
+            stats.errors += 1
+            if breaker is not None:
+                breaker.record(False, time.perf_counter() - started)
+            raise
+        else:
+            latency = time.perf_counter() - started
+            if breaker is not None:
+                breaker.record(not _is_failure(response), latency)
+            if self.hedging is not None and not _is_failure(response):
+                self.hedging.observe(endpoint, latency)
+            return response
+        finally:
+            self._in_flight -= 1
+            wait = marks.get("wait", 0.0)
+            stats.requests += 1
+            stats.total_latency_s += time.perf_counter() - started
+            stats.total_wait_s += wait
+            stats.max_wait_s = max(stats.max_wait_s, wait)
+            if marks.get("new_connection"):
+                stats.new_connections += 1
+
+    async def get(
+        self, url: str, endpoint: str = "default", **kwargs
+    ) -> httpx.Response:
+        return await self.request("GET", url, endpoint=endpoint, **kwargs)
+
+    async def post(
+        self, url: str, endpoint: str = "default", **kwargs
+    ) -> httpx.Response:
+        return await self.request("POST", url, endpoint=endpoint, **kwargs)
+
+    def stats(self) -> dict:
+        """
+        Snapshot of pool usage from the request trace hooks: connections opened, in-flight
+        requests and per-endpoint wait times (httpx doesn't expose the pool itself).
+        """
+        return {
+            "http2": self.http2,
+            "connections_opened": sum(s.new_connections for s in self._stats.values()),
+            "in_flight": self._in_flight,
+            "endpoints": {name: s.as_dict() for name, s in self._stats.items()},
+            "breakers": breaker_stats(),
+        }
+
+    async def aclose(self):
+        await self._client.aclose()
+
+
+_client: CalClient | None = None
+_client_loop: asyncio.AbstractEventLoop | None = None
+# Set by use_transport() to route the shared client somewhere other than the network
+_transport_override = None
+# Closes of replaced clients still running
+_closing: set = set()
+
+
+def _retire(client: CalClient | None, loop: asyncio.AbstractEventLoop | None):
+    """Closes a replaced shared client's pooled connections on the loop that opened them."""
+    if client is None or client.is_closed:
+        return
+    if loop is None or loop.is_closed():
+        # Its loop is gone and took the sockets with it; nothing is left to await
+        logger.debug("Dropped Cal.com client whose event loop is closed")
+        return
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        task = loop.create_task(client.aclose())
+        _closing.add(task)
+        task.add_done_callback(_closing.discard)
+    elif loop.is_running():
+        asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+    elif running is None:
+        loop.run_until_complete(client.aclose())
+    else:
+        logger.warning("Could not close a Cal.com client from another event loop")
+
+
+def use_transport(transport):
+    """Routes the shared client through `transport` (e.g. the Cal.com stand-in); None restores the network."""
+    global _client, _client_loop, _transport_override
+    _transport_override = transport
+    _retire(_client, _client_loop)
+    _client = None
+    _client_loop = None
+
+
+def get_cal_client() -> CalClient:
+    """Return the per-process Cal.com client, creating it on first use."""
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client.is_closed or _client_loop is not loop:
+        # Connections are bound to the loop that opened them
+        _retire(_client, _client_loop)
+        _client = CalClient(transport=_transport_override)
+        _client_loop = loop
+        logger.info(f"Created shared Cal.com client (http2={_client.http2})")
+    return _client
+
+
+def pool_stats() -> dict:
+    """Pool statistics of the shared client (empty if it hasn't been used yet)."""
+    return _client.stats() if _client is not None else {}
+
+
+async def aclose_cal_client():
+    global _client, _client_loop
+    if _client is not None:
+        await _client.aclose()
+    _client = None
+    _client_loop = None
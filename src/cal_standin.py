@@ -0,0 +1,588 @@
+"""
+Local stand-in for the parts of the Cal.com API the agent uses, backed by an in-memory calendar.
+
+Serves /v1/event-types, /v1/slots, /v2/event-types, /v2/bookings (list/create) and
+/v2/bookings/{uid}/cancel|reschedule, with injectable latency, error rate and rate limiting.
+
+In-process:   cal_client.use_transport(StandinCalendar().transport())
+Over HTTP:    python src/cal_standin.py --port 8787   (then CAL_COM_BASE_URL=http://127.0.0.1:8787)
+"""
+
+import argparse
+import asyncio
+import contextlib
+import hashlib
+import json
+import logging
+import math
+import random
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+import httpx
+
+logger = logging.getLogger("cal_standin")
+
+DEFAULT_EVENT_TYPES = [
+    {"id": 101, "title": "Haircut", "slug": "haircut", "length": 30},
+    {"id": 102, "title": "Hairwash", "slug": "hairwash", "length": 30},
+    {"id": 103, "title": "Spa", "slug": "spa", "length": 60},
+    {"id": 104, "title": "Makeup", "slug": "makeup", "length": 60},
+    {"id": 105, "title": "Beard Trim", "slug": "beard-trim", "length": 30},
+    {"id": 106, "title": "Hair Color", "slug": "hair-color", "length": 90},
+]
+
+ISO_Z = "%Y-%m-%dT%H:%M:%S.000Z"
+
+
+def _iso(dt: datetime) -> str:
+    return dt.astimezone(timezone.utc).strftime(ISO_Z)
+
+
+def _parse(value: str | None) -> datetime | None:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+
+class Faults:
+    """Latency (lognormal, given as median and p99 in ms) and random 503s for one route."""
+
+    def __init__(
+        self,
+        median_ms: float = 0.0,
+        p99_ms: float | None = None,
+        error_rate: float = 0.0,
+    ):
+        self.median_ms = median_ms
+        self.p99_ms = p99_ms if p99_ms is not None else median_ms
+        self.error_rate = error_rate
+
+    def sample_latency(self, rng: random.Random) -> float:
+        if self.median_ms <= 0:
+            return 0.0
+        sigma = math.log(max(self.p99_ms, self.median_ms) / self.median_ms) / 2.326
+        return self.median_ms * math.exp(sigma * rng.gauss(0.0, 1.0)) / 1000.0
+
+
+class StandinCalendar:
+    """
+    One salon's calendar: every event type shares the same opening hours, and a slot is
+    taken once `seats` overlapping bookings exist (one per stylist). Routes are tagged like
+    CalClient endpoints ("event-types", "slots", "schedules", "bookings", "booking-write") for per-route faults.
+    """
+
+    def __init__(
+        self,
+        event_types: list[dict] | None = None,
+        tz: str = "Asia/Kolkata",
+        open_hour: int = 10,
+        close_hour: int = 20,
+        slot_minutes: int = 30,
+        seats: int = 1,
+        faults: Faults | None = None,
+        route_faults: dict[str, Faults] | None = None,
+        rate_limit: float | None = None,
+        seed: int | None = None,
+        clock=None,
+    ):
+        # Every service starts on the same grid, like Cal.com's per-event-type slotInterval
+        self.event_types = [
+            {"slotInterval": slot_minutes, **et}
+            for et in (event_types or DEFAULT_EVENT_TYPES)
+        ]
+        self.tz = ZoneInfo(tz)
+        self.open_hour = open_hour
+        self.close_hour = close_hour
+        self.slot_minutes = slot_minutes
+        self.seats = seats
+        self.faults = faults or Faults()
+        self.route_faults = route_faults or {}
+        self.rate_limit = rate_limit
+        self.clock = clock or (lambda: datetime.now(timezone.utc))
+        self._rng = random.Random(seed)
+
+        self.bookings: dict[str, dict] = {}
+        self._by_idempotency_key: dict[str, str] = {}
+        self._tokens = rate_limit or 0.0
+        self._tokens_at = time.monotonic()
+        self.requests: dict[str, int] = {}
+        self.injected_errors = 0
+        self.rate_limited = 0
+
+    # ── Calendar ────────────────────────────────────────────
+
+    def event_type(self, event_type_id=None, slug: str | None = None) -> dict | None:
+        for et in self.event_types:
+            if (event_type_id is not None and str(et["id"]) == str(event_type_id)) or (
+                slug and et["slug"] == slug
+            ):
+                return et
+        return None
+
+    def _busy(
+        self, start: datetime, end: datetime, ignore_uid: str | None = None
+    ) -> bool:
+        overlapping = 0
+        for b in self.bookings.values():
+            if b["status"] != "accepted" or b["uid"] == ignore_uid:
+                continue
+            if _parse(b["start"]) < end and start < _parse(b["end"]):
+                overlapping += 1
+                if overlapping >= self.seats:
+                    return True
+        return False
+
+    def free_slots(
+        self, event_type: dict, first: datetime, last: datetime
+    ) -> dict[str, list]:
+        """Free slot starts between two instants, grouped by local date."""
+        now = self.clock() + timedelta(
+            minutes=event_type.get("minimumBookingNotice") or 0
+        )
+        length = timedelta(minutes=event_type.get("length", 30))
+        step = timedelta(minutes=event_type.get("slotInterval") or self.slot_minutes)
+        before = timedelta(minutes=event_type.get("beforeEventBuffer") or 0)
+        after = timedelta(minutes=event_type.get("afterEventBuffer") or 0)
+        slots: dict[str, list] = {}
+        day = first.astimezone(self.tz).date()
+        while day <= last.astimezone(self.tz).date():
+            t = datetime(day.year, day.month, day.day, self.open_hour, tzinfo=self.tz)
+            close = datetime(
+                day.year, day.month, day.day, self.close_hour, tzinfo=self.tz
+            )
+            day_slots = []
+            while t + length <= close:
+                if (
+                    first <= t <= last
+                    and t > now
+                    and not self._busy(t - before, t + length + after)
+                ):
+                    day_slots.append({"time": _iso(t)})
+                t += step
+            if day_slots:
+                slots[day.isoformat()] = day_slots
+            day += timedelta(days=1)
+        return slots
+
+    def _bookable(
+        self, event_type: dict, start: datetime, ignore_uid: str | None = None
+    ) -> str | None:
+        """Returns why `start` can't be booked, or None."""
+        local = start.astimezone(self.tz)
+        end = start + timedelta(minutes=event_type.get("length", 30))
+        close = local.replace(hour=self.close_hour, minute=0, second=0, microsecond=0)
+        if start <= self.clock():
+            return "Attempting to book a meeting in the past."
+        if start <= self.clock() + timedelta(
+            minutes=event_type.get("minimumBookingNotice") or 0
+        ):
+            return "Booking notice period has not been met"
+        if local.hour < self.open_hour or end.astimezone(self.tz) > close:
+            return "User either already has booking at this time or is not available"
+        if (local.hour * 60 + local.minute - self.open_hour * 60) % (
+            event_type.get("slotInterval") or self.slot_minutes
+        ):
+            return "Invalid start time for this event type"
+        before = timedelta(minutes=event_type.get("beforeEventBuffer") or 0)
+        after = timedelta(minutes=event_type.get("afterEventBuffer") or 0)
+        if self._busy(start - before, end + after, ignore_uid):
+            return "User either already has booking at this time or is not available"
+        return None
+
+    def add_booking(
+        self,
+        event_type: dict,
+        start: datetime,
+        attendee: dict,
+        metadata: dict | None = None,
+    ) -> dict:
+        now = _iso(self.clock())
+        uid = uuid.UUID(int=self._rng.getrandbits(128)).hex[:22]
+        booking = {
+            "id": len(self.bookings) + 1,
+            "uid": uid,
+            "title": (metadata or {}).get("title") or event_type["title"],
+            "start": _iso(start),
+            "end": _iso(start + timedelta(minutes=event_type.get("length", 30))),
+            "status": "accepted",
+            "eventTypeId": event_type["id"],
+            "attendees": [attendee],
+            "metadata": metadata or {},
+            "createdAt": now,
+            "updatedAt": now,
+        }
+        self.bookings[uid] = booking
+        return booking
+
+    def seed_bookings(
+        self, count: int, days: int = 7, phones: int | None = None
+    ) -> list[dict]:
+        """Fills the calendar with `count` bookings over the next `days`, ignoring slot conflicts."""
+        now = self.clock()
+        created = []
+        for i in range(count):
+            et = self.event_types[i % len(self.event_types)]
+            offset = (
+                self._rng.randrange(days * 24 * 60 // self.slot_minutes)
+                * self.slot_minutes
+            )
+            phone = f"+9198{(i % (phones or count)):08d}"
+            attendee = {
+                "name": "Guest",
+                "email": "guest@voice.ai",
+                "phoneNumber": phone,
+                "timeZone": "Asia/Kolkata",
+            }
+            created.append(
+                self.add_booking(et, now + timedelta(minutes=offset + 60), attendee)
+            )
+        return created
+
+    # ── HTTP ────────────────────────────────────────────────
+
+    def transport(self) -> httpx.MockTransport:
+        """In-process transport for CalClient / httpx.AsyncClient."""
+        return httpx.MockTransport(self.handle)
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        route, handler, args = self._route(request)
+        if handler is None:
+            return _json(404, {"status": "error", "error": {"message": "Not found"}})
+        self.requests[route] = self.requests.get(route, 0) + 1
+
+        faults = self.route_faults.get(route, self.faults)
+        delay = faults.sample_latency(self._rng)
+        if delay:
+            await asyncio.sleep(delay)
+        if not self._take_token():
+            self.rate_limited += 1
+            return _json(
+                429,
+                {"status": "error", "error": {"message": "Too many requests"}},
+                {"Retry-After": "1"},
+            )
+        if faults.error_rate and self._rng.random() < faults.error_rate:
+            self.injected_errors += 1
+            return _json(
+                503, {"status": "error", "error": {"message": "Injected failure"}}
+            )
+        return handler(request, *args)
+
+    def _route(self, request: httpx.Request):
+        path = request.url.path.rstrip("/")
+        method = request.method
+        parts = path.split("/")
+        if method == "GET" and path == "/v1/event-types":
+            return "event-types", self._v1_event_types, ()
+        if method == "GET" and path == "/v2/event-types":
+            return "event-types", self._v2_event_types, ()
+        if method == "GET" and path == "/v1/slots":
+            return "slots", self._v1_slots, ()
+        if method == "GET" and path == "/v2/schedules/default":
+            return "schedules", self._default_schedule, ()
+        if path == "/v2/bookings":
+            if method == "GET":
+                return "bookings", self._list_bookings, ()
+            if method == "POST":
+                return "booking-write", self._create_booking, ()
+        if method == "POST" and len(parts) == 5 and parts[1:3] == ["v2", "bookings"]:
+            if parts[4] == "cancel":
+                return "booking-write", self._cancel_booking, (parts[3],)
+            if parts[4] == "reschedule":
+                return "booking-write", self._reschedule_booking, (parts[3],)
+        return None, None, ()
+
+    def _take_token(self) -> bool:
+        if not self.rate_limit:
+            return True
+        now = time.monotonic()
+        self._tokens = min(
+            self.rate_limit, self._tokens + (now - self._tokens_at) * self.rate_limit
+        )
+        self._tokens_at = now
+        if self._tokens < 1.0:
+            return False
+        self._tokens -= 1.0
+        return True
+
+    # ── Handlers ────────────────────────────────────────────
+
+    def _v1_event_types(self, request: httpx.Request) -> httpx.Response:
+        body = json.dumps(
+            {"event_types": self.event_types}, separators=(",", ":")
+        ).encode()
+        etag = '"' + hashlib.sha256(body).hexdigest()[:16] + '"'
+        if request.headers.get("if-none-match") == etag:
+            return httpx.Response(304, headers={"ETag": etag})
+        return httpx.Response(
+            200,
+            content=body,
+            headers={"Content-Type": "application/json", "ETag": etag},
+        )
+
+    def _v2_event_types(self, request: httpx.Request) -> httpx.Response:
+        event_types = [
+            {**et, "lengthInMinutes": et.get("length", 30)} for et in self.event_types
+        ]
+        return _json(
+            200,
+            {
+                "status": "success",
+                "data": {"eventTypeGroups": [{"eventTypes": event_types}]},
+            },
+        )
+
+    def _v1_slots(self, request: httpx.Request) -> httpx.Response:
+        params = request.url.params
+        event_type = self.event_type(params.get("eventTypeId"))
+        first, last = _parse(params.get("startTime")), _parse(params.get("endTime"))
+        if event_type is None or first is None or last is None:
+            return _json(
+                400, {"message": "eventTypeId, startTime and endTime are required"}
+            )
+        return _json(200, {"slots": self.free_slots(event_type, first, last)})
+
+    def _default_schedule(self, request: httpx.Request) -> httpx.Response:
+        days = [
+            "Monday",
+            "Tuesday",
+            "Wednesday",
+            "Thursday",
+            "Friday",
+            "Saturday",
+            "Sunday",
+        ]
+        availability = [
+            {
+                "days": days,
+                "startTime": f"{self.open_hour:02d}:00",
+                "endTime": f"{self.close_hour:02d}:00",
+            }
+        ]
+        schedule = {
+            "id": 1,
+            "name": "Opening hours",
+            "isDefault": True,
+            "timeZone": self.tz.key,
+            "availability": availability,
+            "overrides": [],
+        }
+        return _json(200, {"status": "success", "data": schedule})
+
+    def _list_bookings(self, request: httpx.Request) -> httpx.Response:
+        params = request.url.params
+        statuses = {s.strip() for s in params.get("status", "").split(",") if s.strip()}
+        now = self.clock()
+        after_updated = params.get("afterUpdatedAt")
+        after_start, before_end = (
+            _parse(params.get("afterStart")),
+            _parse(params.get("beforeEnd")),
+        )
+
+        rows = []
+        for b in self.bookings.values():
+            start = _parse(b["start"])
+            if statuses:
+                upcoming = b["status"] == "accepted" and _parse(b["end"]) >= now
+                if not (
+                    ("upcoming" in statuses and upcoming)
+                    or ("cancelled" in statuses and b["status"] == "cancelled")
+                ):
+                    continue
+            if after_updated and b["updatedAt"] <= after_updated:
+                continue
+            if after_start and start < after_start:
+                continue
+            if before_end and _parse(b["end"]) > before_end:
+                continue
+            rows.append(b)
+        rows.sort(key=lambda b: b["start"])
+
+        take, skip = int(params.get("take", 100)), int(params.get("skip", 0))
+        page = rows[skip : skip + take]
+        return _json(
+            200,
+            {
+                "status": "success",
+                "data": page,
+                "pagination": {
+                    "totalItems": len(rows),
+                    "hasNextPage": skip + take < len(rows),
+                },
+            },
+        )
+
+    def _create_booking(self, request: httpx.Request) -> httpx.Response:
+        key = request.headers.get("idempotency-key")
+        if key and key in self._by_idempotency_key:
+            return _json(
+                201,
+                {
+                    "status": "success",
+                    "data": self.bookings[self._by_idempotency_key[key]],
+                },
+            )
+
+        body = json.loads(request.content or b"{}")
+        event_type = self.event_type(body.get("eventTypeId"), body.get("eventTypeSlug"))
+        start = _parse(body.get("start"))
+        if event_type is None or start is None:
+            return _json(
+                400,
+                {
+                    "status": "error",
+                    "error": {"message": "Unknown event type or start"},
+                },
+            )
+        reason = self._bookable(event_type, start)
+        if reason:
+            return _json(400, {"status": "error", "error": {"message": reason}})
+
+        booking = self.add_booking(
+            event_type, start, body.get("attendee") or {}, body.get("metadata")
+        )
+        if key:
+            self._by_idempotency_key[key] = booking["uid"]
+        return _json(201, {"status": "success", "data": booking})
+
+    def _cancel_booking(self, request: httpx.Request, uid: str) -> httpx.Response:
+        booking = self.bookings.get(uid)
+        if booking is None:
+            return _json(
+                404,
+                {"status": "error", "error": {"message": f"Booking {uid} not found"}},
+            )
+        if booking["status"] == "cancelled":
+            return _json(
+                400,
+                {"status": "error", "error": {"message": "Booking already cancelled"}},
+            )
+        booking["status"] = "cancelled"
+        booking["updatedAt"] = _iso(self.clock())
+        return _json(200, {"status": "success", "data": booking})
+
+    def _reschedule_booking(self, request: httpx.Request, uid: str) -> httpx.Response:
+        old = self.bookings.get(uid)
+        if old is None or old["status"] != "accepted":
+            return _json(
+                404,
+                {"status": "error", "error": {"message": f"Booking {uid} not found"}},
+            )
+        body = json.loads(request.content or b"{}")
+        event_type = self.event_type(old["eventTypeId"])
+        start = _parse(body.get("start"))
+        if start is None:
+            return _json(
+                400, {"status": "error", "error": {"message": "start is required"}}
+            )
+        reason = self._bookable(event_type, start, ignore_uid=uid)
+        if reason:
+            return _json(400, {"status": "error", "error": {"message": reason}})
+
+        old["status"] = "cancelled"
+        old["updatedAt"] = _iso(self.clock())
+        booking = self.add_booking(
+            event_type,
+            start,
+            old["attendees"][0],
+            {**old["metadata"], "rescheduledFrom": uid},
+        )
+        return _json(201, {"status": "success", "data": booking})
+
+    def stats(self) -> dict:
+        return {
+            "requests": dict(self.requests),
+            "bookings": len(self.bookings),
+            "injected_errors": self.injected_errors,
+            "rate_limited": self.rate_limited,
+        }
+
+
+def _json(status: int, body: dict, headers: dict | None = None) -> httpx.Response:
+    return httpx.Response(status, json=body, headers=headers)
+
+
+async def serve(calendar: StandinCalendar, host: str = "127.0.0.1", port: int = 8787):
+    """Serves the calendar over HTTP with aiohttp. Returns the runner; call runner.cleanup() to stop."""
+    from aiohttp import web
+
+    async def bridge(request: web.Request) -> web.Response:
+        forwarded = httpx.Request(
+            request.method,
+            str(request.url),
+            headers=dict(request.headers),
+            content=await request.read(),
+        )
+        res = await calendar.handle(forwarded)
+        headers = {
+            k: v
+            for k, v in res.headers.items()
+            if k.lower() not in ("content-length", "transfer-encoding")
+        }
+        return web.Response(status=res.status_code, body=res.content, headers=headers)
+
+    app = web.Application()
+    app.router.add_route("*", "/{tail:.*}", bridge)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Cal.com stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument(
+        "--latency-ms", type=float, default=0.0, help="median latency per request"
+    )
+    parser.add_argument(
+        "--p99-ms", type=float, default=None, help="p99 latency per request"
+    )
+    parser.add_argument(
+        "--error-rate",
+        type=float,
+        default=0.0,
+        help="fraction of requests answered with 503",
+    )
+    parser.add_argument(
+        "--rate-limit", type=float, default=None, help="requests per second before 429s"
+    )
+    parser.add_argument("--bookings", type=int, default=0, help="pre-seeded bookings")
+    parser.add_argument(
+        "--seats", type=int, default=1, help="bookings allowed per slot"
+    )
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    calendar = StandinCalendar(
+        faults=Faults(args.latency_ms, args.p99_ms, args.error_rate),
+        rate_limit=args.rate_limit,
+        seats=args.seats,
+        seed=args.seed,
+    )
+    calendar.seed_bookings(args.bookings)
+
+    async def run():
+        runner = await serve(calendar, args.host, args.port)
+        logger.info(
+            f"Cal.com stand-in on http://{args.host}:{args.port} ({len(calendar.bookings)} bookings)"
+        )
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await runner.cleanup()
+
+    with contextlib.suppress(KeyboardInterrupt):
+        asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+import re
+from datetime import date, datetime, time, timedelta
+from functools import cache, lru_cache
+from zoneinfo import ZoneInfo
+
+LOCAL_TZ = "Asia/Kolkata"
+
+MONTHS = {
+    "january": 1,
+    "jan": 1,
+    "february": 2,
+    "feb": 2,
+    "march": 3,
+    "mar": 3,
+    "april": 4,
+    "apr": 4,
+    "may": 5,
+    "june": 6,
+    "jun": 6,
+    "july": 7,
+    "jul": 7,
+    "august": 8,
+    "aug": 8,
+    "september": 9,
+    "sept": 9,
+    "sep": 9,
+    "october": 10,
+    "oct": 10,
+    "november": 11,
+    "nov": 11,
+    "december": 12,
+    "dec": 12,
+}
+
+WEEKDAYS = {
+    "monday": 0,
+    "mon": 0,
+    "somvar": 0,
+    "somwar": 0,
+    "tuesday": 1,
+    "tue": 1,
+    "tues": 1,
+    "mangalvar": 1,
+    "mangalwar": 1,
+    "wednesday": 2,
+    "wed": 2,
+    "budhvar": 2,
+    "budhwar": 2,
+    "thursday": 3,
+    "thu": 3,
+    "thurs": 3,
+    "guruvar": 3,
+    "guruwar": 3,
+    "friday": 4,
+    "fri": 4,
+    "shukravar": 4,
+    "shukrawar": 4,
+    "saturday": 5,
+    "sat": 5,
+    "shanivar": 5,
+    "shaniwar": 5,
+    "sunday": 6,
+    "sun": 6,
+    "ravivar": 6,
+    "raviwar": 6,
+    "itwar": 6,
+}
+
+# Days from today; "kal" is tomorrow here because callers only ever book forwards
+RELATIVE_DAYS = {
+    "today": 0,
+    "aaj": 0,
+    "tonight": 0,
+    "this morning": 0,
+    "this afternoon": 0,
+    "this evening": 0,
+    "aaj raat": 0,
+    "aaj shaam": 0,
+    "tomorrow": 1,
+    "tmrw": 1,
+    "tomorow": 1,
+    "kal": 1,
+    "day after tomorrow": 2,
+    "day after": 2,
+    "parso": 2,
+    "parson": 2,
+    "overmorrow": 2,
+}
+
+# Day-part words that pin an hour without am/pm to one half of the day
+AM_WORDS = {"am", "morning", "subah", "savere"}
+PM_WORDS = {
+    "pm",
+    "afternoon",
+    "evening",
+    "night",
+    "tonight",
+    "shaam",
+    "sham",
+    "raat",
+    "dopahar",
+    "dopehar",
+}
+
+
+def _alternation(words) -> str:
+    # Longest first, so "day after tomorrow" wins over "tomorrow"
+    return "|".join(re.escape(w) for w in sorted(words, key=len, reverse=True))
+
+
+_MONTH = _alternation(MONTHS)
+_ORDINAL = r"(\d{1,2})(?:st|nd|rd|th)?"
+
+_ISO_DATE = re.compile(r"\b(\d{4})-(\d{1,2})-(\d{1,2})\b")
+_DMY_DATE = re.compile(r"\b(\d{1,2})[-/.](\d{1,2})[-/.](\d{4})\b")
+_RELATIVE = re.compile(rf"\b(?:{_alternation(RELATIVE_DAYS)})\b")
+_IN_DAYS = re.compile(r"\b(?:in (\d{1,2}) days?|(\d{1,2}) din (?:baad|bad))\b")
+_WEEKDAY = re.compile(
+    rf"\b(?:(next|this|coming|agle|is) )?({_alternation(WEEKDAYS)})\b"
+)
+_DAY_MONTH = re.compile(rf"\b{_ORDINAL}(?: of)? ({_MONTH})\b(?:,? (\d{{4}}))?")
+_MONTH_DAY = re.compile(rf"\b({_MONTH}) {_ORDINAL}\b(?:,? (\d{{4}}))?")
+_BARE_DAY = re.compile(rf"^(?:the )?{_ORDINAL}$")
+
+_CLOCK = re.compile(r"\b(\d{1,2})(?:[:.](\d{2}))?\s*(am|pm)?\b")
+_WORDS = re.compile(r"[a-z]+")
+_NOISE = re.compile(r"[^a-z0-9:/.\- ]+")
+_SPACES = re.compile(r"\s+")
+
+
+@cache
+def get_tz(name: str = LOCAL_TZ) -> ZoneInfo:
+    return ZoneInfo(name)
+
+
+def normalize(text: str | None) -> str:
+    """Lowercases, folds 'a.m.'/'p.m.', drops stray punctuation and collapses whitespace."""
+    text = (text or "").lower().replace("a.m.", "am").replace("p.m.", "pm")
+    text = _NOISE.sub(" ", text).strip(" .")
+    return _SPACES.sub(" ", text)
+
+
+def _safe_date(year: int, month: int, day: int) -> date | None:
+    try:
+        return date(year, month, day)
+    except ValueError:
+        return None
+
+
+def _month_day(today: date, month: int, day: int, year: str | None) -> date | None:
+    if year:
+        # A year in the past is almost always a mis-transcription of this year
+        candidate = _safe_date(max(int(year), today.year), month, day)
+        if candidate and candidate >= today:
+            return candidate
+    candidate = _safe_date(today.year, month, day)
+    if candidate and candidate < today:
+        candidate = _safe_date(today.year + 1, month, day)
+    return candidate
+
+
+def _day_of_month(today: date, day: int) -> date | None:
+    """'23rd': this month if still ahead (or today), otherwise next month."""
+    year, month = today.year, today.month
+    for _ in range(3):
+        candidate = _safe_date(year, month, day)
+        if candidate and candidate >= today:
+            return candidate
+        month, year = (1, year + 1) if month == 12 else (month + 1, year)
+    return None
+
+
+@lru_cache(maxsize=2048)
+def resolve_date(text: str, today: date) -> date | None:
+    """
+    Resolves a spoken date relative to `today`, or None if it isn't one.
+    Memoized per (phrase, day), so repeats within a day are a dict hit.
+
+    Handles ISO / dd-mm-yyyy dates, "23rd", "March 5", "5th of march", relative words
+    (today, tomorrow, day after tomorrow, kal, parso, aaj), "in 3 days" and weekdays:
+    "friday" / "this friday" is the next one from today inclusive, "next friday" the
+    next one after today.
+    """
+    phrase = normalize(text)
+    if not phrase:
+        return None
+
+    m = _ISO_DATE.search(phrase)
+    if m:
+        return _safe_date(int(m[1]), int(m[2]), int(m[3]))
+    m = _DMY_DATE.search(phrase)
+    if m:
+        return _safe_date(int(m[3]), int(m[2]), int(m[1]))
+
+    m = _DAY_MONTH.search(phrase)
+    if m:
+        return _month_day(today, MONTHS[m[2]], int(m[1]), m[3])
+    m = _MONTH_DAY.search(phrase)
+    if m:
+        return _month_day(today, MONTHS[m[1]], int(m[2]), m[3])
+
+    m = _RELATIVE.search(phrase)
+    if m:
+        return today + timedelta(days=RELATIVE_DAYS[m[0]])
+    m = _IN_DAYS.search(phrase)
+    if m:
+        return today + timedelta(days=int(m[1] or m[2]))
+
+    m = _WEEKDAY.search(phrase)
+    if m:
+        ahead = (WEEKDAYS[m[2]] - today.weekday()) % 7
+        if ahead == 0 and m[1] in ("next", "agle"):
+            ahead = 7
+        return today + timedelta(days=ahead)
+
+    m = _BARE_DAY.match(phrase)
+    if m:
+        return _day_of_month(today, int(m[1]))
+    return None
+
+
+@lru_cache(maxsize=1024)
+def resolve_time(text: str) -> time | None:
+    """
+    Resolves a spoken clock time ("3 PM", "15:30", "4.30 pm", "5 in the evening",
+    "shaam 6 baje", "noon"), or None for a bare day part like "evening".
+
+    Without am/pm or a day-part word, 1-7 is read as afternoon/evening and 8-11 as
+    morning, matching when a salon is open.
+    """
+    phrase = normalize(text)
+    if not phrase:
+        return None
+    words = set(_WORDS.findall(phrase))
+    if words & {"noon", "midday"} and not any(ch.isdigit() for ch in phrase):
+        return time(12, 0)
+    if "midnight" in words:
+        return time(0, 0)
+
+    m = _CLOCK.search(phrase)
+    if not m:
+        return None
+    hour, minute = int(m[1]), int(m[2] or 0)
+    if hour > 23 or minute > 59:
+        return None
+    if hour > 12:
+        return time(hour, minute)
+
+    meridiem = m[3] or (
+        "pm" if words & PM_WORDS else "am" if words & AM_WORDS else None
+    )
+    if meridiem == "pm":
+        hour = hour % 12 + 12
+    elif meridiem == "am":
+        hour = hour % 12
+    elif 1 <= hour <= 7:
+        hour += 12
+    return time(hour, minute)
+
+
+def resolve(date_text: str, time_text: str, now: datetime) -> datetime:
+    """
+    Local datetime for a spoken date and time, `now` being timezone-aware local time.
+    Raises ValueError naming whichever part couldn't be understood.
+    """
+    day = resolve_date(date_text, now.date())
+    if day is None:
+        raise ValueError(f"Could not parse date: {date_text}")
+    clock = resolve_time(time_text)
+    if clock is None:
+        raise ValueError(f"Could not parse time: {time_text}")
+    return datetime.combine(day, clock, tzinfo=now.tzinfo)
@@ -1,15 +1,19 @@
+import json
+import logging
+import time
+from collections import deque
+from datetime import datetime, timezone
 from enum import Enum, auto
-from typing import Optional, Dict, Any
+from typing import Any, Callable, Dict, NamedTuple, Optional
+
+logger = logging.getLogger("fsm")
+
 
 class State(Enum):
     START = auto()
 
-
-    # OTP Verification
-    OTP_ASK_EMAIL = auto()
-    OTP_SENT = auto()
+    # OTP Verification (the email is looked up from the phone number, never asked for)
     OTP_VERIFY = auto()
-    OTP_VERIFIED = auto()
     
     # Booking Flow
     BOOKING_ASK_SERVICE = auto()
@@ -20,7 +24,6 @@ class State(Enum):
     
     # Manage/List Flow (common for update/cancel)
     MANAGE_ASK_PHONE = auto()
-    MANAGE_LIST_BOOKINGS = auto() # System does this, then transitions
     MANAGE_SELECT_BOOKING = auto()
     
     # Cancel Flow
@@ -32,236 +35,509 @@ class State(Enum):
     RESCHEDULE_ASK_TIME = auto()
     RESCHEDULE_CONFIRM = auto()
 
+# Related-service suggestions, offered in the booking states where they fit
+UPSELL = (
+    "You may gently suggest one related service (haircut: hair colour, hair treatment or beard trim; facial: "
+    "cleanup or face massage; massage: body scrub or aromatherapy; hair colour: hair treatment or haircut), "
+    "briefly (\"Oh, and by the way...\"). At most 2-3 suggestions per call; stop if they say no, 'just this', "
+    "or sound rushed. Never suggest beard trims to female callers."
+)
+
+
+# What the caller is doing in the manage flow, by intent
+MANAGE_GOALS = {
+    "cancel": "cancel a booking",
+    "reschedule": "reschedule a booking",
+    "cancel_all": "cancel all their bookings",
+}
+
+
+# Tools the LLM can call in every state: changing what the call is about, and availability questions
+CORE_TOOLS = frozenset({"intent_book", "intent_manage", "list_available_services", "get_availability"})
+
+# Tools exposed on top of CORE_TOOLS per state. A tool's follow-up reply still sees the
+# toolset of the state it was called in, so a state also lists what the next step needs.
+STATE_TOOLS = {
+    State.START: {"input_service", "input_date", "input_time", "check_available_days"},
+    State.OTP_VERIFY: {"verify_otp", "resend_otp", "send_otp", "input_phone"},
+    State.BOOKING_ASK_SERVICE: {"input_service", "input_date", "input_time"},
+    State.BOOKING_ASK_DATE: {"input_date", "input_time", "input_service", "check_available_days"},
+    State.BOOKING_ASK_TIME: {"input_time", "input_date", "check_available_days"},
+    State.BOOKING_ASK_PHONE: {"input_phone", "input_time", "input_date"},
+    State.BOOKING_CONFIRM: {"create_booking", "confirm_action", "input_service", "input_date", "input_time"},
+    State.MANAGE_ASK_PHONE: {"input_phone", "list_bookings"},
+    State.MANAGE_SELECT_BOOKING: {"list_bookings", "select_booking", "cancel_all_bookings"},
+    State.CANCEL_CONFIRM: {"cancel_booking", "cancel_all_bookings", "confirm_action", "list_bookings", "select_booking"},
+    State.RESCHEDULE_ASK_SERVICE: {"input_service", "input_date", "list_bookings"},
+    State.RESCHEDULE_ASK_DATE: {"input_date", "input_time", "check_available_days"},
+    State.RESCHEDULE_ASK_TIME: {"input_time", "input_date"},
+    State.RESCHEDULE_CONFIRM: {"reschedule_booking", "confirm_action", "input_date", "input_time"},
+}
+
+
+class BookingRef(NamedTuple):
+    """What the conversation needs of a Cal.com booking, instead of the full response dict."""
+    uid: str
+    start: int  # epoch seconds, 0 if unknown
+    title: str
+
+    @classmethod
+    def from_booking(cls, booking: "dict | BookingRef") -> "BookingRef":
+        if isinstance(booking, BookingRef):
+            return booking
+        try:
+            start = int(datetime.fromisoformat(booking["start"].replace("Z", "+00:00")).timestamp())
+        except (KeyError, TypeError, AttributeError, ValueError):
+            start = 0
+        return cls(booking.get("uid", ""), start, booking.get("title") or "Appointment")
+
+    def start_iso(self) -> str | None:
+        if not self.start:
+            return None
+        return datetime.fromtimestamp(self.start, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
 class ConversationContext:
+    """What the caller has told us so far. Kept for every live session, so it's slotted and snapshots to compact JSON."""
+
+    __slots__ = (
+        "service", "date", "time", "phone", "booking_uid", "bookings_list", "intent",
+        "email", "otp_hash", "otp_expiry", "otp_verified",
+        # 🔐 Resend protection
+        "otp_last_sent_at", "otp_resend_count",
+    )
+    _DATETIMES = ("otp_expiry", "otp_last_sent_at")
+
     def __init__(self):
         self.service: Optional[str] = None
         self.date: Optional[str] = None
         self.time: Optional[str] = None
         self.phone: Optional[str] = None
         self.booking_uid: Optional[str] = None
-        self.bookings_list: list = [] # Cache for selection
+        self.bookings_list: list[BookingRef] = [] # Cache for selection
         self.intent: Optional[str] = None # 'book', 'cancel', 'reschedule'
         self.email: Optional[str] = None
         self.otp_hash: Optional[str] = None
         self.otp_expiry: Optional[datetime] = None
         self.otp_verified: bool = False
-        # 🔐 Resend protection
-        self.otp_last_sent_at = None
+        self.otp_last_sent_at: Optional[datetime] = None
         self.otp_resend_count = 0
 
+    def snapshot(self) -> list:
+        """Field values in slot order; datetimes as epoch seconds, bookings as [uid, start, title]."""
+        values = [getattr(self, name) for name in self.__slots__]
+        for name in self._DATETIMES:
+            i = self.__slots__.index(name)
+            values[i] = values[i].timestamp() if values[i] else None
+        values[self.__slots__.index("bookings_list")] = [list(b) for b in self.bookings_list]
+        return values
+
+    @classmethod
+    def restore(cls, values: list) -> "ConversationContext":
+        ctx = cls()
+        for name, value in zip(cls.__slots__, values):
+            if name in cls._DATETIMES and value is not None:
+                value = datetime.fromtimestamp(value, timezone.utc)
+            elif name == "bookings_list":
+                value = [BookingRef(*b) for b in value]
+            setattr(ctx, name, value)
+        return ctx
+
+# Events kept per session for profiling and replaying a conversation's path
+TRACE_LENGTH = 64
+
+
 class FSM:
     def __init__(self):
         self.state = State.START
         self.ctx = ConversationContext()
-    
+        self.trace: deque = deque(maxlen=TRACE_LENGTH)
+
+    def snapshot(self) -> bytes:
+        """The state and context as compact JSON, to persist a call or hand it to another process."""
+        return json.dumps([self.state.name, self.ctx.snapshot()], separators=(",", ":")).encode()
+
+    @classmethod
+    def restore(cls, data: bytes) -> "FSM":
+        state, ctx = json.loads(data)
+        fsm = cls()
+        fsm.state = State[state]
+        fsm.ctx = ConversationContext.restore(ctx)
+        return fsm
+
+    def available_tools(self) -> frozenset:
+        """Names of the tools the LLM should see in the current state."""
+        return CORE_TOOLS | STATE_TOOLS.get(self.state, frozenset())
+
     def get_system_prompt(self) -> str:
         """
-        Returns the instructions for the LLM based on the current state.
+        Returns the instructions for the LLM based on the current state. The agent puts
+        these after its static core prompt and swaps them whenever they change.
         """
-        from datetime import datetime
-        now = datetime.now()
-        base = f"You are Zara, a state-aware calendar assistant for TSC Salon. The usage location is Asia/Kolkata and today is {now.strftime('%A, %d %B %Y')}. Your main goal is to help users manage salon appointments. If the user asks about ANYTHING else, politely decline."
-        
+        ctx = self.ctx
+
         if self.state == State.START:
-            return base + " Greet the user. If they want to book, call `intent_book`. If they want to update/cancel, call `intent_manage`. Do not ask for details yet."
-            
+            return (
+                "Greet the caller and find out what they need. To book, call `intent_book`; to cancel, "
+                "reschedule or change a booking, call `intent_manage` with action 'cancel', 'reschedule' or "
+                "'cancel_all'. If they already gave a service, date "
+                "or time, call `intent_book` and then `input_service`, `input_date` and `input_time` for what "
+                "they said, and check the date with `get_availability`."
+            )
+
         # --- BOOKING ---
         if self.state == State.BOOKING_ASK_SERVICE:
-            return base + " Ask the user 'What service would you like to book?'. You can call `list_available_services` to see what is offered. If the user specifies a service, call `input_service`."
+            return (
+                "Ask what service they would like (\"So... what service are you looking for today?\"). Don't list "
+                "services; only if they ask what you offer, call `list_available_services`. When they name one, "
+                "call `input_service`, then ask exactly: \"Is there any specific day or date in your mind or should "
+                "I check the availability?\""
+            )
 
         if self.state == State.BOOKING_ASK_DATE:
-            msg = base + f" Service: {self.ctx.service}. Ask 'What day works for you?'. When user provides a date, call `input_date`. CRITICAL: Whenever a date is mentioned, you should plan to use `get_availability` immediately after."
-            return msg
-            
+            return (
+                f"Service: {ctx.service}. If you haven't yet, ask exactly: \"Is there any specific day or date in "
+                "your mind or should I check the availability?\" When they give a day or date, call `input_date` "
+                "and immediately `get_availability` for it (with their time, if they said one), then ask for a "
+                "time. If they want you to check or suggest days, call `check_available_days` and repeat its "
+                "message exactly; don't list dates unless asked. " + UPSELL
+            )
+
         if self.state == State.BOOKING_ASK_TIME:
-            date_str = self.ctx.date or "the date"
-            return base + f" Service: {self.ctx.service}, Date: {date_str}. Use `get_availability` to check slots if you haven't yet. presenting available slots (morning/afternoon/night). Ask 'What time works?'. When provided, call `input_time`."
-            
+            return (
+                f"Service: {ctx.service}, Date: {ctx.date or 'the date'}. Ask \"What time would you prefer?\" For a "
+                "specific time, call `get_availability` for the date with that time (no period unless they named "
+                "one). If it's free, say \"Perfect, that time works!\" and call `input_time`; if not, offer the "
+                "nearest times it returned (\"That time isn't available, but I have ... Do either of those work?\"). "
+                "With no time in mind, call `get_availability` for the date, offer what it returned and let them "
+                "name another time. Accept any time it shows as open."
+            )
+
         if self.state == State.BOOKING_ASK_PHONE:
-            return base + " Ask for PHONE NUMBER to finalize the booking. When provided, call `input_phone`."
-            
+            return (
+                f"Service: {ctx.service}, Date: {ctx.date}, Time: {ctx.time}. Ask warmly: \"Great... and can I get "
+                "your phone number for the booking?\" and call `input_phone` with it; that sends a verification "
+                "code to their registered email. " + UPSELL
+            )
+
         if self.state == State.BOOKING_CONFIRM:
-            return base + f" details: Service={self.ctx.service}, Date={self.ctx.date}, Time={self.ctx.time}, Phone={self.ctx.phone}. Confirm with the user: 'Just to confirm, I'm booking [Service] on [Date] at [Time] for [Phone]. Should I go ahead?'. If yes, call `create_booking` with the gathered details."
+            return (
+                f"Details: Service={ctx.service}, Date={ctx.date}, Time={ctx.time}, Phone={ctx.phone}. The caller is "
+                "verified. Confirm: \"Okay, so just to make sure I have this right... I'm booking [Service] on [date] "
+                "at [time]... and I have your number as [phone].\" then \"Should I go ahead and confirm that for "
+                "you?\" On yes, call `create_booking` immediately with these details and ask nothing more. On no, ask "
+                "what they would like to change. " + UPSELL
+            )
 
         # --- MANAGE (List) ---
+        goal = MANAGE_GOALS.get(ctx.intent, "change a booking")
         if self.state == State.MANAGE_ASK_PHONE:
-            return base + " Ask for PHONE NUMBER to find bookings. Call `input_phone` when provided."
-            
+            return (
+                f"The caller wants to {goal}. Ask for the PHONE NUMBER the bookings were made with. Call "
+                "`input_phone` when provided."
+            )
+
         if self.state == State.MANAGE_SELECT_BOOKING:
-            return base + " Found multiple bookings. Ask user to select one (e.g. by time). Call `select_booking` with the UID or index."
+            prompt = (
+                f"The caller wants to {goal}. Found multiple bookings; call `list_bookings` if you haven't seen "
+                "them. Ask which one they mean (e.g. by day or time) and call `select_booking` with the booking's "
+                "handle (e.g. 'b2')."
+            )
+            if ctx.intent != "reschedule":
+                prompt += " If they want to cancel all of them, call `cancel_all_bookings`."
+            return prompt
 
         # --- CANCEL ---
         if self.state == State.CANCEL_CONFIRM:
-            if self.ctx.intent == "cancel_all":
-                count = len(self.ctx.bookings_list)
-                return base + f" Warn the user they are about to cancel {count} appointments. Ask 'Are you sure you want to cancel ALL appointments?'. Call `cancel_booking` for each appointment if yes."
-            return base + " Ask 'Are you sure you want to cancel this appointment?'. Call `cancel_booking` if yes."
+            if ctx.intent == "cancel_all":
+                count = len(ctx.bookings_list)
+                return (
+                    f"Warn the user they are about to cancel {count} appointments. Ask 'Are you sure you want to "
+                    "cancel ALL appointments?'. If yes, call `cancel_all_bookings` once; it cancels them all together."
+                )
+            return (
+                "Ask 'Are you sure you want to cancel this appointment?'. Call `cancel_booking` if yes. If they'd "
+                "rather move it, call `intent_manage` with action 'reschedule'."
+            )
 
         # --- RESCHEDULE ---
         if self.state == State.RESCHEDULE_ASK_SERVICE:
-             return base + " To reschedule, we need to create a new booking. Ask 'What service is this for?' (or confirm if it's the same). Call `input_service`."
+            return (
+                "To reschedule, we need to create a new booking. Ask 'What service is this for?' (or confirm if "
+                "it's the same). Call `input_service`."
+            )
 
         if self.state == State.RESCHEDULE_ASK_DATE:
-            return base + " Ask for NEW DATE. Call `input_date`. Remember to check availability."
-        
-        if self.state == State.RESCHEDULE_ASK_TIME:
-            return base + f" Ask for NEW TIME on {self.ctx.date}. Use `get_availability`. Call `input_time`."
-            
-        if self.state == State.RESCHEDULE_CONFIRM:
-            return base + f" Confirm reschedule: {self.ctx.service} on {self.ctx.date} at {self.ctx.time}. Call `confirm_action`."
+            return "Ask for the NEW DATE. Call `input_date`, then `get_availability` for that date."
 
-        # OTP Verification
-        if self.state == State.OTP_ASK_EMAIL:
-            # This state is skipped in normal flow (email auto-determined from phone)
-            return base + (
-                "A verification code has been sent to the user's registered email. "
-                "Ask them to say the 6-digit code."
+        if self.state == State.RESCHEDULE_ASK_TIME:
+            return (
+                f"Ask for the NEW TIME on {ctx.date}. Check it with `get_availability` (pass their time) and offer "
+                "the nearest open times if it's taken. Call `input_time` once they pick one."
             )
 
-        if self.state == State.OTP_SENT:
-            return base + (
-                "Tell the user that an OTP was sent to their email. "
-                "Ask them to say the 6-digit code. "
-                "If they ask to resend, call `resend_otp`."
+        if self.state == State.RESCHEDULE_CONFIRM:
+            return (
+                f"Confirm reschedule: {ctx.service} on {ctx.date} at {ctx.time}. On yes, call "
+                "`reschedule_booking`, then `confirm_action`."
             )
 
+        # OTP Verification
         if self.state == State.OTP_VERIFY:
-            return base + (
-                "Listen for a 6-digit number. "
+            return (
+                "Listen for a 6-digit number and call `verify_otp` with it. "
                 "If correct, confirm verification and continue. "
                 "If incorrect or expired, politely ask to retry. "
-                "If the user says they didn’t receive the code, or asks to resend, you MUST call the `resend_otp` tool."
+                "If the user says they didn’t receive the code, or asks to resend, you MUST call the `resend_otp` tool. "
+                "Never create a booking before `verify_otp` succeeds."
             )
 
-        return base + " How can I help?"
+        return "How can I help?"
+
+    def dispatch(self, event: str, payload: Any = None) -> bool:
+        """
+        Applies one event: the first transition for (state, event) whose guard passes runs
+        its action and moves to its target. Returns False if no transition matched.
+        """
+        if event in PAYLOADS and payload is not None:
+            payload = PAYLOADS[event](payload)
+        source = self.state
+        matched = False
+        for transition in TRANSITIONS.get((source, event)) or TRANSITIONS.get((ANY, event), ()):
+            if transition.guard is None or transition.guard(self, payload):
+                if transition.action is not None:
+                    transition.action(self, payload)
+                if transition.target is not None:
+                    self.state = transition.target
+                matched = True
+                break
+        self.trace.append(Step(time.monotonic(), source, event, self.state, payload, matched))
+        if source != self.state:
+            logger.info(f"FSM State: {source.name} → {self.state.name}")
+        return matched
 
     def update_state(self, intent: str = None, data: Dict[str, Any] = None):
         """
-        Transitions the state based on logic.
+        Dispatches a tool's intent, then each captured field as its own event in flow
+        order, so details given upfront (service, date and time at once) walk through
+        every step they complete.
         """
-        import logging
-        logger = logging.getLogger("fsm")
-        
-        old_state = self.state
-        
-        if data is None:
-            data = {}
-            
-        # START intent handling
-        if self.state == State.START and intent:
-            if intent == "book":
-                self.state = State.BOOKING_ASK_SERVICE
-                self.ctx.intent = "book"
-            elif intent in ["cancel", "update", "reschedule", "cancel_all"]:
-                self.ctx.intent = intent
-                self.state = State.MANAGE_ASK_PHONE
-        
-        # BOOKING FLOW
-        elif self.state == State.BOOKING_ASK_SERVICE and "service" in data:
-            self.ctx.service = data["service"]
-            self.state = State.BOOKING_ASK_DATE
-            # Optimization: if date/time provided upfront
-            if "date" in data:
-                 self.ctx.date = data["date"]
-                 self.state = State.BOOKING_ASK_TIME
-                 if "time" in data:
-                     self.ctx.time = data["time"]
-                     self.state = State.BOOKING_ASK_PHONE
-
-        elif self.state == State.BOOKING_ASK_DATE and "date" in data:
-            self.ctx.date = data["date"]
-            self.state = State.BOOKING_ASK_TIME
-            if "time" in data:
-                 self.ctx.time = data["time"]
-                 self.state = State.BOOKING_ASK_PHONE
-            
-        elif self.state == State.BOOKING_ASK_TIME and "time" in data:
-            self.ctx.time = data["time"]
-            self.state = State.BOOKING_ASK_PHONE
-            if "phone" in data:
-                self.ctx.phone = data["phone"]
-                self.state = State.BOOKING_CONFIRM
-            
-        elif self.state == State.BOOKING_ASK_PHONE and "phone" in data:
-            self.ctx.phone = data["phone"]
-            # Skip OTP_ASK_EMAIL - email is auto-determined from phone
-            self.state = State.OTP_VERIFY
-            
-        # OTP FLOW (OTP_ASK_EMAIL kept for safety but skipped in normal flow)
-        elif self.state == State.OTP_ASK_EMAIL and "email" in data:
-            self.ctx.email = data["email"]
-            self.state = State.OTP_VERIFY
-            
-        elif self.state == State.OTP_VERIFY and intent == "otp_success":
-            self.state = State.BOOKING_CONFIRM
-            
-        elif self.state == State.BOOKING_CONFIRM and intent == "confirm":
-            # Action should be taken by agent, then reset
-            self.state = State.START 
-            
-        # MANAGE FLOW
-        elif self.state == State.MANAGE_ASK_PHONE:
-            # Note: Caller must provide BOTH phone and bookings if success
-            if "phone" in data:
-                self.ctx.phone = data["phone"]
-            
-            if "bookings" in data:
-                bookings = data["bookings"]
-                # Store list for everyone
-                self.ctx.bookings_list = bookings
-                
-                if self.ctx.intent == "cancel_all":
-                     # Go straight to confirm, assuming we found bookings
-                     if bookings:
-                        self.state = State.CANCEL_CONFIRM
-                else:
-                    if len(bookings) == 1:
-                        self.ctx.booking_uid = bookings[0]['uid']
-                        self._route_intent_from_manage()
-                    elif len(bookings) > 1:
-                        self.state = State.MANAGE_SELECT_BOOKING
-            else:
-                pass
-                
-        elif self.state == State.MANAGE_SELECT_BOOKING and "booking_uid" in data:
-            self.ctx.booking_uid = data["booking_uid"]
-            self._route_intent_from_manage()
-
-        # SPECIFIC ACTION FLOWS
-        elif self.state == State.CANCEL_CONFIRM and intent == "confirm":
-            self.state = State.START
-        
-        elif self.state == State.RESCHEDULE_ASK_SERVICE and "service" in data:
-            self.ctx.service = data["service"]
-            self.state = State.RESCHEDULE_ASK_DATE
-            
-        elif self.state == State.RESCHEDULE_ASK_DATE and "date" in data:
-            self.ctx.date = data["date"]
-            self.state = State.RESCHEDULE_ASK_TIME
-            if "time" in data:
-                self.ctx.time = data["time"]
-                self.state = State.RESCHEDULE_CONFIRM
-            
-        elif self.state == State.RESCHEDULE_ASK_TIME and "time" in data:
-            self.ctx.time = data["time"]
-            self.state = State.RESCHEDULE_CONFIRM
-            
-        elif self.state == State.RESCHEDULE_CONFIRM and intent == "confirm":
-            self.state = State.START
-        
-        # Log state transition
-        if old_state != self.state:
-            logger.info(f"FSM State: {old_state.name} → {self.state.name}")
+        if intent:
+            self.dispatch(intent)
         if data:
+            for key in DATA_EVENTS:
+                if key in data:
+                    self.dispatch(key, data[key])
             logger.debug(f"FSM Data updated: {data}")
-            
-    def _route_intent_from_manage(self):
-        if self.ctx.intent == "cancel":
-            self.state = State.CANCEL_CONFIRM
-        elif self.ctx.intent == "reschedule" or self.ctx.intent == "update":
-            # We used to ask for date, now we might ask for service first if not known,
-            # but usually for reschedule we might assume same service or ask?
-            # Agent.py reschedule tool requires 'service'. So we must ask.
-            self.state = State.RESCHEDULE_ASK_SERVICE
+
+    @classmethod
+    def replay(cls, steps) -> "FSM":
+        """Re-runs traced events on a fresh FSM, starting from the first step's state."""
+        fsm = cls()
+        steps = list(steps)
+        if steps:
+            fsm.state = steps[0].source
+        for step in steps:
+            fsm.dispatch(step.event, step.payload)
+        return fsm
+
+
+# ── Transition table ───────────────────────────────────────
+
+class Step(NamedTuple):
+    """One traced event: where it arrived, where it left the FSM, and whether a transition matched."""
+    at: float
+    source: State
+    event: str
+    target: State
+    payload: Any
+    matched: bool
+
+
+class Transition(NamedTuple):
+    target: Optional[State]  # None stays in the current state
+    guard: Optional[Callable[[FSM, Any], bool]] = None
+    action: Optional[Callable[[FSM, Any], None]] = None
+
+
+# Events that apply in any state without an entry of their own
+ANY = "*"
+
+# What intent_manage can ask for; the manage states route on these
+MANAGE_INTENTS = ("cancel", "reschedule", "cancel_all")
+
+# update_state's data keys, in the order a conversation collects them
+DATA_EVENTS = ("service", "date", "time", "phone", "bookings", "booking_uid")
+
+
+# Payloads are projected before guards, actions and the trace see them, so a session
+# never holds on to full Cal.com responses
+PAYLOADS = {
+    "bookings": lambda bookings: [BookingRef.from_booking(b) for b in bookings],
+}
+
+
+def _store(field: str):
+    def action(fsm: FSM, value):
+        setattr(fsm.ctx, field, value)
+    return action
+
+
+def _set_intent(intent: str):
+    def action(fsm: FSM, _):
+        fsm.ctx.intent = intent
+    action.sets_intent = intent  # read by validate()
+    return action
+
+
+def _intent_in(*intents: str):
+    def guard(fsm: FSM, _) -> bool:
+        return fsm.ctx.intent in intents
+    guard.intents = intents  # read by validate()
+    return guard
+
+
+def _has_bookings(fsm: FSM, bookings) -> bool:
+    return bool(bookings)
+
+
+def _all_of(*guards):
+    def guard(fsm: FSM, payload) -> bool:
+        return all(g(fsm, payload) for g in guards)
+    guard.intents = tuple(i for g in guards for i in getattr(g, "intents", ()))
+    return guard
+
+
+def _needs_selection(fsm: FSM, _) -> bool:
+    return not fsm.ctx.booking_uid and len(fsm.ctx.bookings_list) > 1
+
+
+def _has_selection(fsm: FSM, _) -> bool:
+    return bool(fsm.ctx.booking_uid)
+
+
+def _store_bookings(fsm: FSM, bookings):
+    fsm.ctx.bookings_list = bookings
+
+
+def _select_only_booking(fsm: FSM, bookings):
+    fsm.ctx.bookings_list = bookings
+    fsm.ctx.booking_uid = bookings[0].uid
+
+
+def _only_booking(fsm: FSM, bookings) -> bool:
+    return len(bookings) == 1
+
+
+def _after_selection(action) -> list:
+    """Once a booking is picked, the caller's intent decides where the flow goes."""
+    return [
+        Transition(State.CANCEL_CONFIRM, _intent_in("cancel"), action),
+        Transition(State.RESCHEDULE_ASK_SERVICE, _intent_in("reschedule"), action),
+        Transition(State.START, None, action),
+    ]
+
+
+TRANSITIONS: dict[tuple, list[Transition]] = {
+    (State.START, "book"): [Transition(State.BOOKING_ASK_SERVICE, action=_set_intent("book"))],
+    # Managing a booking can start from anywhere; the manage states below refine it instead
+    **{(ANY, intent): [Transition(State.MANAGE_ASK_PHONE, action=_set_intent(intent))] for intent in MANAGE_INTENTS},
+
+    # Booking
+    (State.BOOKING_ASK_SERVICE, "service"): [Transition(State.BOOKING_ASK_DATE, action=_store("service"))],
+    (State.BOOKING_ASK_DATE, "date"): [Transition(State.BOOKING_ASK_TIME, action=_store("date"))],
+    (State.BOOKING_ASK_TIME, "time"): [Transition(State.BOOKING_ASK_PHONE, action=_store("time"))],
+    (State.BOOKING_ASK_PHONE, "phone"): [Transition(State.OTP_VERIFY, action=_store("phone"))],
+    (State.OTP_VERIFY, "otp_success"): [Transition(State.BOOKING_CONFIRM)],
+    (State.BOOKING_CONFIRM, "confirm"): [Transition(State.START)],
+    # A verification code went out (tools may run out of order when called in parallel)
+    (ANY, "otp_sent"): [Transition(State.OTP_VERIFY)],
+
+    # Manage
+    (State.MANAGE_ASK_PHONE, "phone"): [Transition(None, action=_store("phone"))],
+    (State.MANAGE_ASK_PHONE, "bookings"): [
+        Transition(State.CANCEL_CONFIRM, _all_of(_intent_in("cancel_all"), _has_bookings), _store_bookings),
+        Transition(None, _intent_in("cancel_all"), _store_bookings),
+        Transition(State.CANCEL_CONFIRM, _all_of(_intent_in("cancel"), _only_booking), _select_only_booking),
+        Transition(State.RESCHEDULE_ASK_SERVICE, _all_of(_intent_in("reschedule"), _only_booking), _select_only_booking),
+        Transition(State.START, _only_booking, _select_only_booking),
+        Transition(State.MANAGE_SELECT_BOOKING, lambda fsm, bookings: len(bookings) > 1, _store_bookings),
+        Transition(None, action=_store_bookings),
+    ],
+    (State.MANAGE_SELECT_BOOKING, "booking_uid"): _after_selection(_store("booking_uid")),
+    # The caller changed their mind about what to do before a booking was settled
+    **{
+        (state, intent): [Transition(None, action=_set_intent(intent))]
+        for state in (State.MANAGE_ASK_PHONE, State.MANAGE_SELECT_BOOKING)
+        for intent in MANAGE_INTENTS
+    },
+
+    # Cancel
+    (State.CANCEL_CONFIRM, "confirm"): [Transition(State.START)],
+    (State.CANCEL_CONFIRM, "cancel"): [
+        Transition(State.MANAGE_SELECT_BOOKING, _needs_selection, _set_intent("cancel")),
+        Transition(None, action=_set_intent("cancel")),
+    ],
+    (State.CANCEL_CONFIRM, "cancel_all"): [Transition(None, action=_set_intent("cancel_all"))],
+    (State.CANCEL_CONFIRM, "reschedule"): [
+        Transition(State.RESCHEDULE_ASK_SERVICE, _has_selection, _set_intent("reschedule")),
+        Transition(State.MANAGE_SELECT_BOOKING, _needs_selection, _set_intent("reschedule")),
+        Transition(None, action=_set_intent("reschedule")),
+    ],
+
+    # Reschedule
+    (State.RESCHEDULE_ASK_SERVICE, "service"): [Transition(State.RESCHEDULE_ASK_DATE, action=_store("service"))],
+    (State.RESCHEDULE_ASK_DATE, "date"): [Transition(State.RESCHEDULE_ASK_TIME, action=_store("date"))],
+    (State.RESCHEDULE_ASK_TIME, "time"): [Transition(State.RESCHEDULE_CONFIRM, action=_store("time"))],
+    (State.RESCHEDULE_CONFIRM, "confirm"): [Transition(State.START)],
+    # Mid-reschedule, the picked booking can still be cancelled instead
+    **{
+        (state, intent): [Transition(State.CANCEL_CONFIRM, action=_set_intent(intent))]
+        for state in (State.RESCHEDULE_ASK_SERVICE, State.RESCHEDULE_ASK_DATE, State.RESCHEDULE_ASK_TIME, State.RESCHEDULE_CONFIRM)
+        for intent in ("cancel", "cancel_all")
+    },
+    **{
+        (state, "reschedule"): [Transition(None)]
+        for state in (State.RESCHEDULE_ASK_SERVICE, State.RESCHEDULE_ASK_DATE, State.RESCHEDULE_ASK_TIME, State.RESCHEDULE_CONFIRM)
+    },
+}
+
+
+def validate(transitions: dict[tuple, list[Transition]]):
+    """
+    Raises ValueError for states that START can't reach, for dead states that can't get
+    back to START through the flow's own transitions (ANY entries don't count), and for
+    intents a guard routes on that no transition ever sets.
+    """
+    edges: dict = {state: set() for state in State}
+    wildcard_targets = set()
+    guarded, settable = set(), set()
+    for (source, _), candidates in transitions.items():
+        for t in candidates:
+            guarded.update(getattr(t.guard, "intents", ()))
+            settable.add(getattr(t.action, "sets_intent", None))
+        targets = {t.target for t in candidates if t.target is not None}
+        if source == ANY:
+            wildcard_targets |= targets
         else:
-            self.state = State.START
+            edges[source] |= targets
+
+    def closure(start: set, step) -> set:
+        seen, todo = set(start), list(start)
+        while todo:
+            for nxt in step(todo.pop()):
+                if nxt not in seen:
+                    seen.add(nxt)
+                    todo.append(nxt)
+        return seen
+
+    reachable = closure({State.START} | wildcard_targets, lambda state: edges[state])
+    back = closure({State.START}, lambda state: [src for src, targets in edges.items() if state in targets])
+    problems = [f"unreachable: {state.name}" for state in State if state not in reachable]
+    problems += [f"dead: {state.name}" for state in State if state not in back]
+    problems += [f"intent never set: {intent}" for intent in sorted(guarded - settable)]
+    if problems:
+        raise ValueError(f"Invalid FSM transition table: {', '.join(problems)}")
+
+
+validate(TRANSITIONS)
@@ -0,0 +1,344 @@
+"""
+Tool-layer load generator: drives the Assistant's function tools directly (no STT/LLM/TTS)
+for many concurrent virtual callers and reports per-tool latency percentiles as JSON.
+
+    python src/load_harness.py --sessions 200                       # in-process Cal.com stand-in
+    python src/load_harness.py --sessions 50 --base-url http://127.0.0.1:8787
+
+Each virtual caller books one appointment:
+intent_book → input_service → input_date → get_availability → input_time →
+input_phone → send_otp → verify_otp → create_booking.
+"""
+
+import argparse
+import asyncio
+import contextvars
+import json
+import math
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+TIME_RE = re.compile(r"\b\d{2}:\d{2} [AP]M\b")
+
+# Virtual caller whose "inbox" receives the OTP sent during its session
+_caller: contextvars.ContextVar = contextvars.ContextVar("load_caller", default=None)
+
+
+class VirtualFiller:
+    def __init__(self, speech_seconds: float = 0.0):
+        self.speech_seconds = speech_seconds
+
+    async def play(self, category: str = "generic"):
+        if self.speech_seconds:
+            await asyncio.sleep(self.speech_seconds)
+
+
+class VirtualSession:
+    """Just enough of AgentSession for the tools: FSM, filler, memo, call id and booking handles."""
+
+    def __init__(self, session_id: str, filler_seconds: float = 0.0):
+        from fsm import FSM
+        from tool_results import BookingHandles
+
+        self.session_id = session_id
+        self.fsm = FSM()
+        self.filler = VirtualFiller(filler_seconds)
+        self.service_memo = {}
+        self.booking_handles = BookingHandles()
+        self.inbox: list[str] = []
+
+
+class VirtualContext:
+    def __init__(self, session: VirtualSession):
+        self.session = session
+
+
+def percentile(ordered: list[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return 0.0
+    rank = max(1, min(len(ordered), math.ceil(q / 100 * len(ordered))))
+    return ordered[rank - 1]
+
+
+class ToolStats:
+    def __init__(self):
+        self.latencies: list[float] = []
+        self.errors = 0
+
+    def as_dict(self) -> dict:
+        ordered = sorted(self.latencies)
+        ms = lambda v: round(v * 1000, 2)  # noqa: E731
+        return {
+            "calls": len(ordered),
+            "errors": self.errors,
+            "error_rate": round(self.errors / len(ordered), 4) if ordered else 0.0,
+            "p50_ms": ms(percentile(ordered, 50)),
+            "p95_ms": ms(percentile(ordered, 95)),
+            "p99_ms": ms(percentile(ordered, 99)),
+            "max_ms": ms(ordered[-1]) if ordered else 0.0,
+        }
+
+
+# A tool reply containing one of these means the tool failed (as opposed to a business "no")
+FAILURE_MARKERS = {
+    "get_availability": (
+        "What time would you like to schedule?",
+        "can't see the calendar",
+    ),
+    "input_phone": ("can't pull up",),
+    "create_booking": ("trouble booking", "responding slowly"),
+}
+
+
+class LoadRun:
+    def __init__(
+        self,
+        assistant,
+        services: list[dict],
+        think_seconds: float,
+        filler_seconds: float,
+        seed: int | None,
+    ):
+        self.assistant = assistant
+        self.services = services
+        self.think_seconds = think_seconds
+        self.filler_seconds = filler_seconds
+        self.rng = random.Random(seed)
+        self.tools: dict[str, ToolStats] = {}
+        self.outcomes: dict[str, int] = {}
+
+    async def call(self, ctx: VirtualContext, tool: str, **kwargs) -> str:
+        stats = self.tools.setdefault(tool, ToolStats())
+        started = time.perf_counter()
+        try:
+            result = await getattr(self.assistant, tool)(ctx, **kwargs)
+        except Exception:
+            stats.errors += 1
+            stats.latencies.append(time.perf_counter() - started)
+            raise
+        stats.latencies.append(time.perf_counter() - started)
+        text = str(result or "")
+        if any(marker in text for marker in FAILURE_MARKERS.get(tool, ())):
+            stats.errors += 1
+        if self.think_seconds:
+            await asyncio.sleep(self.think_seconds)
+        return text
+
+    def _outcome(self, name: str):
+        self.outcomes[name] = self.outcomes.get(name, 0) + 1
+
+    async def conversation(self, index: int):
+        session = VirtualSession(f"load-{index}", self.filler_seconds)
+        _caller.set(session)
+        ctx = VirtualContext(session)
+        service = self.rng.choice(self.services)["title"]
+        today = datetime.now(ZoneInfo("Asia/Kolkata")).date()
+        day = (today + timedelta(days=self.rng.randint(1, 6))).isoformat()
+        phone = f"97{index:08d}"
+
+        try:
+            await self.call(ctx, "intent_book")
+            await self.call(ctx, "input_service", service=service)
+            await self.call(ctx, "input_date", date=day)
+            slots = TIME_RE.findall(
+                await self.call(ctx, "get_availability", date=day, service=service)
+            )
+            if not slots:
+                return self._outcome("no_slots")
+            slot = self.rng.choice(slots[:3])
+            await self.call(ctx, "input_time", time=slot)
+            await self.call(ctx, "input_phone", phone=phone)
+            await self.call(ctx, "send_otp")
+            await self.call(
+                ctx, "verify_otp", otp=session.inbox[-1] if session.inbox else "000000"
+            )
+            reply = await self.call(
+                ctx,
+                "create_booking",
+                date=day,
+                time=slot,
+                guest_phone=phone,
+                service=service,
+            )
+        except Exception:
+            return self._outcome("exception")
+        if "I've booked" in reply:
+            self._outcome("booked")
+        elif "couldn't book" in reply:
+            self._outcome("slot_taken")
+        else:
+            self._outcome("failed")
+
+
+async def run_load(
+    sessions: int,
+    concurrency: int | None = None,
+    base_url: str | None = None,
+    calendar=None,
+    think_seconds: float = 0.0,
+    filler_seconds: float = 0.0,
+    seed: int | None = None,
+) -> dict:
+    """
+    Runs `sessions` booking conversations, at most `concurrency` at once. Uses `base_url`
+    if given (set CAL_COM_BASE_URL before importing agent), otherwise routes the shared
+    Cal.com client through `calendar` (a StandinCalendar) in-process.
+    """
+    import agent
+    import cal_client
+    import otp_service
+
+    if base_url is None:
+        if calendar is None:
+            from cal_standin import StandinCalendar
+
+            calendar = StandinCalendar(seats=max(sessions, 1), seed=seed)
+        cal_client.use_transport(calendar.transport())
+
+    # The virtual caller's mailbox replaces SMTP
+    send_otp_email, send_confirmation = (
+        otp_service.send_otp_email,
+        otp_service.send_booking_confirmation_email,
+    )
+    otp_service.send_otp_email = lambda email, otp: _caller.get().inbox.append(otp)
+    otp_service.send_booking_confirmation_email = lambda *args, **kwargs: None
+    try:
+        await agent._refresh_event_types()
+        run = LoadRun(
+            agent.Assistant({}),
+            agent.get_all_services(),
+            think_seconds,
+            filler_seconds,
+            seed,
+        )
+        if not run.services:
+            raise RuntimeError("No event types returned by the Cal.com endpoint")
+
+        limit = asyncio.Semaphore(concurrency or sessions)
+
+        async def one(index: int):
+            async with limit:
+                await run.conversation(index)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(sessions)))
+        elapsed = time.perf_counter() - started
+
+        calls = sum(len(s.latencies) for s in run.tools.values())
+        errors = sum(s.errors for s in run.tools.values())
+        report = {
+            "sessions": sessions,
+            "concurrency": concurrency or sessions,
+            "endpoint": base_url or "in-process stand-in",
+            "elapsed_s": round(elapsed, 3),
+            "sessions_per_s": round(sessions / elapsed, 2) if elapsed else 0.0,
+            "tool_calls_per_s": round(calls / elapsed, 2) if elapsed else 0.0,
+            "error_rate": round(errors / calls, 4) if calls else 0.0,
+            "outcomes": run.outcomes,
+            "tools": {name: stats.as_dict() for name, stats in run.tools.items()},
+            "cal_client": cal_client.pool_stats(),
+        }
+        if calendar is not None:
+            report["standin"] = calendar.stats()
+        return report
+    finally:
+        otp_service.send_otp_email, otp_service.send_booking_confirmation_email = (
+            send_otp_email,
+            send_confirmation,
+        )
+        await cal_client.aclose_cal_client()
+        if base_url is None:
+            cal_client.use_transport(None)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Tool-layer load test for the booking agent"
+    )
+    parser.add_argument(
+        "--sessions", type=int, default=100, help="virtual callers in total"
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=None, help="callers at once (default: all)"
+    )
+    parser.add_argument(
+        "--base-url",
+        default=None,
+        help="Cal.com endpoint; default is the in-process stand-in",
+    )
+    parser.add_argument(
+        "--think-ms", type=float, default=0.0, help="pause after every tool call"
+    )
+    parser.add_argument(
+        "--filler-ms", type=float, default=0.0, help="simulated filler playout per tool"
+    )
+    parser.add_argument(
+        "--latency-ms", type=float, default=80.0, help="stand-in median latency"
+    )
+    parser.add_argument(
+        "--p99-ms", type=float, default=600.0, help="stand-in p99 latency"
+    )
+    parser.add_argument(
+        "--error-rate", type=float, default=0.0, help="stand-in 503 rate"
+    )
+    parser.add_argument(
+        "--rate-limit", type=float, default=None, help="stand-in requests per second"
+    )
+    parser.add_argument(
+        "--seats",
+        type=int,
+        default=None,
+        help="stand-in bookings per slot (default: sessions)",
+    )
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument(
+        "--out", default=None, help="write the JSON report here instead of stdout"
+    )
+    args = parser.parse_args()
+
+    # Keep the load run's catalogue out of the real cold-start snapshot
+    os.environ.setdefault(
+        "AGENT_SNAPSHOT_PATH",
+        os.path.join(tempfile.gettempdir(), "load_harness_snapshot.json"),
+    )
+    calendar = None
+    if args.base_url:
+        os.environ["CAL_COM_BASE_URL"] = args.base_url.rstrip("/")
+    else:
+        from cal_standin import Faults, StandinCalendar
+
+        calendar = StandinCalendar(
+            faults=Faults(args.latency_ms, args.p99_ms, args.error_rate),
+            rate_limit=args.rate_limit,
+            seats=args.seats or args.sessions,
+            seed=args.seed,
+        )
+
+    report = asyncio.run(
+        run_load(
+            args.sessions,
+            concurrency=args.concurrency,
+            base_url=args.base_url,
+            calendar=calendar,
+            think_seconds=args.think_ms / 1000,
+            filler_seconds=args.filler_ms / 1000,
+            seed=args.seed,
+        )
+    )
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        sys.stdout.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,378 @@
+"""
+Microbenchmarks for the pure helpers that run on every turn, with a frozen clock and
+fixed catalogues / phone maps / booking lists at several sizes.
+
+    python src/microbench.py                        # compare against benchmarks/baseline.json
+    python src/microbench.py --update-baseline      # record a new baseline
+    python src/microbench.py --sizes 10 1000 --threshold 0.5
+
+Timings are normalized by a fixed pure-Python calibration loop measured in the same run,
+so a baseline recorded on one machine stays roughly comparable on another. Exits 1 when
+any case is slower than its baseline by more than the threshold, confirmed by a second,
+longer run of just the flagged cases.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime, timezone
+
+DEFAULT_SIZES = (10, 1_000, 100_000)
+DEFAULT_BASELINE = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "benchmarks",
+    "baseline.json",
+)
+DEFAULT_THRESHOLD = 0.5
+
+# Monday 08:30 in Kolkata: every relative date phrase resolves the same way on every run
+FROZEN_NOW = datetime(2030, 1, 7, 3, 0, tzinfo=timezone.utc)
+
+DATE_PHRASES = (
+    "today",
+    "tomorrow",
+    "day after tomorrow",
+    "kal",
+    "next friday",
+    "23rd",
+    "5",
+    "March 5",
+    "5 march",
+    "2030-03-05",
+    "05-03-2030",
+)
+TIME_PHRASES = ("3 PM", "15:30", "10:30 am", "4.30 pm")
+PHONES = ("9876543210", "+91 98765 43210", "098765-43210", "+1 (415) 555-0100", "98765")
+SERVICE_QUERIES = (
+    "haircut",
+    "Hair Cut",
+    "hair was",
+    "beard trim please",
+    "fashial",
+    "service 7",
+)
+
+
+@contextlib.contextmanager
+def frozen_clock(now: datetime = FROZEN_NOW):
+    """Makes `datetime.now()` inside agent return `now` (converted to the requested tz)."""
+    import agent
+
+    real = agent.datetime
+
+    class FrozenDatetime(real):
+        @classmethod
+        def now(cls, tz=None):
+            return now.astimezone(tz) if tz else now.replace(tzinfo=None)
+
+    agent.datetime = FrozenDatetime
+    try:
+        yield now
+    finally:
+        agent.datetime = real
+
+
+def make_catalogue(size: int) -> list[dict]:
+    base = [
+        ("Haircut", "haircut"),
+        ("Hairwash", "hairwash"),
+        ("Spa", "spa"),
+        ("Beard Trim", "beard-trim"),
+        ("Facial", "facial"),
+    ]
+    event_types = [
+        {"id": i + 1, "title": title, "slug": slug, "length": 30}
+        for i, (title, slug) in enumerate(base[:size])
+    ]
+    for i in range(len(event_types), size):
+        event_types.append(
+            {"id": i + 1, "title": f"Service {i}", "slug": f"service-{i}", "length": 30}
+        )
+    return event_types
+
+
+def make_phone_map(size: int) -> dict[str, str]:
+    return {f"98{i:08d}": f"guest{i}@example.com" for i in range(size)}
+
+
+def make_bookings(size: int) -> list[dict]:
+    """Upcoming Cal.com bookings, rotating through the three places a phone can live."""
+    bookings = []
+    for i in range(size):
+        phone = f"+9198{i:08d}"
+        booking = {
+            "uid": f"bk-{i}",
+            "start": "2030-01-08T05:00:00.000Z",
+            "title": "Haircut",
+            "attendees": [{"name": "Guest"}],
+        }
+        if i % 3 == 0:
+            booking["attendees"][0]["phoneNumber"] = phone
+        elif i % 3 == 1:
+            booking["bookingFieldsResponses"] = {"attendeePhoneNumber": phone}
+        else:
+            booking["metadata"] = {"guest_phone": phone}
+        bookings.append(booking)
+    return bookings
+
+
+def _fsm_walk():
+    from fsm import FSM
+
+    fsm = FSM()
+    fsm.update_state(intent="book")
+    fsm.update_state(data={"service": "Haircut"})
+    fsm.update_state(data={"date": "tomorrow"})
+    fsm.update_state(data={"time": "3 PM"})
+    fsm.update_state(data={"phone": "+919876543210"})
+    fsm.update_state(intent="otp_success")
+    fsm.update_state(intent="confirm")
+
+
+def build_cases(sizes) -> list[tuple[str, int, object]]:
+    """(name, operations per call, callable) for every benchmark case."""
+    import agent
+
+    pairs = [(d, t) for d in DATE_PHRASES for t in TIME_PHRASES]
+    days = [
+        datetime(2030, month, day)
+        for month in range(1, 13)
+        for day in (1, 2, 3, 11, 22, 28)
+    ]
+
+    def parse_all():
+        for d, t in pairs:
+            with contextlib.suppress(ValueError):
+                agent.parse_datetime(d, t)
+
+    cases = [
+        ("parse_datetime", len(pairs), parse_all),
+        (
+            "format_spoken_date",
+            len(days),
+            lambda: [agent.format_spoken_date(d) for d in days],
+        ),
+        (
+            "normalize_phone",
+            len(PHONES),
+            lambda: [agent.normalize_phone(p) for p in PHONES],
+        ),
+        ("fsm_update_state", 7, _fsm_walk),
+    ]
+
+    for size in sizes:
+        bookings = make_bookings(size)
+        phone_map = make_phone_map(size)
+        catalogue = make_catalogue(size)
+        probes = [f"+91 98{i * 7919 % size:08d}" for i in range(20)] + ["0000000000"]
+
+        def scan(bookings=bookings):
+            for booking in bookings:
+                phone = agent.extract_booking_phone(booking)
+                if phone:
+                    agent.normalize_phone(phone)
+
+        def lookup(phone_map=phone_map, probes=probes):
+            with _patched(agent, PHONE_EMAIL_MAP=phone_map):
+                for phone in probes:
+                    agent.lookup_email_by_phone(phone)
+
+        def find(catalogue=catalogue, size=size):
+            with _catalogue(agent, catalogue, version=-size):
+                for query in SERVICE_QUERIES:
+                    agent.find_service_by_name(query)
+
+        # Build the service index once up front; the lookups are what run per turn
+        find()
+        cases += [
+            (f"extract_booking_phone[{size}]", size, scan),
+            (f"lookup_email_by_phone[{size}]", len(probes), lookup),
+            (f"find_service_by_name[{size}]", len(SERVICE_QUERIES), find),
+        ]
+    return cases
+
+
+@contextlib.contextmanager
+def _patched(module, **attrs):
+    saved = {name: getattr(module, name) for name in attrs}
+    for name, value in attrs.items():
+        setattr(module, name, value)
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            setattr(module, name, value)
+
+
+_INDEXES: dict[int, object] = {}
+
+
+@contextlib.contextmanager
+def _catalogue(agent, event_types: list[dict], version: int):
+    """Swaps in a benchmark catalogue (and its prebuilt service index) for the duration."""
+    cache = agent.EVENT_TYPES_CACHE
+    saved = cache["data"], cache["version"], agent.SERVICE_INDEX
+    cache["data"], cache["version"] = event_types, version
+    if version in _INDEXES:
+        agent.SERVICE_INDEX = _INDEXES[version]
+    try:
+        yield
+        _INDEXES[version] = agent.SERVICE_INDEX
+    finally:
+        cache["data"], cache["version"], agent.SERVICE_INDEX = saved
+
+
+def _calibrate() -> int:
+    total = 0
+    for i in range(200_000):
+        total += i % 7
+    return total
+
+
+def measure(fn, min_time: float = 0.05, repeats: int = 5) -> float:
+    """Best-of-`repeats` nanoseconds per call of `fn`, each repeat running at least `min_time`."""
+    number = 1
+    while True:
+        started = time.perf_counter_ns()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter_ns() - started
+        if elapsed >= min_time * 1e9 or number >= 1 << 20:
+            break
+        number *= (
+            2 if elapsed == 0 else max(2, min(10, int(min_time * 1e9 / elapsed) + 1))
+        )
+    best = elapsed / number
+    for _ in range(repeats - 1):
+        started = time.perf_counter_ns()
+        for _ in range(number):
+            fn()
+        best = min(best, (time.perf_counter_ns() - started) / number)
+    return best
+
+
+def run_suite(
+    sizes=DEFAULT_SIZES, min_time: float = 0.05, repeats: int = 5, only=None
+) -> dict:
+    """Times every case (or just the names in `only`) under the frozen clock."""
+    results = {}
+    calibrations = []
+    with frozen_clock():
+        for name, ops, fn in build_cases(sizes):
+            if only is not None and name not in only:
+                continue
+            # Calibrate right next to each case so drifting CPU speed cancels out
+            calibration = measure(_calibrate, min_time, repeats)
+            calibrations.append(calibration)
+            per_call = measure(fn, min_time, repeats)
+            results[name] = {
+                "ns_per_op": round(per_call / ops, 1),
+                "relative": round(per_call / ops / calibration * 1e6, 3),
+            }
+    return {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "calibration_ns": round(min(calibrations)),
+        "cases": results,
+    }
+
+
+def compare(
+    current: dict, baseline: dict, threshold: float = DEFAULT_THRESHOLD
+) -> list[dict]:
+    """Cases whose calibrated time grew by more than `threshold` (0.5 = 50% slower)."""
+    regressions = []
+    for name, now in current["cases"].items():
+        before = baseline.get("cases", {}).get(name)
+        if not before or not before.get("relative"):
+            continue
+        ratio = now["relative"] / before["relative"]
+        if ratio > 1 + threshold:
+            regressions.append(
+                {
+                    "case": name,
+                    "ratio": round(ratio, 2),
+                    "baseline_ns": before["ns_per_op"],
+                    "current_ns": now["ns_per_op"],
+                }
+            )
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Microbenchmarks for the per-turn helpers"
+    )
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=list(DEFAULT_SIZES),
+        help="catalogue / booking list sizes",
+    )
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="allowed slowdown (0.5 = 50%%)",
+    )
+    parser.add_argument(
+        "--min-time", type=float, default=0.05, help="seconds per timing repeat"
+    )
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="write the results as the new baseline",
+    )
+    args = parser.parse_args()
+
+    import logging
+
+    # lookup_email_by_phone and the FSM log at INFO; keep handlers out of the timings
+    logging.disable(logging.INFO)
+    current = run_suite(args.sizes, args.min_time, args.repeats)
+
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2, sort_keys=True)
+            f.write("\n")
+        sys.stdout.write(f"Baseline written to {args.baseline}\n")
+        return 0
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    regressions = compare(current, baseline, args.threshold)
+    if regressions:
+        # Shared CI machines are noisy: a regression only counts if a longer second run agrees
+        flagged = {r["case"] for r in regressions}
+        recheck = run_suite(args.sizes, args.min_time * 4, args.repeats, only=flagged)
+        current["cases"].update(recheck["cases"])
+        regressions = compare(recheck, baseline, args.threshold)
+
+    cases = baseline.get("cases", {})
+    for name, now in current["cases"].items():
+        before = cases.get(name)
+        delta = (
+            f"{now['relative'] / before['relative']:6.2f}x"
+            if before and before.get("relative")
+            else "   new"
+        )
+        sys.stdout.write(f"{name:36} {now['ns_per_op']:>14,.1f} ns/op  {delta}\n")
+    for r in regressions:
+        sys.stdout.write(
+            f"REGRESSION {r['case']}: {r['ratio']}x baseline ({r['baseline_ns']} -> {r['current_ns']} ns/op)\n"
+        )
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
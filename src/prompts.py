@@ -0,0 +1,255 @@
+"""
+What the LLM is sent: a small static core prompt plus the FSM's guidance for the current
+state, and only the tools that state needs.
+
+    python src/prompts.py        # cacheable prefix, instruction tokens and tool schema bytes per state
+"""
+
+from collections import OrderedDict, deque
+from datetime import date
+
+from fsm import FSM, State
+from tool_results import estimate_tokens
+
+# Layered most-shared first, so provider prompt caching can reuse the longest possible
+# prefix: identical for every call, then per tenant and catalogue, then per day
+STATIC_PROMPT = """You are the head receptionist answering this business's phone line; your name, the business and its services follow below.
+
+### Language
+- Reply in the language the user just spoke and switch whenever they do. Never ask which language they prefer.
+- English mode: natural English; digits are fine for times and durations ("5:00 PM", "30 minutes").
+- Hindi mode (Hinglish): casual everyday Hindi, never formal words like "uplabdh", "prakriya", "pushti", "kripya", "avashyakta". Keep the English words Appointment, Booking, Service, Time, Date, Phone number, Available, Confirm ("Kya yeh time available hai?", "Main aapki booking confirm kar deti hoon."). Say quantities, times and dates in Hindi words ("paanch baje", "pandrah minute"), never as digits.
+- Dates: always say them naturally ("January 2nd"), never as ISO dates ("2026-01-02").
+- Phone numbers: always English digits in one continuous stream, no grouping or pauses ("9876543210"), in every language; drop a +91 prefix.
+
+### Scope
+- You are a salon receptionist only: services, appointments, rescheduling, cancellations and availability. No jokes, riddles, stories, maths, coding or trivia; decline warmly ("I'm afraid I don't know any jokes, but I can help you book a great haircut!") and bring the caller back to the salon.
+- Appointments can be booked up to 7 days ahead; politely decline anything later.
+- Services are listed below for you only; never read the list out. For a service we don't offer (especially manicure/pedicure), say warmly "We are thinking to add this in our salon soon! But for now..." suggest our relaxing spa, and ask "Was there any other service you were looking for?" without listing services.
+
+### How to speak
+- A real, warm conversation, like a friendly Indian receptionist with an Indian English cadence. Keep replies to 1-3 short sentences and ask one question at a time.
+- Natural openers: "Okay...", "Alright...", "Perfect...", "Got it...".
+- Never use robotic words (assist, process, initiate, execute, validate, affirmative, negative, query, function, detected, ensure, acknowledge, apologies, commencing, system, provide, utilize) or phrases like "How can I assist you?", "Please provide...", "I have successfully...", "As an AI...", "I apologize...". Say "Great, I've booked that for you.", not "I successfully processed your booking."
+- Never say "Let me check" or anything similar before calling a tool; the system covers the wait. Call tools silently and immediately.
+- Use everything the caller already told you and never re-ask for it. Don't ask for their name."""
+
+TENANT_PROMPT = """### You
+You are {agent_name}, the head receptionist at {business_name}. You represent a {industry}.
+
+### Services (internal, never read this list out)
+{services}"""
+
+DAILY_PROMPT = """### Today
+Current Date: {today} (Year: {year})
+Location: Asia/Kolkata"""
+
+
+def format_services(services: list[dict]) -> str:
+    if not services:
+        return "- Services will be loaded dynamically from Cal.com"
+    return "\n".join(f"- {s['title']}: {s['duration']} minutes" for s in services)
+
+
+def prompt_layers(agent_config: dict, services: list[dict], today: date) -> list[str]:
+    """The core prompt's blocks, most widely shared first: static, tenant, daily."""
+    tenant = TENANT_PROMPT.format(
+        agent_name=agent_config.get("agentName", "Default Agent"),
+        business_name=agent_config.get("businessName", "Business"),
+        industry=agent_config.get("industry", "Service"),
+        services=format_services(services),
+    )
+    daily = DAILY_PROMPT.format(today=today.strftime("%A, %d %B %Y"), year=today.year)
+    return [STATIC_PROMPT, tenant, daily]
+
+
+def build_core_prompt(agent_config: dict, services: list[dict], today: date) -> str:
+    return "\n\n".join(prompt_layers(agent_config, services, today))
+
+
+class PromptCache:
+    """
+    Rendered core prompts per (project, catalogue version, local date), so building one
+    costs a dict lookup per session. An entry is rebuilt if the project's config changed.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[tuple, tuple[dict, str]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def core(
+        self,
+        project_id: str | None,
+        agent_config: dict,
+        catalogue_version: int,
+        services: list[dict],
+        today: date,
+    ) -> str:
+        key = (project_id, catalogue_version, today)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == agent_config:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry[1]
+        self.misses += 1
+        prompt = build_core_prompt(agent_config, services, today)
+        self._entries[key] = (dict(agent_config), prompt)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return prompt
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+def cacheable_prefix(
+    agent_config: dict, services: list[dict], today: date
+) -> dict[str, int]:
+    """
+    Approximate tokens of the instruction prefix shared by every call, by every call of
+    a tenant (same catalogue), and by a tenant's calls today; the state block follows.
+    """
+    static, tenant, daily = prompt_layers(agent_config, services, today)
+    return {
+        "static": estimate_tokens(static),
+        "static+tenant": estimate_tokens(f"{static}\n\n{tenant}"),
+        "static+tenant+daily": estimate_tokens(f"{static}\n\n{tenant}\n\n{daily}"),
+    }
+
+
+def scoped_instructions(core: str, fsm: FSM) -> str:
+    """The core prompt followed by what to do in the FSM's current state."""
+    return f"{core}\n\n### Right now\n{fsm.get_system_prompt()}"
+
+
+def state_prompt_sizes(core: str) -> dict[str, int]:
+    """Approximate instruction tokens the LLM receives in each state."""
+    fsm = FSM()
+    sizes = {}
+    for state in State:
+        fsm.state = state
+        sizes[state.name] = estimate_tokens(scoped_instructions(core, fsm))
+    return sizes
+
+
+class PromptStats:
+    """
+    LLM requests grouped by the FSM state their instructions were scoped to: prompt
+    tokens (and how many the provider served from its cache) and time to first token.
+    """
+
+    def __init__(self, window: int = 500):
+        self.window = window
+        self._requests: dict[str, int] = {}
+        self._prompt_tokens: dict[str, int] = {}
+        self._cached_tokens: dict[str, int] = {}
+        self._ttfts: dict[str, deque] = {}
+
+    def record(self, state: str, prompt_tokens: int, cached_tokens: int, ttft: float):
+        self._requests[state] = self._requests.get(state, 0) + 1
+        self._prompt_tokens[state] = self._prompt_tokens.get(state, 0) + prompt_tokens
+        self._cached_tokens[state] = self._cached_tokens.get(state, 0) + cached_tokens
+        if ttft >= 0:
+            self._ttfts.setdefault(state, deque(maxlen=self.window)).append(ttft)
+
+    def stats(self) -> dict:
+        report = {}
+        for state, requests in self._requests.items():
+            ttfts = sorted(self._ttfts.get(state, ()))
+            report[state] = {
+                "requests": requests,
+                "avg_prompt_tokens": round(self._prompt_tokens[state] / requests),
+                "avg_cached_tokens": round(self._cached_tokens[state] / requests),
+                "ttft_p50_ms": round(ttfts[len(ttfts) // 2] * 1000) if ttfts else None,
+                "ttft_p95_ms": round(
+                    ttfts[min(len(ttfts) - 1, int(len(ttfts) * 0.95))] * 1000
+                )
+                if ttfts
+                else None,
+            }
+        return report
+
+
+class ToolExposure:
+    """
+    Tool schema bytes sent with each state's toolset, and tool calls made outside the
+    toolset of the state the call happened in (wrong or premature calls cost turns).
+    """
+
+    def __init__(self):
+        self.full_schema_bytes = 0
+        self._schema_bytes: dict[str, int] = {}
+        self._tools: dict[str, int] = {}
+        self._calls: dict[str, int] = {}
+        self._off_state: dict[str, dict[str, int]] = {}
+
+    def exposed(self, state: str, tools: int, schema_bytes: int):
+        self._tools[state] = tools
+        self._schema_bytes[state] = schema_bytes
+
+    def called(self, state: str, tool: str, in_scope: bool):
+        self._calls[state] = self._calls.get(state, 0) + 1
+        if not in_scope:
+            off = self._off_state.setdefault(state, {})
+            off[tool] = off.get(tool, 0) + 1
+
+    def stats(self) -> dict:
+        calls = sum(self._calls.values())
+        off_state = sum(sum(off.values()) for off in self._off_state.values())
+        states = {}
+        for state in self._schema_bytes.keys() | self._calls.keys():
+            state_calls = self._calls.get(state, 0)
+            state_off = sum(self._off_state.get(state, {}).values())
+            states[state] = {
+                "tools": self._tools.get(state),
+                "schema_bytes": self._schema_bytes.get(state),
+                "calls": state_calls,
+                "off_state_calls": self._off_state.get(state, {}),
+                "off_state_rate": round(state_off / state_calls, 4)
+                if state_calls
+                else 0.0,
+            }
+        return {
+            "full_schema_bytes": self.full_schema_bytes,
+            "calls": calls,
+            "off_state_rate": round(off_state / calls, 4) if calls else 0.0,
+            "states": states,
+        }
+
+
+def main():
+    services = [
+        {"title": title, "duration": duration}
+        for title, duration in [
+            ("Haircut", 30),
+            ("Hairwash", 30),
+            ("Spa", 60),
+            ("Makeup", 45),
+            ("Beard Trim", 15),
+        ]
+    ]
+    today = date.today()
+    core = build_core_prompt({}, services, today)
+
+    from agent import Assistant
+
+    schema_bytes = Assistant({}).schema_bytes
+    for layers, tokens in cacheable_prefix({}, services, today).items():
+        print(f"{'prefix: ' + layers:<28}{tokens:>6} tokens")
+    print(
+        f"{'all tools':<28}{'':>13}{len(schema_bytes):>4} tools {sum(schema_bytes.values()):>6} schema bytes"
+    )
+    fsm = FSM()
+    for state, tokens in state_prompt_sizes(core).items():
+        fsm.state = State[state]
+        tools = fsm.available_tools()
+        print(
+            f"{state:<28}{tokens:>6} tokens {len(tools):>4} tools {sum(schema_bytes[t] for t in tools):>6} schema bytes"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+import asyncio
+import contextvars
+import functools
+import logging
+import time
+from collections import deque
+from contextlib import contextmanager
+
+logger = logging.getLogger("resilience")
+
+
+class CalUnavailableError(Exception):
+    """Cal.com can't answer in time for this turn; the tool should fall back to a spoken reply."""
+
+
+class CircuitOpenError(CalUnavailableError):
+    pass
+
+
+class DeadlineExceededError(CalUnavailableError):
+    pass
+
+
+# ── Circuit breaker ─────────────────────────────────────────
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Rolling-window circuit breaker for one Cal.com endpoint group.
+
+    Opens when, over the last `window_seconds`, at least `min_requests` calls were made and
+    either the error rate or the slow-call rate crosses its threshold. After `open_seconds`
+    a single probe is let through (half-open); its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        window_seconds: float = 30.0,
+        min_requests: int = 5,
+        error_threshold: float = 0.5,
+        slow_call_seconds: float = 4.0,
+        slow_threshold: float = 0.8,
+        open_seconds: float = 15.0,
+    ):
+        self.name = name
+        self.window_seconds = window_seconds
+        self.min_requests = min_requests
+        self.error_threshold = error_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_threshold = slow_threshold
+        self.open_seconds = open_seconds
+
+        self.state = CLOSED
+        self._calls: deque = deque()  # (timestamp, ok, slow)
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.times_opened = 0
+        self.rejected = 0
+
+    def allow(self) -> bool:
+        """Whether a request may go out now."""
+        if self.state == OPEN:
+            if time.monotonic() - self._opened_at < self.open_seconds:
+                self.rejected += 1
+                return False
+            self.state = HALF_OPEN
+            self._probe_in_flight = False
+        if self.state == HALF_OPEN:
+            if self._probe_in_flight:
+                self.rejected += 1
+                return False
+            self._probe_in_flight = True
+        return True
+
+    def record(self, ok: bool, latency: float, slow: bool | None = None):
+        now = time.monotonic()
+        if slow is None:
+            slow = latency >= self.slow_call_seconds
+
+        if self.state == HALF_OPEN:
+            self._probe_in_flight = False
+            if ok and not slow:
+                self.state = CLOSED
+                self._calls.clear()
+                logger.info(f"Circuit {self.name} closed")
+            else:
+                self._open(now)
+            return
+
+        self._calls.append((now, ok, slow))
+        self._trim(now)
+        if self.state == CLOSED and len(self._calls) >= self.min_requests:
+            errors, slows = self._rates()
+            if errors >= self.error_threshold or slows >= self.slow_threshold:
+                self._open(now)
+
+    def release(self):
+        """Forgets an abandoned call (e.g. cancelled) so a half-open probe slot isn't held forever."""
+        self._probe_in_flight = False
+
+    def _open(self, now: float):
+        self.state = OPEN
+        self._opened_at = now
+        self.times_opened += 1
+        logger.warning(f"Circuit {self.name} opened")
+
+    def _trim(self, now: float):
+        while self._calls and now - self._calls[0][0] > self.window_seconds:
+            self._calls.popleft()
+
+    def _rates(self) -> tuple[float, float]:
+        n = len(self._calls)
+        if not n:
+            return 0.0, 0.0
+        errors = sum(1 for _, ok, _ in self._calls if not ok)
+        slows = sum(1 for _, _, slow in self._calls if slow)
+        return errors / n, slows / n
+
+    def stats(self) -> dict:
+        self._trim(time.monotonic())
+        errors, slows = self._rates()
+        return {
+            "state": self.state,
+            "window_requests": len(self._calls),
+            "error_rate": round(errors, 3),
+            "slow_rate": round(slows, 3),
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+        }
+
+
+# ── Deadline budgets ────────────────────────────────────────
+
+_deadline: contextvars.ContextVar = contextvars.ContextVar("cal_deadline", default=None)
+
+
+@contextmanager
+def deadline(seconds: float | None):
+    """Caps every Cal.com call made inside the block to `seconds` in total. None clears the budget."""
+    token = _deadline.set(time.monotonic() + seconds if seconds is not None else None)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining_budget() -> float | None:
+    """Seconds left in the current budget, or None when no budget applies."""
+    at = _deadline.get()
+    return None if at is None else at - time.monotonic()
+
+
+async def within_budget(awaitable):
+    """Awaits `awaitable`, giving up with DeadlineExceededError when the current budget runs out."""
+    remaining = remaining_budget()
+    if remaining is None:
+        return await awaitable
+    if remaining <= 0:
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        raise DeadlineExceededError("Tool budget already spent")
+    try:
+        return await asyncio.wait_for(awaitable, remaining)
+    except asyncio.TimeoutError as e:
+        raise DeadlineExceededError(f"Tool budget of {remaining:.1f}s ran out") from e
+
+
+async def detached(coro):
+    """Runs `coro` without the caller's budget (for background work started from a tool)."""
+    with deadline(None):
+        return await coro
+
+
+def tool_budget(seconds: float):
+    """Decorator giving a tool a total latency budget for its Cal.com calls."""
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            with deadline(seconds):
+                return await fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
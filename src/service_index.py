@@ -0,0 +1,154 @@
+import re
+
+# Minimum score for find_service_by_name to accept a fuzzy match
+MIN_MATCH_SCORE = 0.5
+
+SCORE_EXACT = 1.0
+SCORE_PREFIX = 0.9
+SCORE_TOKEN = 0.85
+SCORE_CONTAINS = 0.75
+SCORE_PHONETIC = 0.8
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+# Rough English/Hinglish sound-alikes, applied in order
+_PHONETIC_RULES = (
+    ("ph", "f"),
+    ("sh", "s"),
+    ("ch", "c"),
+    ("ck", "k"),
+    ("ce", "se"),
+    ("ci", "si"),
+    ("c", "k"),
+    ("q", "k"),
+    ("z", "s"),
+    ("w", "v"),
+    ("x", "ks"),
+)
+_PHONETIC_DROP = set("aeiouhy")
+
+
+def normalize_name(text: str) -> str:
+    """Lowercases and turns punctuation/hyphens into single spaces."""
+    return _NON_ALNUM.sub(" ", (text or "").lower()).strip()
+
+
+def phonetic_key(compact: str) -> str:
+    """Cheap sound-alike key, so STT mishearings like 'hair was' still hit 'Hairwash'."""
+    if not compact:
+        return ""
+    for src, dst in _PHONETIC_RULES:
+        compact = compact.replace(src, dst)
+    key = [compact[0]]
+    for ch in compact[1:]:
+        if ch in _PHONETIC_DROP or ch == key[-1]:
+            continue
+        key.append(ch)
+    return "".join(key)
+
+
+def trigrams(compact: str) -> frozenset:
+    padded = f"  {compact} "
+    return frozenset(padded[i : i + 3] for i in range(len(padded) - 2))
+
+
+def _dice(a: frozenset, b: frozenset) -> float:
+    if not a or not b:
+        return 0.0
+    return 2 * len(a & b) / (len(a) + len(b))
+
+
+class ServiceIndex:
+    """
+    Normalized lookup structures over the service catalogue, built once per catalogue version:
+    exact, prefix and token maps for the common cases, plus trigram and phonetic keys for
+    fuzzy matching of misheard names.
+    """
+
+    def __init__(self, services: list[dict], version: int = 0):
+        self.version = version
+        self.services = services
+        self._exact: dict[str, int] = {}
+        self._prefix: dict[str, list[int]] = {}
+        self._tokens: dict[str, list[int]] = {}
+        self._compact: list[tuple[int, str]] = []
+        self._trigrams: list[tuple[int, frozenset]] = []
+        self._phonetic: dict[str, list[int]] = {}
+
+        for pos, service in enumerate(services):
+            for name in {
+                normalize_name(service.get("title")),
+                normalize_name(service.get("slug")),
+            }:
+                if not name:
+                    continue
+                compact = name.replace(" ", "")
+                self._exact.setdefault(name, pos)
+                self._exact.setdefault(compact, pos)
+                for i in range(1, len(compact) + 1):
+                    _add(self._prefix, compact[:i], pos)
+                for token in name.split():
+                    _add(self._tokens, token, pos)
+                self._compact.append((pos, compact))
+                self._trigrams.append((pos, trigrams(compact)))
+                _add(self._phonetic, phonetic_key(compact), pos)
+
+    def match(self, query: str, limit: int = 3) -> list[tuple[dict, float]]:
+        """Ranked (service, score) candidates for a spoken service name, best first."""
+        name = normalize_name(query)
+        if not name:
+            return []
+        compact = name.replace(" ", "")
+        scores: dict[int, float] = {}
+
+        def offer(pos: int, score: float):
+            if score > scores.get(pos, 0.0):
+                scores[pos] = score
+
+        pos = self._exact.get(name, self._exact.get(compact))
+        if pos is not None:
+            offer(pos, SCORE_EXACT)
+
+        # Query is the start of a service name ("hair was" -> "hairwash")
+        for pos in self._prefix.get(compact, ()):
+            offer(pos, SCORE_PREFIX)
+
+        # Service name is the start of the query ("haircut for men")
+        for i in range(len(compact), 0, -1):
+            pos = self._exact.get(compact[:i])
+            if pos is not None:
+                offer(pos, SCORE_PREFIX)
+                break
+
+        for token in name.split():
+            for pos in self._tokens.get(token, ()):
+                offer(pos, SCORE_TOKEN)
+
+        if not scores:
+            for pos, service_compact in self._compact:
+                if compact in service_compact or service_compact in compact:
+                    offer(pos, SCORE_CONTAINS)
+
+            for pos in self._phonetic.get(phonetic_key(compact), ()):
+                offer(pos, SCORE_PHONETIC)
+
+            query_grams = trigrams(compact)
+            for pos, grams in self._trigrams:
+                offer(pos, _dice(query_grams, grams))
+
+        # Catalogue order breaks ties, like the old linear scan
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return [(self.services[pos], round(score, 3)) for pos, score in ranked[:limit]]
+
+    def best(self, query: str, min_score: float = MIN_MATCH_SCORE) -> dict | None:
+        candidates = self.match(query, limit=1)
+        if candidates and candidates[0][1] >= min_score:
+            return candidates[0][0]
+        return None
+
+
+def _add(mapping: dict, key: str, pos: int):
+    # Positions arrive in catalogue order, so a duplicate can only be the last entry
+    bucket = mapping.setdefault(key, [])
+    if not bucket or bucket[-1] != pos:
+        bucket.append(pos)
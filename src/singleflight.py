@@ -0,0 +1,59 @@
+import asyncio
+import logging
+
+from resilience import detached, within_budget
+
+logger = logging.getLogger("singleflight")
+
+
+class SingleFlight:
+    """
+    Collapses identical concurrent async calls into one in-flight task.
+
+    Keys are tuples whose first element names the kind of request
+    (e.g. ("slots", event_type_id, start, end)); metrics are kept per kind.
+    """
+
+    def __init__(self):
+        self._inflight: dict[tuple, asyncio.Task] = {}
+        self._calls: dict[str, int] = {}
+        self._collapsed: dict[str, int] = {}
+
+    async def do(self, key: tuple, fn):
+        """Runs `fn()` unless an identical call is already running, in which case its result is shared."""
+        kind = str(key[0])
+        task = self._inflight.get(key)
+        if task is not None:
+            self._collapsed[kind] = self._collapsed.get(kind, 0) + 1
+            logger.debug(f"Collapsed duplicate request {key}")
+        else:
+            self._calls[kind] = self._calls.get(kind, 0) + 1
+            # The shared request isn't bound to the first caller's budget; a slow answer
+            # still lands for everyone else (and the caches)
+            task = asyncio.ensure_future(detached(fn()))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Shield so one cancelled caller doesn't cancel the request for everyone else;
+        # each caller gives up on its own budget
+        return await within_budget(asyncio.shield(task))
+
+    def in_flight(self) -> int:
+        return len(self._inflight)
+
+    def stats(self) -> dict:
+        kinds = sorted(set(self._calls) | set(self._collapsed))
+        return {
+            "calls": sum(self._calls.values()),
+            "collapsed": sum(self._collapsed.values()),
+            "by_kind": {
+                kind: {
+                    "calls": self._calls.get(kind, 0),
+                    "collapsed": self._collapsed.get(kind, 0),
+                }
+                for kind in kinds
+            },
+        }
+
+
+# Shared by every session on this worker process
+CAL_FLIGHTS = SingleFlight()
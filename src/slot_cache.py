@@ -0,0 +1,79 @@
+import logging
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger("slot_cache")
+
+
+class SlotCache:
+    """
+    LRU + TTL cache of Cal.com slots keyed by (eventTypeId, local date 'YYYY-MM-DD').
+    Values are that day's free slots as returned by the caller's fetch (DaySlots in the agent).
+    """
+
+    def __init__(self, ttl_seconds: float = 120.0, max_entries: int = 512):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: OrderedDict[tuple, tuple[float, object]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        # Bumped on every invalidation so in-flight fetches can't write back stale days
+        self.generation = 0
+
+    def get(self, event_type_id, day: str):
+        key = (event_type_id, day)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        stored_at, slots = entry
+        if time.monotonic() - stored_at > self.ttl_seconds:
+            del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return slots
+
+    def put(self, event_type_id, day: str, slots, generation: int | None = None):
+        if generation is not None and generation != self.generation:
+            # Fetched before a booking changed the calendar
+            return
+        key = (event_type_id, day)
+        self._entries[key] = (time.monotonic(), slots)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate_day(self, day: str):
+        """Drop a day for every event type (all services share one calendar)."""
+        self.generation += 1
+        stale = [key for key in self._entries if key[1] == day]
+        for key in stale:
+            del self._entries[key]
+        self.invalidations += len(stale)
+        if stale:
+            logger.debug(f"Invalidated {len(stale)} slot cache entries for {day}")
+
+    def clear(self):
+        self.generation += 1
+        self.invalidations += len(self._entries)
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+# Shared by every session on this worker process
+SLOT_CACHE = SlotCache()
@@ -0,0 +1,327 @@
+import logging
+import time
+from bisect import bisect_left
+from datetime import date, datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from cal_client import get_cal_client
+from slot_store import DaySlots
+
+logger = logging.getLogger("slot_engine")
+
+SCHEDULES_API_VERSION = "2024-06-11"
+
+WEEKDAY_NAMES = (
+    "monday",
+    "tuesday",
+    "wednesday",
+    "thursday",
+    "friday",
+    "saturday",
+    "sunday",
+)
+
+# Slots starting this soon are left out when comparing with Cal.com (the two clocks race)
+RECONCILE_MARGIN = timedelta(minutes=15)
+
+
+def _minutes(hhmm: str) -> int:
+    hours, minutes = hhmm.split(":")[:2]
+    return int(hours) * 60 + int(minutes)
+
+
+def _parse_iso(value: str | None) -> datetime | None:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+
+class Schedule:
+    """Weekly working hours plus per-date overrides, as minute ranges in the schedule's timezone."""
+
+    def __init__(
+        self,
+        weekly: dict[int, list[tuple[int, int]]],
+        overrides: dict[str, list[tuple[int, int]]] | None = None,
+        tz: str = "Asia/Kolkata",
+    ):
+        self.weekly = {day: sorted(windows) for day, windows in weekly.items()}
+        self.overrides = {
+            day: sorted(windows) for day, windows in (overrides or {}).items()
+        }
+        self.tz = ZoneInfo(tz)
+
+    @classmethod
+    def from_cal(cls, data: dict, default_tz: str = "Asia/Kolkata") -> "Schedule":
+        """Builds a schedule from a Cal.com /v2/schedules payload."""
+        weekly: dict[int, list[tuple[int, int]]] = {}
+        for block in data.get("availability") or []:
+            window = (_minutes(block["startTime"]), _minutes(block["endTime"]))
+            for name in block.get("days") or []:
+                weekly.setdefault(WEEKDAY_NAMES.index(name.lower()), []).append(window)
+        overrides: dict[str, list[tuple[int, int]]] = {}
+        for block in data.get("overrides") or []:
+            windows = overrides.setdefault(block["date"], [])
+            # An override with equal start and end marks the day off
+            if block.get("startTime") != block.get("endTime"):
+                windows.append(
+                    (_minutes(block["startTime"]), _minutes(block["endTime"]))
+                )
+        return cls(weekly, overrides, data.get("timeZone") or default_tz)
+
+    def windows(self, day: date) -> list[tuple[int, int]]:
+        key = day.isoformat()
+        if key in self.overrides:
+            return self.overrides[key]
+        return self.weekly.get(day.weekday(), [])
+
+
+class SlotEngine:
+    """
+    Computes free slots (as DaySlots minute arrays) in memory from the working-hours
+    schedule and the busy intervals of existing bookings, instead of asking /v1/slots.
+
+    Busy time is kept per local day as merged, sorted (starts, ends) minute arrays, so
+    checking a candidate slot is one bisect. Bookings arrive through the booking index
+    (see BookingIndex.add_mirror). Cal.com stays the source of truth: `reconcile`
+    compares against real /v1/slots answers and, for days that disagree, serves Cal.com's
+    slots (minus anything booked since) until the next reconciliation, which a booking
+    change on such a day makes due right away.
+    """
+
+    def __init__(
+        self,
+        api_url: str,
+        api_key: str | None,
+        tz: str = "Asia/Kolkata",
+        reconcile_interval: float = 300.0,
+        clock=None,
+    ):
+        self.api_url = api_url
+        self.api_key = api_key
+        self.tz = ZoneInfo(tz)
+        self.reconcile_interval = reconcile_interval
+        self.clock = clock or (lambda: datetime.now(timezone.utc))
+
+        self.schedule: Schedule | None = None
+        self.synced = False
+        self._intervals: dict[str, dict[str, tuple[int, int]]] = {}
+        self._days_of_uid: dict[str, list[str]] = {}
+        self._merged: dict[str, tuple[list[int], list[int]]] = {}
+        self._overrides: dict[tuple, DaySlots] = {}
+        self._reconciled_at: dict = {}
+        self._schedule_loaded_at: float | None = None
+
+        self.local_answers = 0
+        self.override_answers = 0
+        self.reconciliations = 0
+        self.mismatched_days = 0
+
+    @property
+    def ready(self) -> bool:
+        """True once both the schedule and the booking list have been loaded."""
+        return self.schedule is not None and self.synced
+
+    # ── Bookings (mirrored from BookingIndex) ───────────────
+
+    def upsert(self, booking: dict):
+        uid = booking.get("uid")
+        start, end = _parse_iso(booking.get("start")), _parse_iso(booking.get("end"))
+        if not uid or start is None or end is None or end <= start:
+            return
+        self.remove(uid)
+        start, end = start.astimezone(self.tz), end.astimezone(self.tz)
+        days = []
+        day = start.date()
+        while day <= end.date():
+            first = start.hour * 60 + start.minute if day == start.date() else 0
+            last = end.hour * 60 + end.minute if day == end.date() else 24 * 60
+            if last > first:
+                key = day.isoformat()
+                self._intervals.setdefault(key, {})[uid] = (first, last)
+                self._changed(key)
+                days.append(key)
+            day += timedelta(days=1)
+        self._days_of_uid[uid] = days
+
+    def remove(self, uid: str):
+        for key in self._days_of_uid.pop(uid, ()):
+            bucket = self._intervals.get(key, {})
+            bucket.pop(uid, None)
+            if not bucket:
+                self._intervals.pop(key, None)
+            self._changed(key)
+
+    def retain(self, uids: set):
+        """Called after a full booking scan: drops every booking Cal.com no longer returned."""
+        for uid in [uid for uid in self._days_of_uid if uid not in uids]:
+            self.remove(uid)
+        yesterday = (
+            self.clock().astimezone(self.tz).date() - timedelta(days=1)
+        ).isoformat()
+        for key in [key for key in self._intervals if key < yesterday]:
+            self._intervals.pop(key, None)
+            self._merged.pop(key, None)
+        self.synced = True
+
+    def _changed(self, key: str):
+        self._merged.pop(key, None)
+        # Cal.com's answer for this day is now out of date: reconcile on the next lookup
+        for event_type_id, day in self._overrides:
+            if day == key:
+                self._reconciled_at.pop(event_type_id, None)
+
+    def busy(self, key: str) -> tuple[list[int], list[int]]:
+        """Merged busy minute ranges of a local day as parallel sorted (starts, ends) arrays."""
+        merged = self._merged.get(key)
+        if merged is None:
+            starts: list[int] = []
+            ends: list[int] = []
+            for first, last in sorted(self._intervals.get(key, {}).values()):
+                if ends and first <= ends[-1]:
+                    ends[-1] = max(ends[-1], last)
+                else:
+                    starts.append(first)
+                    ends.append(last)
+            merged = self._merged[key] = (starts, ends)
+        return merged
+
+    def is_free(self, key: str, first: int, last: int) -> bool:
+        starts, ends = self.busy(key)
+        # The busy range starting closest before `last` is the only one that can overlap
+        i = bisect_left(starts, last)
+        return i == 0 or ends[i - 1] <= first
+
+    # ── Slots ───────────────────────────────────────────────
+
+    @staticmethod
+    def _span(event_type: dict) -> tuple[int, int, int]:
+        """Length, before buffer and after buffer of an event type, in minutes."""
+        length = event_type.get("lengthInMinutes") or event_type.get("length") or 30
+        return (
+            length,
+            event_type.get("beforeEventBuffer") or 0,
+            event_type.get("afterEventBuffer") or 0,
+        )
+
+    def compute(self, event_type: dict, day: str) -> DaySlots:
+        """Free slot starts of one local day ('YYYY-MM-DD')."""
+        length, before, after = self._span(event_type)
+        step = event_type.get("slotInterval") or length
+        notice = timedelta(minutes=event_type.get("minimumBookingNotice") or 0)
+        earliest = self.clock() + notice
+        local_day = date.fromisoformat(day)
+        midnight = datetime(
+            local_day.year, local_day.month, local_day.day, tzinfo=self.schedule.tz
+        )
+        # Slots must start after `earliest`; on any day but the first that bound is below zero
+        floor = (earliest - midnight) // timedelta(minutes=1)
+
+        starts: list[int] = []
+        for open_at, close_at in self.schedule.windows(local_day):
+            for first in range(open_at, close_at - length + 1, step):
+                if first > floor and self.is_free(
+                    day, first - before, first + length + after
+                ):
+                    starts.append(first)
+        return DaySlots(day, starts, self.schedule.tz)
+
+    def day_slots(self, event_type: dict, day: str) -> DaySlots | None:
+        """Slots for one day, or None while the engine can't answer on its own yet."""
+        if not self.ready:
+            return None
+        override = self._overrides.get((event_type.get("id"), day))
+        if override is not None:
+            self.override_answers += 1
+            # Bookings made since the reconciliation still take their slots
+            length, before, after = self._span(event_type)
+            free = [
+                m
+                for m in override.minutes
+                if self.is_free(day, m - before, m + length + after)
+            ]
+            return (
+                override
+                if len(free) == len(override)
+                else DaySlots(day, free, override.tz)
+            )
+        self.local_answers += 1
+        return self.compute(event_type, day)
+
+    def reconcile_due(self, event_type_id) -> bool:
+        checked = self._reconciled_at.get(event_type_id)
+        return checked is None or time.monotonic() - checked >= self.reconcile_interval
+
+    def reconcile(self, event_type: dict, remote: dict[str, DaySlots]) -> list[str]:
+        """
+        Compares Cal.com's slots per day with what the engine computes. Days that
+        disagree are answered from `remote` until they change. Returns those days.
+        """
+        if not self.ready:
+            return []
+        event_type_id = event_type.get("id")
+        horizon = self.clock() + RECONCILE_MARGIN
+        mismatched = []
+        for day, theirs in remote.items():
+            self._overrides.pop((event_type_id, day), None)
+            ours = self.compute(event_type, day)
+            cutoff = (horizon - ours.at(0)) // timedelta(minutes=1)
+            if [m for m in ours.minutes if m > cutoff] != [
+                m for m in theirs.minutes if m > cutoff
+            ]:
+                self._overrides[(event_type_id, day)] = theirs
+                mismatched.append(day)
+        self._reconciled_at[event_type_id] = time.monotonic()
+        self.reconciliations += 1
+        self.mismatched_days += len(mismatched)
+        if mismatched:
+            logger.warning(
+                f"Slot engine disagreed with Cal.com for event type {event_type_id} on {mismatched}"
+            )
+        return mismatched
+
+    # ── Schedule ────────────────────────────────────────────
+
+    def schedule_due(self, max_age: float = 3600.0) -> bool:
+        return (
+            self._schedule_loaded_at is None
+            or time.monotonic() - self._schedule_loaded_at >= max_age
+        )
+
+    async def load_schedule(self):
+        """Fetches the default working-hours schedule from Cal.com."""
+        response = await get_cal_client().get(
+            f"{self.api_url}/schedules/default",
+            endpoint="schedules",
+            headers={
+                "Authorization": f"Bearer {self.api_key}",
+                "cal-api-version": SCHEDULES_API_VERSION,
+            },
+        )
+        if response.status_code != 200:
+            raise RuntimeError(
+                f"Schedule fetch failed: {response.status_code} {response.text}"
+            )
+        data = response.json().get("data") or {}
+        self.schedule = Schedule.from_cal(data, default_tz=self.tz.key)
+        self._schedule_loaded_at = time.monotonic()
+        self._overrides.clear()
+        self._reconciled_at.clear()
+        logger.info(
+            f"Loaded working hours: {len(self.schedule.weekly)} weekdays, {len(self.schedule.overrides)} overrides"
+        )
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "bookings": len(self._days_of_uid),
+            "days": len(self._intervals),
+            "local_answers": self.local_answers,
+            "override_answers": self.override_answers,
+            "overrides": len(self._overrides),
+            "reconciliations": self.reconciliations,
+            "mismatched_days": self.mismatched_days,
+        }
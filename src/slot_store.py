@@ -0,0 +1,190 @@
+from array import array
+from bisect import bisect_left
+from datetime import date, datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+LOCAL_TZ = ZoneInfo("Asia/Kolkata")
+
+# Local minute ranges [start, end) of the spoken day parts
+PERIODS = {
+    "morning": (6 * 60, 12 * 60),
+    "afternoon": (12 * 60, 17 * 60),
+    "evening": (17 * 60, 22 * 60),
+}
+
+
+def format_minute(minute: int) -> str:
+    """570 -> '09:30 AM' (the format the tools have always spoken)."""
+    hour, mins = divmod(minute, 60)
+    return f"{(hour % 12) or 12:02d}:{mins:02d} {'AM' if hour < 12 else 'PM'}"
+
+
+class SlotQuery:
+    """Answer to DaySlots.query: the few candidates worth reading out, in minutes."""
+
+    def __init__(
+        self,
+        requested: int | None,
+        exact: bool,
+        before: int | None,
+        after: int | None,
+        nearest: list[int],
+        total: int,
+        last: int | None,
+    ):
+        self.requested = requested
+        self.exact = exact
+        self.before = before
+        self.after = after
+        self.nearest = nearest
+        # Slots in the queried period, and the latest of them
+        self.total = total
+        self.last = last
+
+
+class DaySlots:
+    """
+    One day's free slot starts for one event type, as a sorted array of local
+    minutes since midnight. Immutable; every query is a bisect.
+    """
+
+    __slots__ = ("day", "minutes", "tz")
+
+    def __init__(self, day: str, minutes=(), tz: ZoneInfo = LOCAL_TZ):
+        self.day = day
+        self.minutes = array("H", sorted(set(minutes)))
+        self.tz = tz
+
+    @classmethod
+    def from_cal(
+        cls, day: str, slots: list | None, tz: ZoneInfo = LOCAL_TZ
+    ) -> "DaySlots":
+        """From Cal.com's [{'time': iso}, ...] for `day` (slots on other local days are dropped)."""
+        minutes = []
+        for slot in slots or ():
+            value = slot.get("time") if isinstance(slot, dict) else slot
+            if not value:
+                continue
+            local = datetime.fromisoformat(value.replace("Z", "+00:00")).astimezone(tz)
+            if local.date().isoformat() == day:
+                minutes.append(local.hour * 60 + local.minute)
+        return cls(day, minutes, tz)
+
+    def __len__(self) -> int:
+        return len(self.minutes)
+
+    def __eq__(self, other) -> bool:
+        return (
+            isinstance(other, DaySlots)
+            and self.day == other.day
+            and self.minutes == other.minutes
+        )
+
+    def __repr__(self) -> str:
+        return f"DaySlots({self.day!r}, {[format_minute(m) for m in self.minutes]})"
+
+    def at(self, minute: int) -> datetime:
+        day = date.fromisoformat(self.day)
+        return datetime(day.year, day.month, day.day, tzinfo=self.tz) + timedelta(
+            minutes=minute
+        )
+
+    def to_cal(self) -> list[dict]:
+        """Back to Cal.com's shape, UTC ISO strings."""
+        return [
+            {
+                "time": self.at(m)
+                .astimezone(timezone.utc)
+                .strftime("%Y-%m-%dT%H:%M:%S.000Z")
+            }
+            for m in self.minutes
+        ]
+
+    # ── Queries ─────────────────────────────────────────────
+
+    def _bounds(self, period: str | None) -> tuple[int, int]:
+        lo, hi = PERIODS.get(period or "", (0, 24 * 60))
+        return bisect_left(self.minutes, lo), bisect_left(self.minutes, hi)
+
+    def contains(self, minute: int) -> bool:
+        i = bisect_left(self.minutes, minute)
+        return i < len(self.minutes) and self.minutes[i] == minute
+
+    def before(self, minute: int, period: str | None = None) -> int | None:
+        """Latest slot strictly before `minute`."""
+        lo, hi = self._bounds(period)
+        i = bisect_left(self.minutes, minute, lo, hi)
+        return self.minutes[i - 1] if i > lo else None
+
+    def after(self, minute: int, period: str | None = None) -> int | None:
+        """Earliest slot strictly after `minute`."""
+        lo, hi = self._bounds(period)
+        i = bisect_left(self.minutes, minute + 1, lo, hi)
+        return self.minutes[i] if i < hi else None
+
+    def nearest(self, minute: int, k: int = 3, period: str | None = None) -> list[int]:
+        """The `k` slots closest to `minute` (earlier wins a tie), in time order."""
+        lo, hi = self._bounds(period)
+        right = bisect_left(self.minutes, minute, lo, hi)
+        left = right - 1
+        picked = []
+        while len(picked) < k and (left >= lo or right < hi):
+            if right >= hi or (
+                left >= lo
+                and minute - self.minutes[left] <= self.minutes[right] - minute
+            ):
+                picked.append(self.minutes[left])
+                left -= 1
+            else:
+                picked.append(self.minutes[right])
+                right += 1
+        return sorted(picked)
+
+    def step(self) -> int | None:
+        """The slot interval: the smallest gap between consecutive slots."""
+        gaps = [b - a for a, b in zip(self.minutes, self.minutes[1:])]
+        return min(gaps) if gaps else None
+
+    def runs(self, period: str | None = None) -> list[tuple[int, int]]:
+        """Back-to-back slots collapsed into (first, last) start minutes, e.g. 10:00-12:30 every 30."""
+        lo, hi = self._bounds(period)
+        step = self.step()
+        runs: list[tuple[int, int]] = []
+        for minute in self.minutes[lo:hi]:
+            if runs and minute - runs[-1][1] == step:
+                runs[-1] = (runs[-1][0], minute)
+            else:
+                runs.append((minute, minute))
+        return runs
+
+    def query(
+        self, requested: int | None = None, period: str | None = None, k: int = 3
+    ) -> SlotQuery:
+        """
+        Exact hit / nearest before / nearest after / top-k for a requested local minute,
+        optionally within a day part. Without a requested time, the first `k` slots.
+        """
+        lo, hi = self._bounds(period)
+        last = self.minutes[hi - 1] if hi > lo else None
+        if requested is None:
+            return SlotQuery(
+                None,
+                False,
+                None,
+                None,
+                list(self.minutes[lo : min(hi, lo + k)]),
+                hi - lo,
+                last,
+            )
+        exact = lo <= bisect_left(self.minutes, requested) < hi and self.contains(
+            requested
+        )
+        return SlotQuery(
+            requested,
+            exact,
+            self.before(requested, period),
+            self.after(requested, period),
+            self.nearest(requested, k, period),
+            hi - lo,
+            last,
+        )
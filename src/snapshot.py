@@ -0,0 +1,75 @@
+import contextlib
+import json
+import logging
+import os
+import tempfile
+import time
+
+logger = logging.getLogger("snapshot")
+
+# Bump when the on-disk layout changes; older snapshots are ignored
+SNAPSHOT_VERSION = 1
+
+SNAPSHOT_PATH = os.getenv(
+    "AGENT_SNAPSHOT_PATH",
+    os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        ".agent_snapshot.json",
+    ),
+)
+
+
+def load_snapshot(path: str = SNAPSHOT_PATH) -> dict | None:
+    """
+    Reads the last saved catalogue / tenant config snapshot.
+    Returns None if there is no usable snapshot (missing, corrupt or an older format).
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            snapshot = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable snapshot {path}: {e}")
+        return None
+
+    if not isinstance(snapshot, dict) or snapshot.get("v") != SNAPSHOT_VERSION:
+        logger.info(f"Ignoring snapshot {path} with unsupported version")
+        return None
+    snapshot.setdefault("event_types", None)
+    snapshot.setdefault("agent_configs", {})
+    return snapshot
+
+
+def save_snapshot(
+    event_types: dict | None = None,
+    agent_configs: dict | None = None,
+    path: str = SNAPSHOT_PATH,
+):
+    """
+    Merges the given sections into the snapshot and atomically replaces the file.
+    Other worker processes may write the same file, so agent configs are merged, not overwritten.
+    """
+    snapshot = load_snapshot(path) or {
+        "v": SNAPSHOT_VERSION,
+        "event_types": None,
+        "agent_configs": {},
+    }
+    if event_types is not None:
+        snapshot["event_types"] = event_types
+    if agent_configs:
+        snapshot["agent_configs"].update(agent_configs)
+    snapshot["saved_at"] = time.time()
+
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(prefix=".snapshot-", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.unlink(tmp_path)
+        raise
@@ -0,0 +1,163 @@
+import functools
+import logging
+import math
+import re
+
+from slot_store import DaySlots, format_minute
+
+logger = logging.getLogger("tool_results")
+
+# Rough size of one LLM token in English text; good enough to budget and compare results
+CHARS_PER_TOKEN = 4
+
+DEFAULT_TOKEN_BUDGET = 60
+
+_HANDLE = re.compile(r"^#?b?(\d+)$")
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def trim_to_budget(text: str, budget: int) -> str:
+    """Cuts `text` down to about `budget` tokens, at the last clause boundary that fits."""
+    if estimate_tokens(text) <= budget:
+        return text
+    limit = budget * CHARS_PER_TOKEN - 2
+    cut = text[:limit]
+    for separator in ("; ", ". ", ", "):
+        i = cut.rfind(separator)
+        if i > limit // 2:
+            cut = cut[:i]
+            break
+    return cut.rstrip(" ,;.") + " …"
+
+
+def page_of(
+    entries: list[str], budget: int, page: int = 1, separator: str = "; "
+) -> tuple[list[str], int]:
+    """
+    Splits `entries` into pages of whole entries joined within about `budget` tokens
+    (at least one per page) and returns page `page` (1-based) and how many come after it.
+    """
+    start = 0
+    for _ in range(max(page, 1)):
+        end, size = start, 0
+        while end < len(entries):
+            size += len(entries[end]) + (len(separator) if end > start else 0)
+            if end > start and size > budget * CHARS_PER_TOKEN:
+                break
+            end += 1
+        if end == start:
+            break
+        shown, start = entries[start:end], end
+    else:
+        return shown, len(entries) - start
+    return [], 0
+
+
+def summarize_slots(
+    day_slots: DaySlots, period: str | None = None, max_runs: int = 3
+) -> str:
+    """
+    A day's slots as ranges: '10:00 AM to 12:30 PM and 05:00 PM, every 30 min'.
+    Beyond `max_runs` ranges the rest is folded into a count and the last time.
+    """
+    runs = day_slots.runs(period)
+    spoken = [
+        format_minute(a) if a == b else f"{format_minute(a)} to {format_minute(b)}"
+        for a, b in runs[:max_runs]
+    ]
+    text = (
+        spoken[0] if len(spoken) == 1 else ", ".join(spoken[:-1]) + " and " + spoken[-1]
+    )
+    if len(runs) > max_runs:
+        text = (
+            ", ".join(spoken)
+            + f", plus {len(runs) - max_runs} more openings until {format_minute(runs[-1][1])}"
+        )
+    if any(a != b for a, b in runs):
+        text += f", every {day_slots.step()} min"
+    return text
+
+
+class BookingHandles:
+    """
+    Short per-call names ('b1', 'b2', ...) for booking UIDs, so tool results and the
+    arguments the LLM sends back carry a few characters instead of a 36-character UID.
+    """
+
+    def __init__(self):
+        self._handles: dict[str, str] = {}
+        self._uids: dict[str, str] = {}
+
+    def handle(self, uid: str) -> str:
+        handle = self._handles.get(uid)
+        if handle is None:
+            handle = self._handles[uid] = f"b{len(self._handles) + 1}"
+            self._uids[handle] = uid
+        return handle
+
+    def resolve(self, ref: str) -> str:
+        """UID for a handle ('b2', 'B2', '2'); anything else is taken to be a UID already."""
+        m = _HANDLE.match((ref or "").strip().lower())
+        return self._uids.get(f"b{m[1]}", ref) if m else ref
+
+
+class ToolResults:
+    """
+    Keeps tool results small, since every one stays in the chat context and is re-sent
+    to the LLM on each later turn. `compact` trims a tool's result to its token budget
+    and records how big results were before and after, per tool.
+    """
+
+    def __init__(
+        self,
+        budgets: dict[str, int] | None = None,
+        default_budget: int = DEFAULT_TOKEN_BUDGET,
+    ):
+        self.budgets = budgets or {}
+        self.default_budget = default_budget
+        self._calls: dict[str, int] = {}
+        self._raw: dict[str, int] = {}
+        self._sent: dict[str, int] = {}
+        self._max: dict[str, int] = {}
+        self._trimmed: dict[str, int] = {}
+
+    def render(self, tool: str, text: str) -> str:
+        raw = estimate_tokens(text)
+        text = trim_to_budget(text, self.budgets.get(tool, self.default_budget))
+        sent = estimate_tokens(text)
+        self._calls[tool] = self._calls.get(tool, 0) + 1
+        self._raw[tool] = self._raw.get(tool, 0) + raw
+        self._sent[tool] = self._sent.get(tool, 0) + sent
+        self._max[tool] = max(self._max.get(tool, 0), sent)
+        if sent < raw:
+            self._trimmed[tool] = self._trimmed.get(tool, 0) + 1
+            logger.info(f"Trimmed {tool} result from ~{raw} to ~{sent} tokens")
+        return text
+
+    def compact(self, fn):
+        """Decorator: passes a tool's string result through `render` under the tool's name."""
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            result = await fn(*args, **kwargs)
+            return (
+                self.render(fn.__name__, result) if isinstance(result, str) else result
+            )
+
+        return wrapper
+
+    def stats(self) -> dict:
+        return {
+            tool: {
+                "calls": calls,
+                "avg_tokens": round(self._sent[tool] / calls, 1),
+                "max_tokens": self._max[tool],
+                "raw_tokens": self._raw[tool],
+                "sent_tokens": self._sent[tool],
+                "trimmed": self._trimmed.get(tool, 0),
+            }
+            for tool, calls in self._calls.items()
+        }
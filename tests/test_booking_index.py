@@ -0,0 +1,96 @@
+import httpx
+import pytest
+
+import booking_index
+from booking_index import BookingIndex
+from cal_client import CalClient
+
+
+def _booking(
+    uid: str, phone: str, start: str = "2999-01-01T05:00:00.000Z", **extra
+) -> dict:
+    return {
+        "uid": uid,
+        "start": start,
+        "title": "Haircut",
+        "attendees": [{"phoneNumber": phone}],
+        "updatedAt": "2025-01-01T00:00:00.000Z",
+        **extra,
+    }
+
+
+def _phone_of(booking: dict) -> str | None:
+    phone = booking["attendees"][0]["phoneNumber"] if booking.get("attendees") else None
+    digits = "".join(filter(str.isdigit, phone or ""))
+    return f"+91{digits[-10:]}" if digits else None
+
+
+@pytest.fixture
+def calendar(monkeypatch):
+    """Fake /v2/bookings that pages its rows and honours afterUpdatedAt."""
+    state = {"rows": [], "requests": []}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        params = request.url.params
+        state["requests"].append(dict(params))
+        rows = state["rows"]
+        if "afterUpdatedAt" in params:
+            rows = [r for r in rows if r["updatedAt"] > params["afterUpdatedAt"]]
+        skip, take = int(params["skip"]), int(params["take"])
+        page = rows[skip : skip + take]
+        return httpx.Response(
+            200,
+            json={"data": page, "pagination": {"hasNextPage": skip + take < len(rows)}},
+        )
+
+    client = CalClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(booking_index, "get_cal_client", lambda: client)
+    return state
+
+
+@pytest.mark.asyncio
+async def test_full_build_pages_and_indexes_by_phone(calendar) -> None:
+    """The initial build walks every page and normalizes phones at ingestion."""
+    calendar["rows"] = [_booking(f"b{i}", f"98765432{i:02d}") for i in range(5)]
+    calendar["rows"].append(
+        _booking("b9", "+91 98765 43200", start="2999-01-02T05:00:00.000Z")
+    )
+    index = BookingIndex("https://cal.test/v2", "key", _phone_of, page_size=2)
+
+    found = await index.find("+919876543200")
+
+    assert [b["uid"] for b in found] == ["b0", "b9"]
+    assert found[0] == {
+        "uid": "b0",
+        "start": "2999-01-01T05:00:00.000Z",
+        "title": "Haircut",
+        "eventTypeId": None,
+    }
+    assert index.stats()["pages_fetched"] == 3
+    assert index.stats()["full_builds"] == 1
+
+
+@pytest.mark.asyncio
+async def test_incremental_refresh_applies_updates_and_cancellations(calendar) -> None:
+    """Refreshes only ask for rows updated since the cursor and drop cancelled bookings."""
+    calendar["rows"] = [_booking("b1", "9876543210"), _booking("b2", "9876543210")]
+    index = BookingIndex("https://cal.test/v2", "key", _phone_of, refresh_interval=0)
+    assert len(await index.find("+919876543210")) == 2
+
+    calendar["rows"] = [
+        _booking(
+            "b1", "9876543210", status="cancelled", updatedAt="2999-01-01T00:00:00.000Z"
+        ),
+        _booking("b3", "1111111111", updatedAt="2999-01-01T00:00:00.000Z"),
+    ]
+    assert [b["uid"] for b in await index.find("+919876543210")] == ["b2"]
+    assert [b["uid"] for b in index.lookup("+911111111111")] == ["b3"]
+    assert "afterUpdatedAt" in calendar["requests"][-1]
+    assert index.stats()["incremental_refreshes"] == 1
+
+
+def test_lookup_skips_past_bookings() -> None:
+    index = BookingIndex("https://cal.test/v2", "key", _phone_of)
+    index.upsert(_booking("old", "9876543210", start="2000-01-01T05:00:00.000Z"))
+    index.upsert(_booking("new", "9876543210"))
+    assert [b["uid"] for b in index.lookup("+919876543210")] == ["new"]
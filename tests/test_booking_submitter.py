@@ -0,0 +1,214 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+import booking_submitter
+import cal_client
+from booking_submitter import BookingSubmitter, idempotency_key
+from cal_client import CalClient
+from resilience import CalUnavailableError
+
+START = "2999-01-01T05:00:00.000Z"
+PHONE = "+919876543210"
+
+
+def _payload() -> dict:
+    return {
+        "start": START,
+        "eventTypeSlug": "haircut",
+        "attendee": {"phoneNumber": PHONE},
+        "metadata": {},
+    }
+
+
+def _phone_of(booking: dict) -> str | None:
+    return booking.get("attendees", [{}])[0].get("phoneNumber")
+
+
+@pytest.fixture
+def calendar(monkeypatch):
+    """Fake /v2/bookings whose POST behaviour is scripted per attempt."""
+    state = {"script": [], "created": [], "posts": 0, "lookups": 0}
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if request.method == "GET":
+            state["lookups"] += 1
+            return httpx.Response(200, json={"data": state["created"]})
+        state["posts"] += 1
+        step = state["script"].pop(0) if state["script"] else "ok"
+        booking = {
+            "uid": f"b{state['posts']}",
+            "start": START,
+            "status": "accepted",
+            "attendees": [{"phoneNumber": PHONE}],
+            "metadata": json.loads(request.content)["metadata"],
+        }
+        if step == "lost":
+            # Cal.com stores the booking but the answer never arrives
+            state["created"].append(booking)
+            await asyncio.sleep(1.0)
+        if step == "503":
+            return httpx.Response(503, text="unavailable")
+        if step == "taken":
+            return httpx.Response(400, text="slot taken")
+        state["created"].append(booking)
+        return httpx.Response(201, json={"data": booking})
+
+    monkeypatch.setattr(cal_client, "BREAKERS", {})
+    client = CalClient(transport=httpx.MockTransport(handler), hedging=None)
+    monkeypatch.setattr(booking_submitter, "get_cal_client", lambda: client)
+    return state
+
+
+def _submitter(**kwargs) -> BookingSubmitter:
+    return BookingSubmitter(
+        "https://cal.test/v2", "key", _phone_of, base_delay=0.01, **kwargs
+    )
+
+
+def test_idempotency_key_is_deterministic() -> None:
+    key = idempotency_key("room-1", "haircut", START, PHONE)
+    assert key == idempotency_key("room-1", "haircut", START, PHONE)
+    assert key != idempotency_key("room-2", "haircut", START, PHONE)
+
+
+@pytest.mark.asyncio
+async def test_retries_transient_failure_and_replays_key(calendar) -> None:
+    """A 503 is retried; submitting the same key again returns the same booking without a POST."""
+    calendar["script"] = ["503"]
+    submitter = _submitter()
+
+    first = await submitter.submit(_payload(), "k1")
+    again = await submitter.submit(_payload(), "k1")
+
+    assert first.ok and first.attempts == 2
+    assert first.booking["metadata"]["idempotencyKey"] == "k1"
+    assert again.replayed and again.booking["uid"] == first.booking["uid"]
+    assert calendar["posts"] == 2
+    assert submitter.stats()["duplicates_suppressed"] == 1
+
+
+@pytest.mark.asyncio
+async def test_lost_response_is_found_by_lookup_not_resent(calendar) -> None:
+    """After a timed-out POST that actually landed, the booking is looked up instead of created twice."""
+    calendar["script"] = ["lost"]
+    submitter = _submitter(attempt_timeout=0.05, total_timeout=2.0)
+
+    result = await submitter.submit(_payload(), "k2")
+
+    assert result.ok and result.recovered
+    assert calendar["posts"] == 1
+    assert len(calendar["created"]) == 1
+
+
+@pytest.mark.asyncio
+async def test_definitive_rejection_is_not_retried(calendar) -> None:
+    calendar["script"] = ["taken"]
+    result = await _submitter().submit(_payload(), "k3")
+    assert not result.ok and result.status_code == 400
+    assert calendar["posts"] == 1
+
+
+@pytest.mark.asyncio
+async def test_gives_up_within_budget(calendar) -> None:
+    calendar["script"] = ["503"] * 5
+    with pytest.raises(CalUnavailableError):
+        await _submitter(max_attempts=3).submit(_payload(), "k4")
+    assert calendar["posts"] == 3
+
+
+@pytest.fixture
+def reschedule_api(monkeypatch):
+    """Fake reschedule/create/cancel endpoints with switchable native support and cancel failures."""
+    state = {"native": True, "cancel_fails": set(), "calls": []}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        state["calls"].append(path)
+        if path.endswith("/reschedule"):
+            if not state["native"]:
+                return httpx.Response(404, text="not found")
+            return httpx.Response(201, json={"data": {"uid": "moved", "start": START}})
+        if path.endswith("/cancel"):
+            uid = path.split("/")[-2]
+            return httpx.Response(500 if uid in state["cancel_fails"] else 200, json={})
+        return httpx.Response(201, json={"data": {"uid": "new", "start": START}})
+
+    monkeypatch.setattr(cal_client, "BREAKERS", {})
+    client = CalClient(transport=httpx.MockTransport(handler), hedging=None)
+    monkeypatch.setattr(booking_submitter, "get_cal_client", lambda: client)
+    return state
+
+
+@pytest.mark.asyncio
+async def test_native_reschedule_is_one_round_trip(reschedule_api) -> None:
+    result = await _submitter().reschedule(
+        "old", _payload(), "r1", current_slug="haircut"
+    )
+    assert result.ok and result.booking["uid"] == "moved"
+    assert reschedule_api["calls"] == ["/v2/bookings/old/reschedule"]
+
+
+@pytest.mark.asyncio
+async def test_changing_the_service_creates_a_new_booking(reschedule_api) -> None:
+    """Native reschedule would keep the old event type, so a new service goes create-then-cancel."""
+    submitter = _submitter()
+    result = await submitter.reschedule(
+        "old", {**_payload(), "eventTypeSlug": "spa"}, "r4", current_slug="haircut"
+    )
+    assert result.ok and result.booking["uid"] == "new"
+    assert reschedule_api["calls"] == ["/v2/bookings", "/v2/bookings/old/cancel"]
+    assert submitter.stats()["fallback_reschedules"] == 1
+
+
+@pytest.mark.asyncio
+async def test_fallback_creates_before_cancelling(reschedule_api) -> None:
+    reschedule_api["native"] = False
+    result = await _submitter().reschedule(
+        "old", _payload(), "r2", current_slug="haircut"
+    )
+    assert result.ok and result.booking["uid"] == "new"
+    assert reschedule_api["calls"][1:] == ["/v2/bookings", "/v2/bookings/old/cancel"]
+
+
+@pytest.mark.asyncio
+async def test_fallback_rolls_back_new_booking_if_old_cannot_be_released(
+    reschedule_api,
+) -> None:
+    """The caller keeps the original slot rather than ending up with two (or zero) bookings."""
+    reschedule_api["native"] = False
+    reschedule_api["cancel_fails"] = {"old"}
+    submitter = _submitter()
+
+    result = await submitter.reschedule("old", _payload(), "r3", current_slug="haircut")
+
+    assert not result.ok
+    assert reschedule_api["calls"][-1] == "/v2/bookings/new/cancel"
+    assert submitter.stats()["compensations"] == 1
+
+
+@pytest.mark.asyncio
+async def test_cancel_many_is_concurrent_but_bounded(monkeypatch) -> None:
+    """Bulk cancel runs in parallel up to the limit and reports successes and failures together."""
+    state = {"active": 0, "peak": 0}
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        state["active"] += 1
+        state["peak"] = max(state["peak"], state["active"])
+        await asyncio.sleep(0.02)
+        state["active"] -= 1
+        uid = request.url.path.split("/")[-2]
+        return httpx.Response(400 if uid == "b3" else 200, json={})
+
+    monkeypatch.setattr(cal_client, "BREAKERS", {})
+    client = CalClient(transport=httpx.MockTransport(handler), hedging=None)
+    monkeypatch.setattr(booking_submitter, "get_cal_client", lambda: client)
+
+    uids = [f"b{i}" for i in range(6)]
+    succeeded, failed = await _submitter().cancel_many(uids, concurrency=3)
+
+    assert succeeded == ["b0", "b1", "b2", "b4", "b5"]
+    assert failed == ["b3"]
+    assert state["peak"] == 3
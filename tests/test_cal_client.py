@@ -0,0 +1,90 @@
+import asyncio
+
+import httpx
+import pytest
+
+import cal_client
+from cal_client import ENDPOINT_TIMEOUTS, CalClient, HedgePolicy, get_cal_client
+
+
+@pytest.mark.asyncio
+async def test_shared_client_is_reused() -> None:
+    """Every caller on the same loop gets the same pooled client."""
+    first = get_cal_client()
+    assert get_cal_client() is first
+    assert cal_client.pool_stats()["connections_opened"] == 0
+    await cal_client.aclose_cal_client()
+    assert get_cal_client() is not first
+    await cal_client.aclose_cal_client()
+
+
+@pytest.mark.asyncio
+async def test_replaced_clients_are_closed() -> None:
+    """Swapping the transport closes the old client's pool instead of leaking it."""
+    first = get_cal_client()
+    cal_client.use_transport(httpx.MockTransport(lambda request: httpx.Response(200)))
+    try:
+        second = get_cal_client()
+        assert second is not first
+        await asyncio.gather(*cal_client._closing)
+        assert first.is_closed and not second.is_closed
+    finally:
+        await cal_client.aclose_cal_client()
+        cal_client.use_transport(None)
+
+
+@pytest.mark.asyncio
+async def test_records_per_endpoint_stats_and_timeouts() -> None:
+    """Requests are tagged by endpoint and get that endpoint's timeout."""
+    seen = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request.extensions["timeout"])
+        if request.url.path == "/v1/slots":
+            return httpx.Response(200, json={"slots": {}})
+        raise httpx.ConnectError("boom", request=request)
+
+    client = CalClient(transport=httpx.MockTransport(handler))
+    res = await client.get("https://cal.test/v1/slots", endpoint="slots")
+    assert res.status_code == 200
+    with pytest.raises(httpx.ConnectError):
+        await client.post("https://cal.test/v2/bookings", endpoint="booking-write")
+
+    assert seen[0]["read"] == ENDPOINT_TIMEOUTS["slots"].read
+    assert seen[1]["read"] == ENDPOINT_TIMEOUTS["booking-write"].read
+
+    stats = client.stats()
+    assert stats["in_flight"] == 0
+    assert stats["endpoints"]["slots"]["requests"] == 1
+    assert stats["endpoints"]["slots"]["errors"] == 0
+    assert stats["endpoints"]["booking-write"]["errors"] == 1
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_slow_read_is_hedged_within_rate_cap(monkeypatch) -> None:
+    """A read slower than the hedge delay gets a second attempt; the cap stops further hedges."""
+    monkeypatch.setattr(cal_client, "BREAKERS", {})
+    calls = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.path)
+        if len(calls) == 1:
+            await asyncio.sleep(0.5)
+            return httpx.Response(200, json={"who": "primary"})
+        return httpx.Response(200, json={"who": "hedge"})
+
+    policy = HedgePolicy(default_delay=0.02, max_rate=0.0, burst=1.0)
+    client = CalClient(transport=httpx.MockTransport(handler), hedging=policy)
+
+    res = await client.get("https://cal.test/v1/slots", endpoint="slots")
+    assert res.json() == {"who": "hedge"}
+    # Writes are never hedged, and the exhausted cap blocks another read hedge
+    await client.post("https://cal.test/v2/bookings", endpoint="booking-write")
+    await client.get("https://cal.test/v1/slots", endpoint="slots")
+
+    slots = client.stats()["endpoints"]["slots"]
+    assert slots["hedges_issued"] == 1
+    assert slots["hedges_won"] == 1
+    assert len(calls) == 4
+    await client.aclose()
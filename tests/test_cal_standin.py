@@ -0,0 +1,110 @@
+from datetime import datetime, timezone
+
+import httpx
+import pytest
+
+from cal_standin import Faults, StandinCalendar, serve
+
+NOW = datetime(2030, 1, 7, 3, 0, tzinfo=timezone.utc)  # Monday 08:30 in Kolkata
+
+
+def _calendar(**kwargs) -> StandinCalendar:
+    return StandinCalendar(seed=1, clock=lambda: NOW, **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_booking_removes_slot_and_cancel_restores_it() -> None:
+    """Creating a booking takes its slot out of /v1/slots; cancelling puts it back."""
+    calendar = _calendar()
+    async with httpx.AsyncClient(
+        transport=calendar.transport(), base_url="http://cal"
+    ) as client:
+        params = {
+            "eventTypeId": 101,
+            "startTime": "2030-01-07T00:00:00.000Z",
+            "endTime": "2030-01-07T23:59:59.999Z",
+        }
+        slots = (await client.get("/v1/slots", params=params)).json()["slots"][
+            "2030-01-07"
+        ]
+        first = slots[0]["time"]
+        assert first == "2030-01-07T04:30:00.000Z"  # 10:00 local
+
+        body = {
+            "start": first,
+            "eventTypeSlug": "haircut",
+            "attendee": {"phoneNumber": "+919876543210"},
+        }
+        created = await client.post("/v2/bookings", json=body)
+        assert created.status_code == 201
+        taken = await client.post("/v2/bookings", json=body)
+        assert taken.status_code == 400
+
+        slots = (await client.get("/v1/slots", params=params)).json()["slots"][
+            "2030-01-07"
+        ]
+        assert slots[0]["time"] != first
+
+        uid = created.json()["data"]["uid"]
+        assert (
+            await client.post(f"/v2/bookings/{uid}/cancel", json={})
+        ).status_code == 200
+        listed = (
+            await client.get("/v2/bookings", params={"status": "upcoming"})
+        ).json()
+        assert listed["data"] == []
+
+
+@pytest.mark.asyncio
+async def test_idempotency_key_and_reschedule() -> None:
+    calendar = _calendar()
+    async with httpx.AsyncClient(
+        transport=calendar.transport(), base_url="http://cal"
+    ) as client:
+        body = {"start": "2030-01-07T05:00:00.000Z", "eventTypeId": 101, "attendee": {}}
+        headers = {"Idempotency-Key": "k1"}
+        a = (await client.post("/v2/bookings", json=body, headers=headers)).json()[
+            "data"
+        ]
+        b = (await client.post("/v2/bookings", json=body, headers=headers)).json()[
+            "data"
+        ]
+        assert a["uid"] == b["uid"]
+
+        moved = await client.post(
+            f"/v2/bookings/{a['uid']}/reschedule",
+            json={"start": "2030-01-07T06:00:00.000Z"},
+        )
+        assert moved.status_code == 201
+        assert calendar.bookings[a["uid"]]["status"] == "cancelled"
+
+
+@pytest.mark.asyncio
+async def test_fault_injection() -> None:
+    calendar = _calendar(route_faults={"slots": Faults(error_rate=1.0)}, rate_limit=2)
+    async with httpx.AsyncClient(
+        transport=calendar.transport(), base_url="http://cal"
+    ) as client:
+        assert (await client.get("/v1/slots")).status_code == 503
+        assert (await client.get("/v1/event-types")).status_code == 200
+        assert (await client.get("/v1/event-types")).status_code == 429
+    assert calendar.stats()["injected_errors"] == 1
+    assert calendar.stats()["rate_limited"] == 1
+
+
+@pytest.mark.asyncio
+async def test_serves_over_http() -> None:
+    calendar = _calendar()
+    runner = await serve(calendar, port=0)
+    try:
+        host, port = runner.addresses[0][:2]
+        async with httpx.AsyncClient() as client:
+            res = await client.get(f"http://{host}:{port}/v1/event-types")
+            etag = res.headers["etag"]
+            assert len(res.json()["event_types"]) == len(calendar.event_types)
+            again = await client.get(
+                f"http://{host}:{port}/v1/event-types", headers={"If-None-Match": etag}
+            )
+            assert again.status_code == 304
+    finally:
+        await runner.cleanup()
@@ -0,0 +1,79 @@
+from datetime import date, datetime, time
+
+import pytest
+
+import agent
+from date_resolver import get_tz, resolve, resolve_date, resolve_time
+from microbench import frozen_clock
+
+MONDAY = date(2030, 1, 7)
+
+
+@pytest.mark.parametrize(
+    ("phrase", "expected"),
+    [
+        ("today", date(2030, 1, 7)),
+        ("Tomorrow", date(2030, 1, 8)),
+        ("day after tomorrow", date(2030, 1, 9)),
+        ("kal", date(2030, 1, 8)),
+        ("parso", date(2030, 1, 9)),
+        ("this evening", date(2030, 1, 7)),
+        ("friday", date(2030, 1, 11)),
+        ("this monday", date(2030, 1, 7)),
+        ("next Monday", date(2030, 1, 14)),
+        ("agle shukravar", date(2030, 1, 11)),
+        ("in 3 days", date(2030, 1, 10)),
+        ("March 5", date(2030, 3, 5)),
+        ("5th of march", date(2030, 3, 5)),
+        ("mar 3rd", date(2030, 3, 3)),
+        ("23rd", date(2030, 1, 23)),
+        ("5", date(2030, 2, 5)),  # already past this month
+        ("2030-03-05", date(2030, 3, 5)),
+        ("05-03-2030", date(2030, 3, 5)),
+        ("5 January", date(2031, 1, 5)),
+    ],
+)
+def test_resolve_date(phrase: str, expected: date) -> None:
+    assert resolve_date(phrase, MONDAY) == expected
+
+
+def test_month_names_are_not_mangled() -> None:
+    """The old parser stripped 'rd'/'st'/'th' out of words, so 'March' became 'Mac'."""
+    assert resolve_date("March 23rd", MONDAY) == date(2030, 3, 23)
+    assert resolve_date("23rd August", MONDAY) == date(2030, 8, 23)
+
+
+@pytest.mark.parametrize(
+    ("phrase", "expected"),
+    [
+        ("3 PM", time(15, 0)),
+        ("15:30", time(15, 30)),
+        ("10:30 a.m.", time(10, 30)),
+        ("4.30 pm", time(16, 30)),
+        ("5 in the evening", time(17, 0)),
+        ("shaam 6 baje", time(18, 0)),
+        ("noon", time(12, 0)),
+        ("3:30", time(15, 30)),
+        ("9", time(9, 0)),
+        ("evening", None),
+    ],
+)
+def test_resolve_time(phrase: str, expected: time | None) -> None:
+    assert resolve_time(phrase) == expected
+
+
+def test_unknown_parts_raise_with_the_part_named() -> None:
+    now = datetime(2030, 1, 7, 8, 30, tzinfo=get_tz())
+    with pytest.raises(ValueError, match="date"):
+        resolve("someday", "3 PM", now)
+    with pytest.raises(ValueError, match="time"):
+        resolve("tomorrow", "whenever", now)
+
+
+def test_parse_datetime_returns_utc() -> None:
+    with frozen_clock():
+        assert agent.parse_datetime("March 5", "4:30 PM") == "2030-03-05T11:00:00.000Z"
+        assert (
+            agent.parse_datetime("day after tomorrow", "10 am")
+            == "2030-01-09T04:30:00.000Z"
+        )
@@ -0,0 +1,99 @@
+import asyncio
+from datetime import timedelta
+
+import httpx
+import pytest
+
+import agent
+import snapshot
+from cal_client import CalClient
+
+
+@pytest.fixture
+def catalogue(monkeypatch, tmp_path):
+    """Fresh EVENT_TYPES_CACHE backed by a fake /v1/event-types."""
+    state = {
+        "requests": [],
+        "body": {
+            "event_types": [
+                {"id": 1, "title": "Haircut", "slug": "haircut", "length": 30}
+            ]
+        },
+    }
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        state["requests"].append(request)
+        if request.headers.get("if-none-match") == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, json=state["body"], headers=state.get("headers", {}))
+
+    client = CalClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(agent, "get_cal_client", lambda: client)
+    cache = dict(
+        agent.EVENT_TYPES_CACHE,
+        data=[],
+        last_updated=None,
+        version=0,
+        etag=None,
+        last_modified=None,
+        content_hash=None,
+        last_forced=None,
+        refresh_task=None,
+    )
+    monkeypatch.setattr(agent, "EVENT_TYPES_CACHE", cache)
+    # Keep refreshes from overwriting the real cold-start snapshot
+    path = str(tmp_path / "snapshot.json")
+    monkeypatch.setattr(
+        agent,
+        "save_snapshot",
+        lambda **sections: snapshot.save_snapshot(path=path, **sections),
+    )
+    return state
+
+
+def _expire(cache) -> None:
+    cache["last_updated"] -= timedelta(seconds=cache["ttl_seconds"] + 1)
+
+
+@pytest.mark.asyncio
+async def test_stale_catalogue_is_served_while_revalidating(catalogue) -> None:
+    """Only the first load waits on the network; stale reads return immediately."""
+    first = await agent.fetch_event_types()
+    assert [s["title"] for s in first] == ["Haircut"]
+    assert agent.EVENT_TYPES_CACHE["version"] == 1
+
+    _expire(agent.EVENT_TYPES_CACHE)
+    catalogue["body"] = {
+        "event_types": [{"id": 2, "title": "Spa", "slug": "spa", "length": 60}]
+    }
+    stale = await agent.fetch_event_types()
+    assert [s["title"] for s in stale] == ["Haircut"]
+
+    await agent.EVENT_TYPES_CACHE["refresh_task"]
+    assert [s["title"] for s in agent.get_all_services()] == ["Spa"]
+    assert agent.EVENT_TYPES_CACHE["version"] == 2
+
+
+@pytest.mark.asyncio
+async def test_unchanged_catalogue_is_not_reparsed(catalogue) -> None:
+    """Same body hash or a 304 keeps the current catalogue and version."""
+    await agent.fetch_event_types()
+    _expire(agent.EVENT_TYPES_CACHE)
+    await agent._refresh_event_types()
+    assert agent.EVENT_TYPES_CACHE["version"] == 1
+
+    agent.EVENT_TYPES_CACHE["etag"] = '"v1"'
+    await agent._refresh_event_types()
+    assert catalogue["requests"][-1].headers["if-none-match"] == '"v1"'
+    assert agent.EVENT_TYPES_CACHE["version"] == 1
+
+
+@pytest.mark.asyncio
+async def test_force_refresh_is_rate_limited(catalogue) -> None:
+    await agent.fetch_event_types()
+    await agent.fetch_event_types(force_refresh=True)
+    await agent.fetch_event_types(force_refresh=True)
+    await asyncio.sleep(0)
+    if agent.EVENT_TYPES_CACHE["refresh_task"]:
+        await agent.EVENT_TYPES_CACHE["refresh_task"]
+    assert len(catalogue["requests"]) == 2
@@ -0,0 +1,198 @@
+import pickle
+from datetime import datetime, timezone
+
+import pytest
+
+import agent
+from fsm import (
+    FSM,
+    MANAGE_INTENTS,
+    TRANSITIONS,
+    BookingRef,
+    State,
+    Transition,
+    _intent_in,
+    validate,
+)
+
+
+def test_details_given_upfront_walk_through_each_step() -> None:
+    fsm = FSM()
+    fsm.update_state(
+        intent="book", data={"service": "Haircut", "date": "tomorrow", "time": "3 PM"}
+    )
+    assert fsm.state == State.BOOKING_ASK_PHONE
+    assert (fsm.ctx.service, fsm.ctx.date, fsm.ctx.time) == (
+        "Haircut",
+        "tomorrow",
+        "3 PM",
+    )
+
+    # A phone number always goes through verification
+    fsm.update_state(data={"phone": "+919876543210"})
+    assert fsm.state == State.OTP_VERIFY
+    assert not fsm.dispatch("confirm")
+    assert fsm.dispatch("otp_success") and fsm.dispatch("confirm")
+    assert fsm.state == State.START
+
+
+@pytest.mark.parametrize(
+    ("intent", "bookings", "state"),
+    [
+        ("cancel", [{"uid": "u1"}], State.CANCEL_CONFIRM),
+        ("reschedule", [{"uid": "u1"}], State.RESCHEDULE_ASK_SERVICE),
+        ("cancel", [{"uid": "u1"}, {"uid": "u2"}], State.MANAGE_SELECT_BOOKING),
+        ("cancel_all", [{"uid": "u1"}, {"uid": "u2"}], State.CANCEL_CONFIRM),
+        ("cancel_all", [], State.MANAGE_ASK_PHONE),
+        ("cancel", [], State.MANAGE_ASK_PHONE),
+    ],
+)
+def test_found_bookings_route_by_intent(intent, bookings, state) -> None:
+    fsm = FSM()
+    fsm.update_state(intent=intent)
+    fsm.update_state(data={"phone": "+919876543210", "bookings": bookings})
+    assert fsm.state == state
+    assert fsm.ctx.phone == "+919876543210"
+    assert [ref.uid for ref in fsm.ctx.bookings_list] == [b["uid"] for b in bookings]
+    if len(bookings) == 1 and intent != "cancel_all":
+        assert fsm.ctx.booking_uid == "u1"
+
+
+def test_otp_sent_reaches_verification_from_any_state() -> None:
+    fsm = FSM()
+    fsm.update_state(intent="book")
+    assert fsm.dispatch("otp_sent")
+    assert fsm.state == State.OTP_VERIFY
+
+
+def test_broken_tables_fail_validation() -> None:
+    validate(TRANSITIONS)
+
+    no_way_back = {
+        key: value
+        for key, value in TRANSITIONS.items()
+        if key[0] != State.CANCEL_CONFIRM
+    }
+    with pytest.raises(ValueError, match="dead: CANCEL_CONFIRM"):
+        validate(no_way_back)
+
+    no_way_in = {
+        **TRANSITIONS,
+        (State.MANAGE_SELECT_BOOKING, "booking_uid"): [Transition(State.START)],
+    }
+    with pytest.raises(ValueError, match="unreachable: RESCHEDULE_ASK_SERVICE"):
+        validate(
+            {key: value for key, value in no_way_in.items() if key[1] != "bookings"}
+        )
+
+
+def test_every_routed_intent_can_be_dispatched() -> None:
+    # intent_manage sends each manage intent, and the table routes on nothing else
+    assert set(agent.MANAGE_ACTIONS.values()) == set(MANAGE_INTENTS)
+
+    never_set = {
+        **TRANSITIONS,
+        (State.CANCEL_CONFIRM, "confirm"): [
+            Transition(State.START, _intent_in("refund"))
+        ],
+    }
+    with pytest.raises(ValueError, match="intent never set: refund"):
+        validate(never_set)
+
+
+@pytest.mark.parametrize(
+    ("first", "then", "state"),
+    [
+        (
+            "cancel",
+            "reschedule",
+            State.RESCHEDULE_ASK_SERVICE,
+        ),  # one booking picked: move it instead
+        ("reschedule", "cancel", State.CANCEL_CONFIRM),
+        ("cancel_all", "reschedule", State.MANAGE_SELECT_BOOKING),  # which one to move?
+    ],
+)
+def test_callers_can_change_what_they_want_mid_flow(first, then, state) -> None:
+    fsm = FSM()
+    fsm.update_state(intent=first)
+    fsm.update_state(
+        data={
+            "bookings": [{"uid": "u1"}]
+            if first != "cancel_all"
+            else [{"uid": "u1"}, {"uid": "u2"}]
+        }
+    )
+    assert fsm.dispatch(then)
+    assert fsm.state == state and fsm.ctx.intent == then
+
+
+def test_manage_intents_start_from_any_state() -> None:
+    fsm = FSM()
+    fsm.update_state(intent="book", data={"service": "Haircut"})
+    fsm.update_state(intent="reschedule")
+    assert fsm.state == State.MANAGE_ASK_PHONE and fsm.ctx.intent == "reschedule"
+    fsm.update_state(intent="cancel")
+    assert fsm.state == State.MANAGE_ASK_PHONE and fsm.ctx.intent == "cancel"
+
+
+def test_trace_replays_the_same_path() -> None:
+    fsm = FSM()
+    fsm.update_state(intent="reschedule")
+    fsm.update_state(data={"bookings": [{"uid": "u1"}, {"uid": "u2"}]})
+    fsm.update_state(data={"booking_uid": "u2"})
+    fsm.update_state(data={"service": "Spa", "date": "friday"})
+
+    assert [step.event for step in fsm.trace] == [
+        "reschedule",
+        "bookings",
+        "booking_uid",
+        "service",
+        "date",
+    ]
+    assert (
+        fsm.trace[1].source == State.MANAGE_ASK_PHONE
+        and fsm.trace[1].target == State.MANAGE_SELECT_BOOKING
+    )
+    assert fsm.state == State.RESCHEDULE_ASK_TIME
+
+    replayed = FSM.replay(fsm.trace)
+    assert replayed.state == fsm.state and replayed.ctx.booking_uid == "u2"
+    assert [step.target for step in replayed.trace] == [
+        step.target for step in fsm.trace
+    ]
+
+
+def test_context_keeps_booking_projections_and_round_trips() -> None:
+    raw = {
+        "uid": "3f2b9c1e",
+        "title": "Haircut",
+        "start": "2030-01-08T05:00:00.000Z",
+        "end": "2030-01-08T05:30:00.000Z",
+        "attendees": [
+            {"name": "Asha", "email": "asha@example.com", "timeZone": "Asia/Kolkata"}
+        ],
+        "responses": {"phone": "+919876543210", "notes": "x" * 200},
+        "metadata": {"source": "agent"},
+    }
+    fsm = FSM()
+    fsm.update_state(intent="cancel")
+    fsm.update_state(
+        data={"bookings": [raw, {**raw, "uid": "9a8b7c6d", "start": "bad"}]}
+    )
+    assert fsm.ctx.bookings_list == [
+        BookingRef("3f2b9c1e", 1894078800, "Haircut"),
+        BookingRef("9a8b7c6d", 0, "Haircut"),
+    ]
+    assert fsm.ctx.bookings_list[0].start_iso() == "2030-01-08T05:00:00Z"
+    assert fsm.ctx.bookings_list[1].start_iso() is None
+    assert not hasattr(fsm.ctx, "__dict__")
+
+    fsm.ctx.otp_expiry = datetime(2030, 1, 7, 10, 5, tzinfo=timezone.utc)
+    fsm.ctx.otp_resend_count = 1
+    restored = FSM.restore(fsm.snapshot())
+    assert restored.state == State.MANAGE_SELECT_BOOKING
+    for name in type(fsm.ctx).__slots__:
+        assert getattr(restored.ctx, name) == getattr(fsm.ctx, name), name
+
+    # What used to be kept per session: the raw Cal.com dicts
+    assert len(fsm.snapshot()) < len(pickle.dumps([raw, raw])) / 3
@@ -0,0 +1,37 @@
+import pytest
+
+import agent
+import snapshot
+from cal_standin import StandinCalendar
+from load_harness import percentile, run_load
+
+
+def test_percentile_nearest_rank() -> None:
+    values = [float(v) for v in range(1, 101)]
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 99) == 99.0
+    assert percentile([], 95) == 0.0
+
+
+@pytest.mark.asyncio
+async def test_small_run_books_every_caller(monkeypatch, tmp_path) -> None:
+    """Virtual callers walk the booking flow against the in-process stand-in."""
+    monkeypatch.setattr(
+        agent, "EVENT_TYPES_CACHE", dict(agent.EVENT_TYPES_CACHE, content_hash=None)
+    )
+    path = str(tmp_path / "snapshot.json")
+    monkeypatch.setattr(
+        agent,
+        "save_snapshot",
+        lambda **sections: snapshot.save_snapshot(path=path, **sections),
+    )
+    calendar = StandinCalendar(seats=10, seed=3)
+
+    report = await run_load(6, concurrency=3, calendar=calendar, seed=3)
+
+    assert report["outcomes"] == {"booked": 6}
+    assert report["tools"]["create_booking"]["calls"] == 6
+    assert report["tools"]["get_availability"]["errors"] == 0
+    assert (
+        len([b for b in calendar.bookings.values() if b["status"] == "accepted"]) == 6
+    )
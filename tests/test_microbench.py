@@ -0,0 +1,49 @@
+import agent
+from microbench import compare, frozen_clock, make_bookings, run_suite
+
+
+def test_frozen_clock_pins_relative_dates() -> None:
+    with frozen_clock():
+        assert agent.parse_datetime("tomorrow", "3 PM") == "2030-01-08T09:30:00.000Z"
+    assert agent.datetime.now().year < 2030
+
+
+def test_quick_run_covers_every_helper_and_restores_state() -> None:
+    version, index = agent.EVENT_TYPES_CACHE["version"], agent.SERVICE_INDEX
+    report = run_suite(sizes=[10], min_time=0.001, repeats=1)
+
+    assert set(report["cases"]) == {
+        "parse_datetime",
+        "format_spoken_date",
+        "normalize_phone",
+        "fsm_update_state",
+        "extract_booking_phone[10]",
+        "lookup_email_by_phone[10]",
+        "find_service_by_name[10]",
+    }
+    assert all(case["ns_per_op"] > 0 for case in report["cases"].values())
+    assert (
+        agent.EVENT_TYPES_CACHE["version"] == version and agent.SERVICE_INDEX is index
+    )
+    assert len({agent.extract_booking_phone(b) for b in make_bookings(9)}) == 9
+
+
+def test_compare_flags_only_slowdowns_past_threshold() -> None:
+    baseline = {
+        "cases": {
+            "a": {"ns_per_op": 100, "relative": 1.0},
+            "b": {"ns_per_op": 100, "relative": 1.0},
+        }
+    }
+    current = {
+        "cases": {
+            "a": {"ns_per_op": 160, "relative": 1.6},
+            "b": {"ns_per_op": 120, "relative": 1.2},
+            "new": {"ns_per_op": 5, "relative": 0.1},
+        }
+    }
+
+    regressions = compare(current, baseline, threshold=0.5)
+
+    assert [r["case"] for r in regressions] == ["a"]
+    assert regressions[0]["ratio"] == 1.6
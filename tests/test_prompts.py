@@ -0,0 +1,177 @@
+import re
+from datetime import date
+
+import pytest
+
+import agent
+from fsm import CORE_TOOLS, FSM, STATE_TOOLS, State
+from load_harness import VirtualContext, VirtualSession
+from prompts import (
+    STATIC_PROMPT,
+    PromptCache,
+    PromptStats,
+    ToolExposure,
+    build_core_prompt,
+    cacheable_prefix,
+    scoped_instructions,
+    state_prompt_sizes,
+)
+
+SERVICES = [{"title": "Haircut", "duration": 30}, {"title": "Spa", "duration": 60}]
+MONDAY = date(2030, 1, 7)
+
+
+def test_every_state_gets_the_core_plus_its_own_guidance() -> None:
+    core = build_core_prompt(
+        {"agentName": "Zara", "businessName": "TSC Salon"}, SERVICES, MONDAY
+    )
+    assert "You are Zara, the head receptionist at TSC Salon" in core
+    assert "Monday, 07 January 2030" in core and "- Spa: 60 minutes" in core
+
+    # Most widely shared block first: static, then tenant and services, then the date
+    assert core.startswith(STATIC_PROMPT)
+    assert (
+        core.index("TSC Salon")
+        < core.index("- Spa")
+        < core.index("Monday, 07 January 2030")
+    )
+
+    fsm = FSM()
+    fsm.state = State.BOOKING_ASK_TIME
+    fsm.ctx.service, fsm.ctx.date = "Haircut", "tomorrow"
+    instructions = scoped_instructions(core, fsm)
+    assert instructions.startswith(core)
+    assert (
+        "Service: Haircut, Date: tomorrow" in instructions
+        and "`get_availability`" in instructions
+    )
+
+    # The single prompt every request used to carry was ~3,500 tokens
+    assert max(state_prompt_sizes(core).values()) < 1000
+
+
+@pytest.mark.asyncio
+async def test_tools_rescope_the_instructions_on_transition() -> None:
+    session = VirtualSession("prompt-test")
+    assistant = agent.Assistant({}, session.fsm)
+    assert (
+        assistant.scoped_state == "START" and "`intent_book`" in assistant.instructions
+    )
+
+    await assistant.intent_book(VirtualContext(session))
+    assert assistant.scoped_state == "BOOKING_ASK_SERVICE"
+    assert "`list_available_services`" in assistant.instructions
+    assert "`intent_book`" not in assistant.instructions
+    assert {tool.info.name for tool in assistant.tools} == session.fsm.available_tools()
+
+
+@pytest.mark.asyncio
+async def test_manage_reschedule_reaches_reschedule_booking() -> None:
+    session = VirtualSession("prompt-test")
+    assistant = agent.Assistant({}, session.fsm)
+    context = VirtualContext(session)
+
+    await assistant.intent_manage(context, action="reschedule")
+    session.fsm.update_state(
+        data={"phone": "+919876543210", "bookings": [{"uid": "u1"}, {"uid": "u2"}]}
+    )
+    session.fsm.update_state(data={"booking_uid": "u2"})
+    session.fsm.update_state(data={"service": "Spa", "date": "friday", "time": "3 PM"})
+    await assistant.sync_state(session.fsm)
+
+    assert session.fsm.state == State.RESCHEDULE_CONFIRM
+    assert "reschedule_booking" in {tool.info.name for tool in assistant.tools}
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("bookings", [[{"uid": "u1"}], [{"uid": "u1"}, {"uid": "u2"}]])
+async def test_reschedule_requests_never_get_the_cancel_prompt(bookings) -> None:
+    session = VirtualSession("prompt-test")
+    assistant = agent.Assistant({}, session.fsm)
+    seen = []
+
+    async def step(**data) -> None:
+        session.fsm.update_state(data=data)
+        await assistant.sync_state(session.fsm)
+        seen.append((session.fsm.state, assistant.instructions))
+
+    await assistant.intent_manage(VirtualContext(session), action="reschedule")
+    seen.append((session.fsm.state, assistant.instructions))
+    await step(phone="+919876543210", bookings=bookings)
+    if len(bookings) > 1:
+        await step(booking_uid="u2")
+    await step(service="Spa")
+    await step(date="friday")
+    await step(time="3 PM")
+
+    assert seen[-1][0] == State.RESCHEDULE_CONFIRM
+    for state, instructions in seen:
+        assert state != State.CANCEL_CONFIRM
+        assert (
+            "`cancel_booking`" not in instructions
+            and "`cancel_all_bookings`" not in instructions
+        ), state
+    assert "wants to reschedule a booking" in seen[0][1]
+
+
+def test_each_state_exposes_the_tools_its_guidance_names() -> None:
+    names = {tool.info.name for tool in agent.Assistant({}).all_tools}
+    assert CORE_TOOLS.union(*STATE_TOOLS.values()) <= names
+
+    fsm = FSM()
+    for state in State:
+        fsm.state = state
+        mentioned = set(re.findall(r"`(\w+)`", fsm.get_system_prompt()))
+        assert mentioned <= fsm.available_tools(), state
+        assert len(fsm.available_tools()) < len(names) / 2
+
+
+def test_tool_exposure_counts_off_state_calls() -> None:
+    exposure = ToolExposure()
+    exposure.exposed("OTP_VERIFY", 8, 2300)
+    exposure.called("OTP_VERIFY", "verify_otp", True)
+    exposure.called("OTP_VERIFY", "create_booking", False)
+    report = exposure.stats()
+    assert report["off_state_rate"] == 0.5
+    assert report["states"]["OTP_VERIFY"] == {
+        "tools": 8,
+        "schema_bytes": 2300,
+        "calls": 2,
+        "off_state_calls": {"create_booking": 1},
+        "off_state_rate": 0.5,
+    }
+
+
+def test_core_prompts_are_memoized_per_project_catalogue_and_day() -> None:
+    cache = PromptCache()
+    zara = {"agentName": "Zara"}
+    first = cache.core("p1", zara, 3, SERVICES, MONDAY)
+    assert cache.core("p1", dict(zara), 3, SERVICES, MONDAY) is first
+    assert cache.stats() == {"entries": 1, "hits": 1, "misses": 1}
+
+    assert "Tuesday" in cache.core("p1", zara, 3, SERVICES, date(2030, 1, 8))
+    assert "Asha" in cache.core(
+        "p1", {"agentName": "Asha"}, 3, SERVICES, MONDAY
+    )  # config changed
+    cache.core("p2", zara, 3, SERVICES, MONDAY)
+    cache.core("p1", zara, 4, SERVICES, MONDAY)
+    assert cache.stats() == {"entries": 4, "hits": 1, "misses": 5}
+
+    prefix = cacheable_prefix(zara, SERVICES, MONDAY)
+    assert prefix["static"] < prefix["static+tenant"] < prefix["static+tenant+daily"]
+
+
+def test_prompt_stats_group_requests_by_state() -> None:
+    stats = PromptStats()
+    stats.record("START", 800, 0, 0.4)
+    stats.record("START", 820, 768, 0.2)
+    stats.record("OTP_VERIFY", 760, 768, -1.0)
+    report = stats.stats()
+    assert report["START"] == {
+        "requests": 2,
+        "avg_prompt_tokens": 810,
+        "avg_cached_tokens": 384,
+        "ttft_p50_ms": 400,
+        "ttft_p95_ms": 400,
+    }
+    assert report["OTP_VERIFY"]["ttft_p50_ms"] is None
@@ -0,0 +1,117 @@
+import asyncio
+
+import httpx
+import pytest
+
+import cal_client
+from cal_client import CalClient
+from resilience import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    CircuitOpenError,
+    DeadlineExceededError,
+    deadline,
+    tool_budget,
+)
+from singleflight import SingleFlight
+
+
+@pytest.fixture(autouse=True)
+def fresh_breakers(monkeypatch):
+    monkeypatch.setattr(cal_client, "BREAKERS", {})
+
+
+def test_breaker_opens_on_errors_and_probes_after_cooldown() -> None:
+    """Enough failures in the window open the circuit; one probe decides whether it closes."""
+    breaker = CircuitBreaker(
+        "slots", min_requests=4, error_threshold=0.5, open_seconds=0.0
+    )
+    for ok in (True, False, True, False):
+        assert breaker.allow()
+        breaker.record(ok, 0.1)
+    assert breaker.state == OPEN
+
+    assert breaker.allow()  # cooldown elapsed: the probe goes out
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()  # only one probe at a time
+    breaker.record(True, 0.1)
+    assert breaker.state == CLOSED
+    assert breaker.stats()["times_opened"] == 1
+
+
+def test_breaker_opens_on_slow_calls() -> None:
+    breaker = CircuitBreaker(
+        "bookings", min_requests=3, slow_call_seconds=1.0, slow_threshold=0.6
+    )
+    for latency in (2.0, 0.2, 3.0):
+        breaker.record(True, latency)
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert breaker.stats()["rejected"] == 1
+
+
+@pytest.mark.asyncio
+async def test_client_fails_fast_when_breaker_open() -> None:
+    """Once the slots breaker opens, requests are refused without touching the network."""
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        return httpx.Response(503)
+
+    client = CalClient(transport=httpx.MockTransport(handler))
+    breaker = cal_client.breaker_for("slots")
+    for _ in range(breaker.min_requests):
+        await client.get("https://cal.test/v1/slots", endpoint="slots")
+    assert breaker.state == OPEN
+
+    with pytest.raises(CircuitOpenError):
+        await client.get("https://cal.test/v1/slots", endpoint="slots")
+    assert len(calls) == breaker.min_requests
+    assert client.stats()["breakers"]["slots"]["state"] == OPEN
+    # Booking writes share the bookings breaker, which is still closed
+    assert cal_client.breaker_for("booking-write") is cal_client.breaker_for("bookings")
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_budget_caps_slow_request() -> None:
+    """A tool budget cuts a slow request short with DeadlineExceededError."""
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(1.0)
+        return httpx.Response(200, json={})
+
+    client = CalClient(transport=httpx.MockTransport(handler))
+
+    @tool_budget(0.05)
+    async def tool():
+        return await client.get("https://cal.test/v2/bookings", endpoint="bookings")
+
+    with pytest.raises(DeadlineExceededError):
+        await tool()
+    assert client.stats()["breakers"]["bookings"]["slow_rate"] == 1.0
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_shared_flight_outlives_impatient_caller() -> None:
+    """A caller out of budget gives up, but the shared request still answers the others."""
+    flights = SingleFlight()
+    release = asyncio.Event()
+
+    async def fetch():
+        await release.wait()
+        return "slots"
+
+    async def impatient():
+        with deadline(0.01):
+            return await flights.do(("slots", 1), fetch)
+
+    patient = asyncio.create_task(flights.do(("slots", 1), fetch))
+    with pytest.raises(DeadlineExceededError):
+        await impatient()
+    release.set()
+    assert await patient == "slots"
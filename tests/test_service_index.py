@@ -0,0 +1,68 @@
+from service_index import ServiceIndex, phonetic_key
+
+SERVICES = [
+    {"id": 1, "title": "Haircut", "slug": "haircut"},
+    {"id": 2, "title": "Hairwash", "slug": "hairwash"},
+    {"id": 3, "title": "Spa", "slug": "spa"},
+    {"id": 4, "title": "Beard Trim", "slug": "beard-trim"},
+    {"id": 5, "title": "Facial", "slug": "facial"},
+]
+
+
+def _best(query: str):
+    service = ServiceIndex(SERVICES).best(query)
+    return service["title"] if service else None
+
+
+def test_exact_prefix_and_token_matches() -> None:
+    assert _best("HAIRCUT") == "Haircut"
+    assert _best("beard-trim") == "Beard Trim"
+    assert _best("hair") == "Haircut"  # catalogue order breaks ties
+    assert _best("a haircut please") == "Haircut"
+    assert _best("spa treatment") == "Spa"
+    assert _best("trim") == "Beard Trim"
+
+
+def test_misheard_names_resolve() -> None:
+    """STT splits and sound-alikes still find the right service."""
+    assert _best("hair was") == "Hairwash"
+    assert _best("hair wosh") == "Hairwash"
+    assert _best("fashial") == "Facial"
+    assert phonetic_key("hairwas") == phonetic_key("hairwash")
+
+
+def test_unknown_service_has_no_confident_match() -> None:
+    index = ServiceIndex(SERVICES)
+    assert index.best("manicure") is None
+    assert index.best("") is None
+
+
+def test_match_returns_ranked_scored_candidates() -> None:
+    ranked = ServiceIndex(SERVICES).match("hear cut")
+    assert ranked[0][0]["title"] == "Haircut"
+    assert [score for _, score in ranked] == sorted(
+        (score for _, score in ranked), reverse=True
+    )
+
+
+def test_spoken_services_come_from_the_catalogue(monkeypatch) -> None:
+    """What list_available_services offers is what find_service_by_name accepts."""
+    import agent
+
+    catalogue = [{**s, "lengthInMinutes": 30} for s in SERVICES]
+    monkeypatch.setattr(
+        agent,
+        "EVENT_TYPES_CACHE",
+        dict(agent.EVENT_TYPES_CACHE, data=catalogue, version=-7),
+    )
+    services = agent.get_all_services()
+    assert (
+        agent.spoken_services(services)
+        == "We offer haircut, hairwash, spa, beard trim and facial."
+    )
+    assert (
+        agent.spoken_services(services, limit=3)
+        == "We offer haircut, hairwash, spa and more."
+    )
+    for title in ("haircut", "hairwash", "spa", "beard trim", "facial"):
+        assert agent.find_service_by_name(title)["title"].lower() == title
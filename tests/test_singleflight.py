@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_calls_share_one_request() -> None:
+    """Callers with the same key get the leader's result without a second call."""
+    flights = SingleFlight()
+    calls = 0
+    release = asyncio.Event()
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return {"slots": []}
+
+    waiters = [
+        asyncio.create_task(flights.do(("slots", 1, "2025-01-02"), fetch))
+        for _ in range(5)
+    ]
+    await asyncio.sleep(0)
+    release.set()
+    results = await asyncio.gather(*waiters)
+
+    assert calls == 1
+    assert all(r is results[0] for r in results)
+    assert flights.stats()["by_kind"]["slots"] == {"calls": 1, "collapsed": 4}
+    assert flights.in_flight() == 0
+
+
+@pytest.mark.asyncio
+async def test_different_keys_and_sequential_calls_are_not_collapsed() -> None:
+    flights = SingleFlight()
+
+    async def fetch():
+        return 1
+
+    await flights.do(("slots", 1), fetch)
+    await flights.do(("slots", 1), fetch)
+    await flights.do(("slots", 2), fetch)
+    assert flights.stats()["calls"] == 3
+    assert flights.stats()["collapsed"] == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_cancel_shared_request() -> None:
+    flights = SingleFlight()
+    release = asyncio.Event()
+
+    async def fetch():
+        await release.wait()
+        return "ok"
+
+    first = asyncio.create_task(flights.do(("bookings",), fetch))
+    second = asyncio.create_task(flights.do(("bookings",), fetch))
+    await asyncio.sleep(0)
+    first.cancel()
+    release.set()
+
+    assert await second == "ok"
+    with pytest.raises(asyncio.CancelledError):
+        await first
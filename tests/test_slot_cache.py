@@ -0,0 +1,58 @@
+from slot_cache import SlotCache
+
+
+def test_hit_miss_and_ttl(monkeypatch) -> None:
+    """Fresh entries hit, expired entries miss and are dropped."""
+    now = [1000.0]
+    monkeypatch.setattr("slot_cache.time.monotonic", lambda: now[0])
+    cache = SlotCache(ttl_seconds=30)
+
+    assert cache.get(1, "2025-01-02") is None
+    cache.put(1, "2025-01-02", [{"time": "2025-01-02T05:00:00Z"}])
+    assert cache.get(1, "2025-01-02") == [{"time": "2025-01-02T05:00:00Z"}]
+
+    now[0] += 31
+    assert cache.get(1, "2025-01-02") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 2
+    assert cache.stats()["entries"] == 0
+
+
+def test_lru_eviction() -> None:
+    """The least recently used entry is evicted first."""
+    cache = SlotCache(max_entries=2)
+    cache.put(1, "2025-01-02", [])
+    cache.put(2, "2025-01-02", [])
+    cache.get(1, "2025-01-02")
+    cache.put(3, "2025-01-02", [])
+
+    assert cache.get(2, "2025-01-02") is None
+    assert cache.get(1, "2025-01-02") == []
+    assert cache.stats()["evictions"] == 1
+
+
+def test_invalidate_day_drops_every_event_type() -> None:
+    """A booking on a day invalidates that day for all services."""
+    cache = SlotCache()
+    cache.put(1, "2025-01-02", [])
+    cache.put(2, "2025-01-02", [])
+    cache.put(1, "2025-01-03", [])
+
+    cache.invalidate_day("2025-01-02")
+
+    assert cache.get(1, "2025-01-02") is None
+    assert cache.get(2, "2025-01-02") is None
+    assert cache.get(1, "2025-01-03") == []
+    assert cache.stats()["invalidations"] == 2
+
+
+def test_stale_fetch_is_not_written_back() -> None:
+    """A fetch that started before an invalidation must not repopulate the day."""
+    cache = SlotCache()
+    generation = cache.generation
+    cache.invalidate_day("2025-01-02")
+    cache.put(1, "2025-01-02", [{"time": "old"}], generation)
+    assert cache.get(1, "2025-01-02") is None
+
+    cache.put(1, "2025-01-02", [{"time": "new"}], cache.generation)
+    assert cache.get(1, "2025-01-02") == [{"time": "new"}]
@@ -0,0 +1,222 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import cal_client
+from booking_index import BookingIndex
+from cal_standin import StandinCalendar
+from slot_engine import Schedule, SlotEngine
+from slot_store import DaySlots
+
+NOW = datetime(2030, 1, 7, 3, 0, tzinfo=timezone.utc)  # Monday 08:30 in Kolkata
+HAIRCUT = {"id": 101, "length": 30}
+SPA = {"id": 103, "length": 60, "slotInterval": 30}
+
+
+def _engine() -> SlotEngine:
+    engine = SlotEngine("http://cal/v2", "key", clock=lambda: NOW)
+    engine.schedule = Schedule.from_cal(
+        {
+            "timeZone": "Asia/Kolkata",
+            "availability": [
+                {
+                    "days": ["Monday", "Tuesday"],
+                    "startTime": "10:00",
+                    "endTime": "12:00",
+                }
+            ],
+            "overrides": [
+                {"date": "2030-01-08", "startTime": "00:00", "endTime": "00:00"}
+            ],
+        }
+    )
+    engine.retain(set())
+    return engine
+
+
+def _times(slots) -> list[str]:
+    return [s["time"][11:16] for s in slots.to_cal()]
+
+
+def test_slots_follow_hours_and_bookings() -> None:
+    engine = _engine()
+    assert _times(engine.day_slots(HAIRCUT, "2030-01-07")) == [
+        "04:30",
+        "05:00",
+        "05:30",
+        "06:00",
+    ]
+    assert len(engine.day_slots(HAIRCUT, "2030-01-08")) == 0  # day off override
+    assert len(engine.day_slots(HAIRCUT, "2030-01-09")) == 0  # Wednesday, no hours
+
+    # 10:30-11:00 local is taken
+    engine.upsert(
+        {
+            "uid": "a",
+            "start": "2030-01-07T05:00:00.000Z",
+            "end": "2030-01-07T05:30:00.000Z",
+        }
+    )
+    assert _times(engine.day_slots(HAIRCUT, "2030-01-07")) == [
+        "04:30",
+        "05:30",
+        "06:00",
+    ]
+    assert _times(engine.day_slots(SPA, "2030-01-07")) == ["05:30"]
+    assert engine.is_free("2030-01-07", 600, 630) and not engine.is_free(
+        "2030-01-07", 620, 640
+    )
+
+    engine.remove("a")
+    assert len(engine.day_slots(SPA, "2030-01-07")) == 3
+
+
+def test_reconcile_serves_cal_com_for_disagreeing_days_until_the_next_reconcile() -> (
+    None
+):
+    engine = _engine()
+    remote = {
+        "2030-01-07": DaySlots.from_cal(
+            "2030-01-07", [{"time": "2030-01-07T05:30:00.000Z"}]
+        ),
+        "2030-01-08": DaySlots("2030-01-08"),
+    }
+
+    assert engine.reconcile(HAIRCUT, remote) == ["2030-01-07"]
+    assert engine.day_slots(HAIRCUT, "2030-01-07") == remote["2030-01-07"]
+    assert not engine.reconcile_due(101)
+
+    # A booking on that day keeps Cal.com's answer, minus the booked slot, and makes a reconcile due
+    engine.upsert(
+        {
+            "uid": "b",
+            "start": "2030-01-07T04:30:00.000Z",
+            "end": "2030-01-07T05:00:00.000Z",
+        }
+    )
+    assert engine.day_slots(HAIRCUT, "2030-01-07") == remote["2030-01-07"]
+    assert engine.reconcile_due(101)
+    engine.upsert(
+        {
+            "uid": "c",
+            "start": "2030-01-07T05:30:00.000Z",
+            "end": "2030-01-07T06:00:00.000Z",
+        }
+    )
+    assert len(engine.day_slots(HAIRCUT, "2030-01-07")) == 0
+
+
+def test_not_ready_until_schedule_and_bookings_load() -> None:
+    engine = SlotEngine("http://cal/v2", "key", clock=lambda: NOW)
+    assert engine.day_slots(HAIRCUT, "2030-01-07") is None
+    engine.retain(set())
+    assert engine.day_slots(HAIRCUT, "2030-01-07") is None
+
+
+@pytest.mark.asyncio
+async def test_matches_standin_slots_over_a_busy_week() -> None:
+    """Schedule and bookings loaded over HTTP give the same slots as /v1/slots."""
+    calendar = StandinCalendar(seed=5, clock=lambda: NOW)
+    calendar.seed_bookings(60)
+    cal_client.use_transport(calendar.transport())
+    try:
+        engine = SlotEngine("http://cal/v2", "key", clock=lambda: NOW)
+        index = BookingIndex(
+            "http://cal/v2", "key", lambda b: b["attendees"][0]["phoneNumber"]
+        )
+        index.add_mirror(engine)
+        await engine.load_schedule()
+        await index.ensure_fresh()
+        assert engine.ready
+
+        for event_type in calendar.event_types:
+            remote = calendar.free_slots(event_type, NOW, NOW + timedelta(days=7))
+            for offset in range(7):
+                day = (
+                    (NOW + timedelta(days=offset))
+                    .astimezone(calendar.tz)
+                    .date()
+                    .isoformat()
+                )
+                assert engine.day_slots(event_type, day) == DaySlots.from_cal(
+                    day, remote.get(day)
+                ), (event_type["slug"], day)
+    finally:
+        await cal_client.aclose_cal_client()
+        cal_client.use_transport(None)
+
+
+@pytest.mark.asyncio
+async def test_cached_catalogue_keeps_slot_settings(monkeypatch, tmp_path) -> None:
+    """Event types cached by the agent carry slotInterval, notice and buffers into the engine."""
+    import agent
+    import snapshot
+
+    spa = {
+        "id": 103,
+        "title": "Spa",
+        "slug": "spa",
+        "length": 60,
+        "slotInterval": 30,
+        "minimumBookingNotice": 120,
+    }
+    facial = {
+        "id": 107,
+        "title": "Facial",
+        "slug": "facial",
+        "length": 30,
+        "afterEventBuffer": 15,
+    }
+    calendar = StandinCalendar(seed=5, clock=lambda: NOW, event_types=[spa, facial])
+    calendar.seed_bookings(20)
+    cache = dict(
+        agent.EVENT_TYPES_CACHE,
+        data=[],
+        last_updated=None,
+        version=0,
+        etag=None,
+        last_modified=None,
+        content_hash=None,
+        last_forced=None,
+        refresh_task=None,
+    )
+    monkeypatch.setattr(agent, "EVENT_TYPES_CACHE", cache)
+    path = str(tmp_path / "snapshot.json")
+    monkeypatch.setattr(
+        agent,
+        "save_snapshot",
+        lambda **sections: snapshot.save_snapshot(path=path, **sections),
+    )
+    cal_client.use_transport(calendar.transport())
+    try:
+        await agent.fetch_event_types()
+        engine = SlotEngine("http://cal/v2", "key", clock=lambda: NOW)
+        index = BookingIndex(
+            "http://cal/v2", "key", lambda b: b["attendees"][0]["phoneNumber"]
+        )
+        index.add_mirror(engine)
+        await engine.load_schedule()
+        await index.ensure_fresh()
+
+        for raw in (spa, facial):
+            event_type = agent.get_event_type(raw["id"])
+            remote = calendar.free_slots(
+                calendar.event_type(raw["id"]), NOW, NOW + timedelta(days=3)
+            )
+            for offset in range(3):
+                day = (
+                    (NOW + timedelta(days=offset))
+                    .astimezone(calendar.tz)
+                    .date()
+                    .isoformat()
+                )
+                assert engine.day_slots(event_type, day) == DaySlots.from_cal(
+                    day, remote.get(day)
+                ), (raw["slug"], day)
+
+        # Half-hourly Spa slots, none within two hours of 08:30
+        today = engine.day_slots(agent.get_event_type(103), "2030-01-07")
+        assert today.step() == 30 and today.minutes[0] >= 630
+    finally:
+        await cal_client.aclose_cal_client()
+        cal_client.use_transport(None)
@@ -0,0 +1,87 @@
+import pytest
+
+from slot_store import DaySlots, format_minute
+
+# 10:00-13:00 every 30 minutes, 11:00 and 11:30 taken, then 17:00 and 18:30
+DAY = DaySlots("2030-01-07", [600, 630, 720, 750, 1020, 1110])
+
+
+def test_exact_hit_and_neighbours() -> None:
+    found = DAY.query(630)
+    assert found.exact and found.before == 600 and found.after == 720
+    assert found.nearest == [600, 630, 720]
+
+
+def test_missing_time_returns_nearest_on_both_sides() -> None:
+    found = DAY.query(675)  # 11:15
+    assert not found.exact
+    assert (found.before, found.after) == (630, 720)
+    assert found.nearest == [600, 630, 720]  # 10:00 and 12:30 tie; the earlier wins
+    assert DAY.nearest(690, k=2) == [630, 720]  # tie goes to the earlier slot
+    assert DAY.before(600) is None and DAY.after(1110) is None
+
+
+def test_periods_bound_every_query() -> None:
+    evening = DAY.query(720, period="evening")
+    assert not evening.exact and evening.before is None and evening.after == 1020
+    assert (
+        evening.nearest == [1020, 1110] and evening.total == 2 and evening.last == 1110
+    )
+
+    first = DAY.query(period="morning", k=3)
+    assert first.nearest == [600, 630] and first.total == 2
+    assert DAY.query(period="afternoon").nearest == [720, 750]
+
+
+def test_round_trips_cal_com_shape() -> None:
+    raw = [
+        {"time": "2030-01-07T04:30:00.000Z"},
+        {"time": "2030-01-07T13:00:00.000Z"},
+        {"time": "2030-01-08T04:30:00.000Z"},
+    ]
+    day = DaySlots.from_cal("2030-01-07", raw)
+    assert list(day.minutes) == [600, 1110]
+    assert day.to_cal() == raw[:2]
+    assert (
+        format_minute(570) == "09:30 AM"
+        and format_minute(720) == "12:00 PM"
+        and format_minute(0) == "12:00 AM"
+    )
+
+
+@pytest.mark.asyncio
+async def test_availability_answers_ignore_the_period_for_exact_times(
+    monkeypatch,
+) -> None:
+    import agent
+    from load_harness import VirtualContext, VirtualSession
+
+    async def day_slots(event_type_id, day):
+        return DaySlots(day, [600, 630, 1020, 1110])  # nothing in the afternoon
+
+    monkeypatch.setattr(agent, "fetch_day_slots", day_slots)
+    monkeypatch.setattr(
+        agent,
+        "find_service_by_name",
+        lambda name, memo=None: {"id": 1, "title": "Haircut"},
+    )
+    session = VirtualSession("availability-test")
+    assistant = agent.Assistant({}, session.fsm)
+
+    async def ask(**kwargs) -> str:
+        return await assistant.get_availability(
+            VirtualContext(session), date="tomorrow", service="Haircut", **kwargs
+        )
+
+    # 5:00 PM is free even though the caller said "afternoon"
+    assert (await ask(time="5:00 PM", period="afternoon")).startswith("05:00 PM on ")
+    assert "is available" in await ask(time="5:00 PM", period="afternoon")
+
+    # 12:00-17:00 has nothing, but the day does
+    assert "Nothing free in the afternoon" in await ask(period="afternoon")
+    reply = await ask(time="2:00 PM", period="afternoon")
+    assert (
+        "Nothing free in the afternoon" in reply
+        and "10:30 AM" in reply
+        and "05:00 PM" in reply
+    )
@@ -0,0 +1,41 @@
+import json
+import os
+
+from snapshot import SNAPSHOT_VERSION, load_snapshot, save_snapshot
+
+
+def test_round_trip_and_config_merge(tmp_path) -> None:
+    """Sections are merged into the existing snapshot rather than replacing it."""
+    path = str(tmp_path / "snap.json")
+    catalogue = {
+        "data": [{"id": 1, "title": "Haircut"}],
+        "etag": '"v1"',
+        "last_modified": None,
+        "content_hash": "abc",
+    }
+
+    save_snapshot(event_types=catalogue, path=path)
+    save_snapshot(agent_configs={"p1": {"agentName": "Zara"}}, path=path)
+    save_snapshot(agent_configs={"p2": {"agentName": "Mira"}}, path=path)
+
+    snapshot = load_snapshot(path)
+    assert snapshot["event_types"] == catalogue
+    assert snapshot["agent_configs"] == {
+        "p1": {"agentName": "Zara"},
+        "p2": {"agentName": "Mira"},
+    }
+    # Atomic replace leaves no temp files behind
+    assert os.listdir(tmp_path) == ["snap.json"]
+
+
+def test_ignores_missing_corrupt_and_old_snapshots(tmp_path) -> None:
+    path = tmp_path / "snap.json"
+    assert load_snapshot(str(path)) is None
+
+    path.write_text("{not json")
+    assert load_snapshot(str(path)) is None
+
+    path.write_text(
+        json.dumps({"v": SNAPSHOT_VERSION - 1, "agent_configs": {"p1": {}}})
+    )
+    assert load_snapshot(str(path)) is None
@@ -0,0 +1,89 @@
+import pytest
+
+from slot_store import DaySlots
+from tool_results import (
+    BookingHandles,
+    ToolResults,
+    estimate_tokens,
+    page_of,
+    summarize_slots,
+)
+
+
+def test_slot_lists_collapse_into_ranges() -> None:
+    # 10:00-12:30 and 17:00-18:00 every 30 minutes, plus a lone 20:00
+    day = DaySlots("2030-01-07", [600, 630, 660, 690, 720, 750, 1020, 1050, 1080, 1200])
+    assert day.runs() == [(600, 750), (1020, 1080), (1200, 1200)]
+    assert (
+        summarize_slots(day)
+        == "10:00 AM to 12:30 PM, 05:00 PM to 06:00 PM and 08:00 PM, every 30 min"
+    )
+    assert summarize_slots(day, "morning") == "10:00 AM to 11:30 AM, every 30 min"
+    assert (
+        summarize_slots(day, max_runs=1)
+        == "10:00 AM to 12:30 PM, plus 2 more openings until 08:00 PM, every 30 min"
+    )
+    assert summarize_slots(DaySlots("2030-01-07", [600])) == "10:00 AM"
+
+
+def test_handles_stand_in_for_uids() -> None:
+    handles = BookingHandles()
+    uid = "3f2b9c1e-8d4a-4e6f-9b2a-7c5d1e0f4a3b"
+    assert handles.handle(uid) == "b1"
+    assert handles.handle("other") == "b2"
+    assert handles.handle(uid) == "b1"
+    assert handles.resolve("b1") == handles.resolve("B1") == handles.resolve("1") == uid
+    assert handles.resolve(uid) == uid
+    assert handles.resolve("b9") == "b9"
+
+
+def test_long_lists_page_by_whole_entries() -> None:
+    entries = [f"b{i}: Haircut, January {i}th 10:30 AM" for i in range(1, 15)]
+    pages = [page_of(entries, 55, page) for page in (1, 2, 3, 4)]
+    assert [len(shown) for shown, _ in pages] == [6, 6, 2, 0]
+    assert [rest for _, rest in pages] == [8, 2, 0, 0]
+    assert [entry for shown, _ in pages for entry in shown] == entries
+
+    # Nothing left for the trim to cut, so no handle is lost
+    shown, rest = pages[0]
+    text = (
+        "14 booking(s): "
+        + "; ".join(shown)
+        + f"; and {rest} more, call list_bookings with page=2 for them"
+    )
+    assert ToolResults({"list_bookings": 80}).render("list_bookings", text) == text
+
+
+@pytest.mark.asyncio
+async def test_results_are_trimmed_to_the_tool_budget() -> None:
+    results = ToolResults({"list_bookings": 25})
+
+    @results.compact
+    async def list_bookings():
+        return "3 booking(s): " + "; ".join(
+            f"b{i}: Haircut, January {i}th 10:30 AM" for i in range(4, 7)
+        )
+
+    @results.compact
+    async def confirm_action():
+        return "Confirmed!"
+
+    text = await list_bookings()
+    assert estimate_tokens(text) <= 25
+    assert (
+        text
+        == "3 booking(s): b4: Haircut, January 4th 10:30 AM; b5: Haircut, January 5th 10:30 AM …"
+    )
+    assert await confirm_action() == "Confirmed!"
+
+    stats = results.stats()
+    assert stats["list_bookings"]["trimmed"] == 1
+    assert stats["list_bookings"]["raw_tokens"] > stats["list_bookings"]["sent_tokens"]
+    assert stats["confirm_action"] == {
+        "calls": 1,
+        "avg_tokens": 3.0,
+        "max_tokens": 3,
+        "raw_tokens": 3,
+        "sent_tokens": 3,
+        "trimmed": 0,
+    }